@@ -0,0 +1,231 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry TTL and single-flight loading.
+
+    - At most ``maxsize`` entries; the least recently used one is evicted.
+    - Entries older than ``ttl`` seconds are treated as misses.
+    - Concurrent misses for the same key share one loader call.
+    - ``invalidate`` marks an in-flight load as stale so a load that started
+      before the invalidation cannot write its result back.
+
+    Counters are published to the metrics registry as ``<name>.hits`` etc.
+    Cached objects are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._stale_inflight: set = set()
+        self._listeners: List[Callable[[Hashable], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def _count(self, counter: str) -> None:
+        setattr(self, counter, getattr(self, counter) + 1)
+        metrics.incr(f"{self.name}.{counter}")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value or None, without loading."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._count("evictions")
+        metrics.set_gauge(f"{self.name}.size", len(self._entries))
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[Hashable], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for ``key`` or load it with ``loader(key)``.
+
+        None results are returned but not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count("coalesced")
+            return await asyncio.shield(inflight)
+
+        self._count("misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader(key)
+        except BaseException as e:
+            future.set_exception(e)
+            # Consume the exception so it is not reported as never retrieved
+            future.exception()
+            raise
+        else:
+            if value is not None and key not in self._stale_inflight:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+            self._stale_inflight.discard(key)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key`` and notify listeners (e.g. dependent page caches)."""
+        self._entries.pop(key, None)
+        if key in self._inflight:
+            self._stale_inflight.add(key)
+        for listener in self._listeners:
+            listener(key)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        for key in list(self._entries):
+            self.invalidate(key)
+
+    def add_invalidation_listener(self, listener: Callable[[Hashable], None]) -> None:
+        """Call ``listener(key)`` whenever an entry is invalidated."""
+        self._listeners.append(listener)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters and current size."""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+
+class SWRCache:
+    """
+    A single value served stale-while-revalidate.
+
+    - Younger than ``ttl`` seconds: returned as is.
+    - Older than ``ttl``: returned immediately while one background refresh
+      runs.
+    - Older than ``max_stale`` (or never loaded): the caller waits for a
+      refresh. If that refresh fails the stale value is still returned.
+    - ``start()`` refreshes every ``ttl`` seconds in the background, so
+      requests normally never wait on the loader.
+
+    ``get()`` returns the value with its age in seconds, measured from when
+    the load that produced it started.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float = 5.0,
+        max_stale: float = 60.0,
+        name: str = "swr_cache"
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.name = name
+        self._value: Any = None
+        self._loaded_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def age(self) -> Optional[float]:
+        """Seconds since the cached value was loaded, or None before the first load."""
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    async def get(self) -> Tuple[Any, float]:
+        """Return (value, age_seconds)."""
+        age = self.age()
+        if age is None or age > self.max_stale:
+            metrics.incr(f"{self.name}.misses")
+            try:
+                await self.refresh()
+            except Exception:
+                if self._loaded_at is None:
+                    raise
+                # Already logged by refresh(); serve the stale value
+        elif age > self.ttl:
+            metrics.incr(f"{self.name}.stale")
+            self._refresh_in_background()
+        else:
+            metrics.incr(f"{self.name}.hits")
+        return self._value, self.age()
+
+    async def refresh(self) -> None:
+        """Reload the value now; concurrent callers share one loader call."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._load())
+        await asyncio.shield(self._refreshing)
+
+    async def _load(self) -> None:
+        started = time.monotonic()
+        try:
+            value = await self.loader()
+        except Exception as e:
+            metrics.incr(f"{self.name}.errors")
+            logger.error(f"{self.name} refresh failed: {str(e)}")
+            raise
+        self._value = value
+        self._loaded_at = started
+        metrics.observe(f"{self.name}.load_seconds", time.monotonic() - started)
+
+    def _refresh_in_background(self) -> None:
+        if self._refreshing is not None and not self._refreshing.done():
+            return
+        self._refreshing = asyncio.create_task(self._load())
+        # Failures are logged in _load; consume them so they are not reported as unhandled
+        self._refreshing.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                pass
+            await asyncio.sleep(self.ttl)
+
+    async def start(self) -> None:
+        """Refresh now and then every ``ttl`` seconds in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stop the background refresh."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,21 @@
+import os
+
+from .supabase_util import SupabaseManager
+
+
+def create_data_manager() -> SupabaseManager:
+    """
+    Create the data manager selected by DATA_BACKEND.
+
+    - ``postgrest`` (default): SupabaseManager over the Supabase REST API
+    - ``asyncpg``: PostgresManager talking to Postgres directly (needs DATABASE_URL)
+    """
+    backend = os.getenv('DATA_BACKEND', 'postgrest').lower()
+
+    if backend == 'postgrest':
+        return SupabaseManager()
+    if backend == 'asyncpg':
+        from .postgres_util import PostgresManager
+        return PostgresManager()
+
+    raise ValueError(f"Unknown DATA_BACKEND '{backend}'. Use 'postgrest' or 'asyncpg'")
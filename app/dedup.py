@@ -0,0 +1,119 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Set
+
+from .metrics import metrics
+from .webhook_ingest import RetryLater
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_event_key(event_id: Optional[str], state: str) -> Optional[str]:
+    """Dedup key for a provider event: the same event in a new state is new work."""
+    if not event_id:
+        return None
+    return f"{event_id}:{state.upper()}"
+
+
+class WebhookInProgress(RetryLater):
+    """Raised when another consumer holds the claim on an event: retry it later instead of acking."""
+
+
+class WebhookDeduplicator:
+    """
+    Skips repeated deliveries of the same provider event.
+
+    A bounded in-memory LRU of recently processed keys answers most retries
+    without touching the database. Everything else is claimed in the
+    ``webhook_events`` table (unique key), which also covers other processes
+    and restarts. Claims are released when processing fails so the provider's
+    next retry is processed normally.
+
+    Only keys whose row is marked done are remembered in memory. An event
+    claimed by another consumer raises WebhookInProgress, so it is retried
+    (after ``retry_delay`` seconds) until that consumer completes it or its
+    lease expires, rather than being dropped.
+    """
+
+    def __init__(
+        self,
+        data_manager,
+        maxsize: int = 100000,
+        ttl: float = 86400.0,
+        lease_seconds: int = 300,
+        retry_delay: float = 30.0
+    ):
+        self.data_manager = data_manager
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self._processed: "OrderedDict[str, float]" = OrderedDict()
+        self._inflight: Set[str] = set()
+
+    def seen(self, key: str) -> bool:
+        """True when ``key`` was processed recently by this process (no I/O)."""
+        processed_at = self._processed.get(key)
+        if processed_at is None:
+            return False
+        if time.monotonic() - processed_at > self.ttl:
+            del self._processed[key]
+            return False
+        return True
+
+    def _remember(self, key: str) -> None:
+        self._processed[key] = time.monotonic()
+        self._processed.move_to_end(key)
+        while len(self._processed) > self.maxsize:
+            self._processed.popitem(last=False)
+
+    async def claim(self, key: str) -> bool:
+        """
+        Claim ``key`` for processing. False means it was already processed and
+        must be skipped; raises WebhookInProgress while it is processed elsewhere.
+        """
+        if self.seen(key):
+            metrics.incr("webhook_dedup.duplicates_memory")
+            return False
+        if key in self._inflight:
+            metrics.incr("webhook_dedup.in_progress")
+            raise WebhookInProgress(f"Webhook {key} is being processed", self.retry_delay)
+
+        self._inflight.add(key)
+        try:
+            state = await self.data_manager.claim_webhook_event(key, self.lease_seconds)
+        except Exception:
+            self._inflight.discard(key)
+            raise
+
+        if state == 'done':
+            self._inflight.discard(key)
+            self._remember(key)
+            metrics.incr("webhook_dedup.duplicates_db")
+            return False
+        if state != 'claimed':
+            self._inflight.discard(key)
+            metrics.incr("webhook_dedup.in_progress")
+            raise WebhookInProgress(f"Webhook {key} is being processed elsewhere", self.retry_delay)
+
+        metrics.incr("webhook_dedup.claimed")
+        return True
+
+    async def complete(self, key: str) -> None:
+        """Record ``key`` as processed."""
+        self._inflight.discard(key)
+        self._remember(key)
+        try:
+            await self.data_manager.complete_webhook_event(key)
+        except Exception as e:
+            # The claim row already blocks retries; its lease lets one through later
+            logger.error(f"Could not mark webhook {key} processed: {str(e)}")
+
+    async def release(self, key: str) -> None:
+        """Give up the claim on ``key`` after a processing failure."""
+        self._inflight.discard(key)
+        try:
+            await self.data_manager.release_webhook_event(key)
+        except Exception as e:
+            logger.error(f"Could not release webhook claim {key}: {str(e)}")
@@ -0,0 +1,89 @@
+import json
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Set
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Transaction statuses after which nothing more will be published
+FINAL_TRANSACTION_STATUSES = {"failed", "cancelled", "payout_completed", "payout_failed"}
+
+
+class SubscriberLimitReached(Exception):
+    """Raised when the event bus cannot accept another subscriber."""
+
+
+class TransactionEventBus:
+    """
+    In-process pub/sub for transaction status changes.
+
+    Webhook handlers publish, SSE connections subscribe. Every subscriber gets
+    its own small bounded queue; when a slow client falls behind, the oldest
+    event is dropped (later events carry the full current status, so nothing
+    is lost but intermediate steps). Total and per-transaction subscriber
+    counts are capped so memory stays bounded.
+
+    Events only reach subscribers in the same process. With several workers
+    the SSE endpoint's periodic re-check covers events handled elsewhere.
+    """
+
+    def __init__(self, queue_size: int = 8, max_subscribers: int = 10000, max_per_transaction: int = 8):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.max_per_transaction = max_per_transaction
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._count = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._count
+
+    def subscribe(self, transaction_id: str) -> asyncio.Queue:
+        """Register a subscriber queue for a transaction."""
+        if self._count >= self.max_subscribers:
+            raise SubscriberLimitReached("Too many open event streams")
+        if len(self._subscribers[transaction_id]) >= self.max_per_transaction:
+            raise SubscriberLimitReached("Too many event streams for this transaction")
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[transaction_id].add(queue)
+        self._count += 1
+        metrics.set_gauge("events.subscribers", self._count)
+        return queue
+
+    def unsubscribe(self, transaction_id: str, queue: asyncio.Queue) -> None:
+        """Remove a subscriber queue."""
+        queues = self._subscribers.get(transaction_id)
+        if not queues or queue not in queues:
+            return
+        queues.discard(queue)
+        self._count -= 1
+        if not queues:
+            del self._subscribers[transaction_id]
+        metrics.set_gauge("events.subscribers", self._count)
+
+    def publish(self, transaction_id: str, event: Dict[str, Any]) -> int:
+        """Deliver an event to every subscriber of a transaction. Returns the number reached."""
+        queues = self._subscribers.get(transaction_id)
+        metrics.incr("events.published")
+        if not queues:
+            return 0
+
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                metrics.incr("events.dropped")
+            queue.put_nowait(event)
+        return len(queues)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# Process-wide bus
+event_bus = TransactionEventBus()
@@ -0,0 +1,172 @@
+import os
+import time
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyConflict(Exception):
+    """Raised when a key is reused with a different request body."""
+
+
+class IdempotencyInProgress(Exception):
+    """Raised when another process is still handling the same key."""
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a request body, used to detect reused keys."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def derive_payment_key(driver_id: str, passenger_phone: str, amount: float) -> str:
+    """Key for payments sent without an Idempotency-Key: same driver, phone and amount."""
+    return f"auto:{driver_id}:{passenger_phone}:{amount:.2f}"
+
+
+class IdempotencyStore:
+    """
+    Collapses repeated requests that share an idempotency key.
+
+    - The first request for a key runs; concurrent duplicates await its result.
+    - Successful results are kept for ``ttl`` seconds (bounded LRU) and
+      replayed to later duplicates. Failures are not stored, so a retry
+      after an error runs again.
+    - With a ``backend`` (a data manager with the idempotency key methods)
+      keys are also claimed in Postgres, which covers other worker processes
+      and restarts.
+
+    Results must be JSON-serializable dicts.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 600.0, backend=None, name: str = "idempotency"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.name = name
+        # key -> (expires_at, fingerprint, result)
+        self._entries: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    def _get(self, key: str) -> Optional[Tuple[float, str, Dict[str, Any]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() > entry[0]:
+            del self._entries[key]
+            return None
+        return entry
+
+    def _set(self, key: str, fingerprint: str, result: Dict[str, Any], ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, fingerprint, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        func: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run ``func`` once per key.
+
+        Args:
+            key: Idempotency key
+            fingerprint: Hash of the request body (see request_fingerprint)
+            func: Coroutine factory producing the result
+            ttl: Seconds to keep the result (defaults to the store ttl)
+
+        Returns:
+            (result, replayed) - replayed is True when the result came from an
+            earlier request with the same key
+        """
+        ttl = ttl or self.ttl
+
+        entry = self._get(key)
+        if entry is not None:
+            if entry[1] != fingerprint:
+                raise IdempotencyKeyConflict("Idempotency-Key was already used with a different request")
+            metrics.incr(f"{self.name}.replayed")
+            return entry[2], True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            if inflight[0] != fingerprint:
+                raise IdempotencyKeyConflict("Idempotency-Key was already used with a different request")
+            metrics.incr(f"{self.name}.coalesced")
+            return await asyncio.shield(inflight[1]), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        try:
+            result, replayed = await self._run_once(key, fingerprint, func, ttl)
+        except BaseException as e:
+            future.set_exception(e)
+            # Consume the exception so it is not reported as never retrieved
+            future.exception()
+            raise
+        else:
+            self._set(key, fingerprint, result, ttl)
+            future.set_result(result)
+            return result, replayed
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _run_once(self, key: str, fingerprint: str, func, ttl: float) -> Tuple[Dict[str, Any], bool]:
+        if self.backend is not None:
+            claim = await self.backend.claim_idempotency_key(key, fingerprint, int(ttl))
+            if not claim["claimed"]:
+                if claim["fingerprint"] != fingerprint:
+                    raise IdempotencyKeyConflict("Idempotency-Key was already used with a different request")
+                if claim["response"] is None:
+                    raise IdempotencyInProgress("A request with this Idempotency-Key is still in progress")
+                metrics.incr(f"{self.name}.replayed")
+                return claim["response"], True
+
+        metrics.incr(f"{self.name}.executed")
+        try:
+            result = await func()
+        except BaseException:
+            if self.backend is not None:
+                try:
+                    await self.backend.release_idempotency_key(key)
+                except Exception as e:
+                    logger.error(f"Could not release idempotency key {key}: {str(e)}")
+            raise
+
+        if self.backend is not None:
+            try:
+                await self.backend.save_idempotency_response(key, result)
+            except Exception as e:
+                # The claim row expires with its ttl; until then duplicates get 409
+                logger.error(f"Could not store response for idempotency key {key}: {str(e)}")
+        return result, False
+
+
+def create_payment_idempotency_store(data_manager) -> IdempotencyStore:
+    """
+    Build the /api/pay idempotency store from the environment.
+
+    IDEMPOTENCY_BACKEND=postgres also claims keys in the idempotency_keys
+    table (database/idempotency_migration.sql); the default is memory only.
+    """
+    backend = os.getenv('IDEMPOTENCY_BACKEND', 'memory').lower()
+    if backend not in ('memory', 'postgres'):
+        raise ValueError(f"Unknown IDEMPOTENCY_BACKEND '{backend}'. Use 'memory' or 'postgres'")
+
+    return IdempotencyStore(
+        maxsize=int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000')),
+        ttl=float(os.getenv('IDEMPOTENCY_TTL', '86400')),
+        backend=data_manager if backend == 'postgres' else None,
+        name="pay_idempotency"
+    )
@@ -2,13 +2,36 @@ import os
 import base64
 import json
 from datetime import datetime
-import requests
-from typing import Dict, Any, Optional
+import httpx
+from typing import Dict, Any, Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class IntaSendError(Exception):
+    """
+    An IntaSend API call failed.
+    
+    ``retry_safe`` is True only when IntaSend provably did not act on the
+    request: the connection was never established, or IntaSend rejected it
+    with a 4xx. Timeouts after sending, 5xx responses and broken responses
+    are ambiguous, since the request may have been processed.
+    """
+    
+    def __init__(self, message: str, retry_safe: bool = False):
+        super().__init__(message)
+        self.retry_safe = retry_safe
+
+
+def _retry_safe(error: httpx.HTTPError) -> bool:
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return 400 <= error.response.status_code < 500
+    return False
+
+
 class IntaSendAPI:
     """IntaSend API integration for payment collection and disbursements."""
     
@@ -18,8 +41,10 @@ class IntaSendAPI:
         self.publishable_key = os.getenv('INTASEND_PUBLISHABLE_KEY')
         self.is_test = os.getenv('INTASEND_TEST_MODE', 'true').lower() == 'true'
         
-        # Set base URL based on environment
-        if self.is_test:
+        # Set base URL based on environment (INTASEND_BASE_URL overrides, e.g. for a local mock)
+        if os.getenv('INTASEND_BASE_URL'):
+            self.base_url = os.getenv('INTASEND_BASE_URL').rstrip('/')
+        elif self.is_test:
             self.base_url = "https://sandbox.intasend.com/api/v1"
         else:
             self.base_url = "https://payment.intasend.com/api/v1"
@@ -32,35 +57,87 @@ class IntaSendAPI:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
+        
+        # HTTP client configuration (seconds / connection counts)
+        self.timeout = float(os.getenv('INTASEND_HTTP_TIMEOUT', '15'))
+        self.connect_timeout = float(os.getenv('INTASEND_HTTP_CONNECT_TIMEOUT', '5'))
+        self.max_connections = int(os.getenv('INTASEND_HTTP_MAX_CONNECTIONS', '100'))
+        self.max_keepalive_connections = int(os.getenv('INTASEND_HTTP_MAX_KEEPALIVE', '20'))
+        self.keepalive_expiry = float(os.getenv('INTASEND_HTTP_KEEPALIVE_EXPIRY', '30'))
+        
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the shared keep-alive, connection-pooled HTTP client."""
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self._headers,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+        )
     
-    def _make_request(
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created on first use if the app lifespan has not started it."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+    
+    async def startup(self) -> None:
+        """Open the shared HTTP client. Called from the app lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and its pooled connections."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+    
+    async def _make_request(
         self, 
         method: str, 
         endpoint: str, 
-        data: Optional[Dict] = None
+        data: Optional[Dict] = None,
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
-        """Make HTTP request to IntaSend API."""
-        url = f"{self.base_url}/{endpoint}"
+        """
+        Make HTTP request to IntaSend API.
+        
+        Args:
+            method: HTTP method (GET or POST)
+            endpoint: Path relative to the API base URL
+            data: Query parameters (GET) or JSON body (POST)
+            timeout: Per-call timeout in seconds, overriding the client default
+        """
+        request_timeout = (
+            httpx.Timeout(timeout, connect=self.connect_timeout)
+            if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        )
         
         try:
             if method.upper() == "GET":
-                response = requests.get(url, headers=self._headers, params=data)
+                response = await self.client.get(endpoint, params=data, timeout=request_timeout)
             elif method.upper() == "POST":
-                response = requests.post(url, headers=self._headers, json=data)
+                response = await self.client.post(endpoint, json=data, timeout=request_timeout)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"IntaSend API request failed: {str(e)}")
-            if hasattr(e, 'response') and e.response is not None:
+            if isinstance(e, httpx.HTTPStatusError):
                 try:
                     error_detail = e.response.json()
                     logger.error(f"Error details: {error_detail}")
                 except:
                     logger.error(f"Response text: {e.response.text}")
-            raise Exception(f"IntaSend API error: {str(e)}")
+            raise IntaSendError(f"IntaSend API error: {str(e)}", retry_safe=_retry_safe(e)) from e
     
     def calculate_fees(self, amount: float) -> Dict[str, float]:
         """
@@ -133,7 +210,7 @@ class IntaSendAPI:
         logger.info(f"Initiating collection: {reference} for KES {amount} from {phone_number}")
         
         try:
-            response = self._make_request("POST", "payment/mpesa-stk-push/", payload)
+            response = await self._make_request("POST", "payment/mpesa-stk-push/", payload)
             logger.info(f"Collection initiated successfully: {response.get('id')}")
             return response
         except Exception as e:
@@ -151,7 +228,7 @@ class IntaSendAPI:
             Dict containing the collection status
         """
         try:
-            response = self._make_request("GET", f"payment/status/", {"id": collection_id})
+            response = await self._make_request("GET", f"payment/status/", {"id": collection_id})
             return response
         except Exception as e:
             logger.error(f"Status check failed: {str(e)}")
@@ -200,7 +277,7 @@ class IntaSendAPI:
         logger.info(f"Initiating payout: {reference} for KES {amount} to {phone_number}")
         
         try:
-            response = self._make_request("POST", "payouts/approve/", payload)
+            response = await self._make_request("POST", "payouts/approve/", payload)
             logger.info(f"Payout initiated successfully: {response.get('tracking_id')}")
             return response
         except Exception as e:
@@ -218,7 +295,7 @@ class IntaSendAPI:
             Dict containing the payout status
         """
         try:
-            response = self._make_request("GET", f"payouts/status/", {"tracking_id": tracking_id})
+            response = await self._make_request("GET", f"payouts/status/", {"tracking_id": tracking_id})
             return response
         except Exception as e:
             logger.error(f"Payout status check failed: {str(e)}")
@@ -232,18 +309,18 @@ class IntaSendAPI:
             Dict containing wallet balance information
         """
         try:
-            response = self._make_request("GET", "wallets/")
+            response = await self._make_request("GET", "wallets/")
             return response
         except Exception as e:
             logger.error(f"Wallet balance check failed: {str(e)}")
             raise
     
-    def validate_webhook_signature(self, payload: str, signature: str) -> bool:
+    def validate_webhook_signature(self, payload: Union[bytes, str], signature: str) -> bool:
         """
         Validate webhook signature from IntaSend.
         
         Args:
-            payload: Raw webhook payload
+            payload: Raw webhook body (bytes as received, so nothing is re-encoded)
             signature: Signature from X-IntaSend-Signature header
             
         Returns:
@@ -258,9 +335,12 @@ class IntaSendAPI:
             logger.warning("INTASEND_WEBHOOK_SECRET not configured")
             return False
         
+        if isinstance(payload, str):
+            payload = payload.encode()
+        
         expected_signature = hmac.new(
             webhook_secret.encode(),
-            payload.encode(),
+            payload,
             hashlib.sha256
         ).hexdigest()
         
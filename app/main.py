@@ -1,25 +1,85 @@
 import os
-from typing import List, Optional
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response, Header, Query
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from .models import (
-    Driver, Transaction, AdminStats, 
-    DriverRegistration, PaymentRequest, MpesaCallback
+    Driver, Transaction, AdminStats, TransactionPage,
+    DriverRegistration, PaymentRequest, MpesaCallback,
+    StatsGranularity, StatsTimeseries, VehicleType, QRTokenRevocation
 )
-from .supabase_util import SupabaseManager
+from .data_backend import create_data_manager
 from .mpesa import MpesaAPI
-from .qr_utils import generate_payment_qr
+from .qr_utils import (
+    render_qr_async, shutdown_render_pool, driver_qr_url, qr_etag, etag_matches,
+    QR_EXTENSIONS, QR_CONTENT_TYPES, QR_HTTP_MAX_AGE
+)
+from .qr_tokens import qr_token_signer, InvalidQRToken, RevokedQRToken
+from .qr_mirror import create_qr_mirror
+from .short_codes import ShortCodeIndex
+from .metrics import metrics
+from .cache import SWRCache
+from .pagination import paginate, InvalidCursor, DEFAULT_PAGE_SIZE, ADMIN_PAGE_SIZE, MAX_PAGE_SIZE
+from .stats import resolve_timeseries_range, InvalidStatsRange
+from .idempotency import (
+    create_payment_idempotency_store, derive_payment_key, request_fingerprint,
+    IdempotencyKeyConflict, IdempotencyInProgress
+)
+
+# Initialize M-Pesa API and Supabase
+mpesa_api = MpesaAPI()
+supabase_manager = create_data_manager()
+# Optional background copy of QR codes to Supabase Storage (QR_STORAGE_MIRROR)
+qr_mirror = create_qr_mirror(supabase_manager)
+# short_code -> driver_id for the /p/{code} URLs in QR codes, loaded at startup
+short_code_index = ShortCodeIndex(supabase_manager)
+
+# Collapses double-taps and client retries of /api/pay
+payment_idempotency = create_payment_idempotency_store(supabase_manager)
+IDEMPOTENCY_AUTO_WINDOW = float(os.getenv('IDEMPOTENCY_AUTO_WINDOW', '30'))
+
+# Admin stats and the first transactions page, refreshed in the background
+ADMIN_CACHE_TTL = float(os.getenv('ADMIN_CACHE_TTL', '5'))
+ADMIN_CACHE_MAX_STALE = float(os.getenv('ADMIN_CACHE_MAX_STALE', '60'))
+admin_stats_cache = SWRCache(
+    lambda: supabase_manager.get_admin_stats(),
+    ttl=ADMIN_CACHE_TTL, max_stale=ADMIN_CACHE_MAX_STALE, name="admin_stats_cache"
+)
+admin_transactions_cache = SWRCache(
+    lambda: supabase_manager.get_all_transactions(limit=ADMIN_PAGE_SIZE + 1),
+    ttl=ADMIN_CACHE_TTL, max_stale=ADMIN_CACHE_MAX_STALE, name="admin_transactions_cache"
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the data backend on startup; close shared clients on shutdown."""
+    await supabase_manager.startup()
+    await admin_stats_cache.start()
+    await admin_transactions_cache.start()
+    await qr_mirror.start()
+    await short_code_index.warm()
+    try:
+        yield
+    finally:
+        await admin_stats_cache.stop()
+        await admin_transactions_cache.stop()
+        await qr_mirror.stop()
+        await mpesa_api.aclose()
+        await supabase_manager.aclose()
+        shutdown_render_pool()
 
 # Initialize FastAPI app
-app = FastAPI(title="GoPay Payment Aggregator")
+app = FastAPI(title="GoPay Payment Aggregator", lifespan=lifespan)
 
 # Setup CORS
 app.add_middleware(
@@ -36,10 +96,6 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Setup templates
 templates = Jinja2Templates(directory="app/templates")
 
-# Initialize M-Pesa API and Supabase
-mpesa_api = MpesaAPI()
-supabase_manager = SupabaseManager()
-
 @app.post("/api/register_driver")
 async def register_driver(driver_data: DriverRegistration) -> dict:
     """Register a new driver and generate their payment QR code."""
@@ -57,14 +113,10 @@ async def register_driver(driver_data: DriverRegistration) -> dict:
         # Save driver to Supabase
         driver_id = await supabase_manager.create_driver(driver)
         
-        # Generate QR code
-        qr_bytes = generate_payment_qr(driver_id)
-        
-        # Upload QR code to Supabase Storage
-        qr_url = await supabase_manager.upload_qr_code(driver_id, qr_bytes)
-        
-        # Update driver with QR code URL
+        # QR code is served by /qr/{driver_id}.png
+        qr_url = driver_qr_url(driver_id)
         await supabase_manager.update_driver(driver_id, {"qr_code_url": qr_url})
+        qr_mirror.submit(driver_id, driver_data.phone)
         
         return {
             "status": "success",
@@ -82,6 +134,31 @@ async def get_driver(driver_id: str) -> Driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     return driver
 
+@app.get("/qr/{driver_id}.{extension}")
+async def driver_qr_image(request: Request, driver_id: str, extension: str) -> Response:
+    """
+    Driver payment QR code (.png or .svg), rendered on demand and cached.
+    
+    Responses carry a strong ETag and a long-lived Cache-Control; a matching
+    If-None-Match is answered with 304 without rendering.
+    """
+    fmt = QR_EXTENSIONS.get(extension)
+    if fmt is None:
+        raise HTTPException(status_code=404, detail="Unknown QR image format")
+    
+    driver = await supabase_manager.get_driver(driver_id)
+    if not driver:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    
+    payload = qr_token_signer.qr_payload(driver, driver.phone)
+    etag = qr_etag(payload, fmt)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={QR_HTTP_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    image = await render_qr_async(payload, fmt)
+    return Response(content=image, media_type=QR_CONTENT_TYPES[fmt], headers=headers)
+
 @app.get("/pay", response_class=HTMLResponse)
 async def payment_page(request: Request, driver_id: str, phone: str = None):
     """Render payment page for a driver."""
@@ -89,18 +166,88 @@ async def payment_page(request: Request, driver_id: str, phone: str = None):
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
+    return _render_payment_page(request, driver)
+
+def _render_payment_page(request: Request, driver) -> HTMLResponse:
+    """Payment page for a Driver (or the QRTokenClaims of a signed QR token)."""
+    # pay.html fills the passenger's number in from ?phone= itself
     return templates.TemplateResponse(
         "pay.html",
         {
             "request": request, 
-            "driver": driver,
-            "passenger_phone": phone
+            "driver": driver
         }
     )
 
+@app.get("/p/{short_code}", response_class=HTMLResponse)
+async def short_payment_page(request: Request, short_code: str, phone: str = None):
+    """
+    Payment page behind a driver's QR code (/p/<short_code>).
+    
+    The code is resolved from the in-memory short code index and the page
+    is rendered directly, without a redirect to /pay.
+    """
+    driver_id = await short_code_index.resolve(short_code)
+    if not driver_id:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    return await payment_page(request, driver_id, phone)
+
+@app.get("/t/{token}", response_class=HTMLResponse)
+async def token_payment_page(request: Request, token: str, phone: str = None):
+    """
+    Payment page behind a signed QR token (/t/<token>, QR_PAYLOAD=token).
+    
+    The driver's name and vehicle come from the verified token, so the page
+    renders without a database call.
+    """
+    try:
+        claims = qr_token_signer.verify(token)
+    except RevokedQRToken:
+        raise HTTPException(status_code=410, detail="This QR code has been revoked")
+    except InvalidQRToken:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    
+    return _render_payment_page(request, claims)
+
 @app.post("/api/pay")
-async def initiate_payment(payment: PaymentRequest) -> dict:
-    """Initiate M-Pesa STK push payment."""
+async def initiate_payment(
+    payment: PaymentRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None)
+) -> dict:
+    """
+    Initiate M-Pesa STK push payment.
+    
+    Duplicates (same Idempotency-Key, or same driver + phone + amount within
+    IDEMPOTENCY_AUTO_WINDOW seconds) get the first response instead of a
+    second STK push.
+    """
+    if idempotency_key:
+        if len(idempotency_key) > 200:
+            raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+        key = f"mpesa:{idempotency_key}"
+        fingerprint = request_fingerprint(payment.model_dump())
+        ttl = None
+    elif IDEMPOTENCY_AUTO_WINDOW > 0:
+        key = "mpesa:" + derive_payment_key(payment.driver_id, payment.passenger_phone, payment.amount)
+        fingerprint = key
+        ttl = IDEMPOTENCY_AUTO_WINDOW
+    else:
+        return await create_payment(payment)
+    
+    try:
+        result, replayed = await payment_idempotency.run(key, fingerprint, lambda: create_payment(payment), ttl=ttl)
+    except IdempotencyKeyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+async def create_payment(payment: PaymentRequest) -> dict:
+    """Create the transaction and send the STK push."""
     try:
         # Verify driver exists
         driver = await supabase_manager.get_driver(payment.driver_id)
@@ -174,39 +321,138 @@ async def driver_dashboard(request: Request, driver_id: str):
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
-    transactions = await supabase_manager.get_driver_transactions(driver_id)
+    rows = await supabase_manager.get_driver_transactions(driver_id, limit=DEFAULT_PAGE_SIZE + 1)
+    transactions, next_cursor = paginate(rows, DEFAULT_PAGE_SIZE)
     
     return templates.TemplateResponse(
         "driver_dashboard.html",
         {
             "request": request,
             "driver": driver,
-            "transactions": transactions
+            "transactions": transactions,
+            "next_cursor": next_cursor
         }
     )
 
 @app.get("/admin/dashboard", response_class=HTMLResponse)
 async def admin_dashboard(request: Request):
-    """Render admin dashboard."""
-    stats = await supabase_manager.get_admin_stats()
-    transactions = await supabase_manager.get_all_transactions()
+    """Render admin dashboard (served from the admin caches)."""
+    (stats, stats_age), (rows, rows_age) = await asyncio.gather(
+        admin_stats_cache.get(), admin_transactions_cache.get()
+    )
+    transactions, next_cursor = paginate(rows, ADMIN_PAGE_SIZE)
+    data_age = int(max(stats_age, rows_age))
     
     return templates.TemplateResponse(
         "admin_dashboard.html",
         {
             "request": request,
             "stats": stats,
-            "transactions": transactions
-        }
+            "transactions": transactions,
+            "next_cursor": next_cursor,
+            "data_age": data_age
+        },
+        headers={"Age": str(data_age)}
     )
 
+@app.post("/api/admin/qr_tokens/revoke")
+async def revoke_qr_tokens(revocation: QRTokenRevocation) -> dict:
+    """
+    Revoke a signed QR token, or every token of a driver.
+    
+    Revoking a token bumps its driver's qr_generation, so the driver's QR
+    code (/qr/{driver_id}.png) encodes a new token that can be reprinted.
+    
+    The denylist is in memory and per process: only the worker handling this
+    call rejects the token, which the response says. Add lasting
+    revocations to QR_TOKEN_DENYLIST so every worker loads them. Rotate keys
+    with QR_TOKEN_KEYS / QR_TOKEN_KEY_VERSION.
+    """
+    if not revocation.token and not revocation.driver_id:
+        raise HTTPException(status_code=400, detail="Provide token or driver_id")
+    try:
+        claims = qr_token_signer.revoke_token(revocation.token) if revocation.token else None
+        if revocation.driver_id:
+            qr_token_signer.revoke_driver(revocation.driver_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Reissue: the driver's QR code now encodes a new token, not the revoked one
+    reissued = False
+    if claims:
+        driver = await supabase_manager.get_driver(claims.id)
+        if driver and driver.qr_generation % 65536 == claims.generation:
+            await supabase_manager.update_driver(claims.id, {"qr_generation": driver.qr_generation + 1})
+            reissued = True
+    
+    return {
+        "status": "revoked",
+        "reissued": reissued,
+        "scope": "worker",
+        "message": "Revoked on this worker only; add the token or driver id to QR_TOKEN_DENYLIST so every worker rejects it"
+    }
+
 @app.get("/api/admin/stats")
-async def get_admin_stats() -> AdminStats:
-    """Get admin statistics."""
-    return await supabase_manager.get_admin_stats()
+async def get_admin_stats(response: Response) -> AdminStats:
+    """Get admin statistics; the Age header gives the data's age in seconds."""
+    stats, age = await admin_stats_cache.get()
+    response.headers["Age"] = str(int(age))
+    return stats
+
+@app.get("/api/admin/stats/timeseries")
+async def get_stats_timeseries(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    granularity: StatsGranularity = StatsGranularity.HOUR,
+    vehicle_type: Optional[VehicleType] = None
+) -> StatsTimeseries:
+    """Revenue and fees per hour or day in [from, to), from the rollup tables."""
+    try:
+        start, end = resolve_timeseries_range(start, end, granularity)
+    except InvalidStatsRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    buckets = await supabase_manager.get_stats_timeseries(
+        start, end, granularity, vehicle_type.value if vehicle_type else None
+    )
+    return StatsTimeseries(
+        start=start, end=end, granularity=granularity,
+        vehicle_type=vehicle_type, buckets=buckets
+    )
+
+@app.get("/api/admin/transactions")
+async def get_all_transactions(
+    response: Response,
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+) -> TransactionPage:
+    """Get all transactions, newest first (cursor paginated; first page cached)."""
+    if cursor is None and limit <= ADMIN_PAGE_SIZE:
+        rows, age = await admin_transactions_cache.get()
+        rows = rows[:limit + 1]
+        response.headers["Age"] = str(int(age))
+    else:
+        try:
+            rows = await supabase_manager.get_all_transactions(limit=limit + 1, cursor=cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    items, next_cursor = paginate(rows, limit)
+    return TransactionPage(items=items, next_cursor=next_cursor)
 
 @app.get("/api/driver/{driver_id}/transactions")
-async def get_driver_transactions(driver_id: str) -> List[Transaction]:
-    """Get transactions for a specific driver."""
-    return await supabase_manager.get_driver_transactions(driver_id)
+async def get_driver_transactions(
+    driver_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+) -> TransactionPage:
+    """Get transactions for a specific driver, newest first (cursor paginated)."""
+    try:
+        rows = await supabase_manager.get_driver_transactions(driver_id, limit=limit + 1, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items, next_cursor = paginate(rows, limit)
+    return TransactionPage(items=items, next_cursor=next_cursor)
 
+@app.get("/metrics")
+async def get_metrics() -> dict:
+    """In-process metrics (token cache hits, refreshes, ...)."""
+    return metrics.snapshot()
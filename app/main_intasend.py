@@ -1,36 +1,152 @@
 import os
+import asyncio
 import logging
-from typing import List
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Header
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Response, Header, Query
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import ValidationError
 
 from .models import (
     Driver, Transaction, AdminStats, 
     DriverRegistration, PaymentRequest, PaymentInitiateResponse,
-    IntaSendWebhook, TransactionStatusResponse, TransactionStatus,
-    Payout, PayoutStatus, PlatformFee
+    IntaSendWebhook, TransactionStatusResponse, TransactionStatus, BulkRegistrationResponse,
+    PayoutStatus, TransactionPage, PayoutPage,
+    StatsGranularity, StatsTimeseries, VehicleType, QRTokenRevocation
 )
-from .supabase_util import SupabaseManager
+from .data_backend import create_data_manager
 from .intasend import IntaSendAPI
-from .qr_utils import generate_payment_qr
+from .qr_utils import (
+    render_qr_async, shutdown_render_pool, driver_qr_url, qr_etag, etag_matches,
+    QR_EXTENSIONS, QR_CONTENT_TYPES, QR_HTTP_MAX_AGE
+)
+from .qr_tokens import qr_token_signer, InvalidQRToken, RevokedQRToken
+from .page_cache import PageCache, CachedPage
+from .qr_mirror import create_qr_mirror
+from .short_codes import ShortCodeIndex
+from .onboarding import create_bulk_onboarder, parse_driver_rows, BulkInputError
+from .metrics import metrics
+from .cache import SWRCache
+from .ids import uuid7
+from .pagination import paginate, InvalidCursor, DEFAULT_PAGE_SIZE, ADMIN_PAGE_SIZE, MAX_PAGE_SIZE
+from .stats import resolve_timeseries_range, InvalidStatsRange
+from .events import event_bus, format_sse, SubscriberLimitReached, FINAL_TRANSACTION_STATUSES
+from .webhook_ingest import WebhookIngestQueue, IngestQueueFull
+from .dedup import WebhookDeduplicator, webhook_event_key
+from .orphaned_collections import OrphanedCollectionStore
+from .idempotency import (
+    create_payment_idempotency_store, derive_payment_key, request_fingerprint,
+    IdempotencyKeyConflict, IdempotencyInProgress
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Initialize IntaSend API and Supabase
+intasend_api = IntaSendAPI()
+supabase_manager = create_data_manager()
+# Optional background copy of QR codes to Supabase Storage (QR_STORAGE_MIRROR)
+qr_mirror = create_qr_mirror(supabase_manager)
+# short_code -> driver_id for the /p/{code} URLs in QR codes, loaded at startup
+short_code_index = ShortCodeIndex(supabase_manager)
+# Rendered /pay pages; dropped whenever the driver cache invalidates a driver
+payment_page_cache = PageCache(
+    maxsize=int(os.getenv('PAGE_CACHE_SIZE', '2000')),
+    ttl=float(os.getenv('PAGE_CACHE_TTL', '30')),
+    name="payment_page_cache"
+)
+supabase_manager.driver_cache.add_invalidation_listener(payment_page_cache.invalidate_driver)
+
+# Collapses double-taps and client retries of /api/pay
+payment_idempotency = create_payment_idempotency_store(supabase_manager)
+# Payments without an Idempotency-Key are matched on driver + phone + amount
+# for this many seconds; 0 disables the derived key
+IDEMPOTENCY_AUTO_WINDOW = float(os.getenv('IDEMPOTENCY_AUTO_WINDOW', '30'))
+
+# Skips IntaSend retries of webhooks that were already processed
+webhook_dedup = WebhookDeduplicator(
+    supabase_manager,
+    maxsize=int(os.getenv('WEBHOOK_DEDUP_CACHE_SIZE', '100000')),
+    ttl=float(os.getenv('WEBHOOK_DEDUP_CACHE_TTL', '86400')),
+    retry_delay=float(os.getenv('WEBHOOK_IN_PROGRESS_RETRY_DELAY', '30'))
+)
+
+# STK pushes whose transaction insert failed, kept until they can be saved
+orphaned_collections = OrphanedCollectionStore(os.getenv('ORPHANED_COLLECTIONS_DIR', 'data/orphaned_collections'))
+# Insert retries after a failed insert when the STK push went out
+ORPHAN_INSERT_ATTEMPTS = int(os.getenv('ORPHAN_INSERT_ATTEMPTS', '3'))
+
+# Bulk driver onboarding (POST /api/register_drivers/bulk)
+BULK_REGISTRATION_MAX_ROWS = int(os.getenv('BULK_REGISTRATION_MAX_ROWS', '5000'))
+
+# Admin views are served stale-while-revalidate: a background task reloads
+# them every ADMIN_CACHE_TTL seconds so dashboard refreshes never wait on the DB
+ADMIN_CACHE_TTL = float(os.getenv('ADMIN_CACHE_TTL', '5'))
+ADMIN_CACHE_MAX_STALE = float(os.getenv('ADMIN_CACHE_MAX_STALE', '60'))
+admin_stats_cache = SWRCache(
+    lambda: supabase_manager.get_admin_stats(),
+    ttl=ADMIN_CACHE_TTL, max_stale=ADMIN_CACHE_MAX_STALE, name="admin_stats_cache"
+)
+# First page of /api/admin/transactions (one extra row to detect a next page)
+admin_transactions_cache = SWRCache(
+    lambda: supabase_manager.get_all_transactions(limit=ADMIN_PAGE_SIZE + 1),
+    ttl=ADMIN_CACHE_TTL, max_stale=ADMIN_CACHE_MAX_STALE, name="admin_transactions_cache"
+)
+
+# Webhook ingestion: events are spooled to disk and processed by a pool of
+# consumers, so the webhook endpoint acknowledges immediately
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '10'))
+webhook_queue = WebhookIngestQueue(
+    handler=lambda body, payload: process_webhook(body, payload),
+    spool_dir=os.getenv('WEBHOOK_SPOOL_DIR', 'data/webhook_spool'),
+    workers=int(os.getenv('WEBHOOK_INGEST_WORKERS', '8')),
+    queue_size=int(os.getenv('WEBHOOK_INGEST_QUEUE_SIZE', '1000')),
+    enqueue_timeout=float(os.getenv('WEBHOOK_ENQUEUE_TIMEOUT', '2')),
+    max_attempts=int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '3')),
+    fsync=os.getenv('WEBHOOK_SPOOL_FSYNC', 'true').lower() == 'true'
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared HTTP connection pools on startup and close them on shutdown."""
+    await intasend_api.startup()
+    await supabase_manager.startup()
+    await webhook_queue.start()
+    await admin_stats_cache.start()
+    await admin_transactions_cache.start()
+    await qr_mirror.start()
+    await short_code_index.warm()
+    await orphaned_collections.reconcile_all(supabase_manager)
+    try:
+        yield
+    finally:
+        await admin_stats_cache.stop()
+        await admin_transactions_cache.stop()
+        await qr_mirror.stop()
+        # Finish queued webhooks while the connection pools are still open
+        await webhook_queue.stop(drain_timeout=WEBHOOK_DRAIN_TIMEOUT)
+        await intasend_api.aclose()
+        await supabase_manager.aclose()
+        shutdown_render_pool()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="GoPay Payment Aggregator with IntaSend",
     description="QR-based payment collection with automatic driver payouts",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Setup CORS
@@ -48,78 +164,17 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Setup templates
 templates = Jinja2Templates(directory="app/templates")
 
-# Initialize IntaSend API and Supabase
-intasend_api = IntaSendAPI()
-supabase_manager = SupabaseManager()
-
+# Server-sent events settings (seconds)
+SSE_IDLE_TIMEOUT = float(os.getenv('SSE_IDLE_TIMEOUT', '120'))
+SSE_KEEPALIVE_INTERVAL = float(os.getenv('SSE_KEEPALIVE_INTERVAL', '15'))
+# Re-read the transaction this often while idle; 0 disables. Only needed when
+# webhooks may be handled by a different worker process than the stream.
+SSE_RECHECK_INTERVAL = float(os.getenv('SSE_RECHECK_INTERVAL', '0'))
 
-# === Background Tasks ===
 
-async def process_payout(transaction_id: str, driver_id: str, driver_phone: str, amount: float, driver_name: str):
-    """
-    Background task to process driver payout after successful collection.
-    This runs asynchronously after payment collection is confirmed.
-    """
-    try:
-        logger.info(f"Processing payout for transaction {transaction_id}")
-        
-        # Create payout record
-        payout = Payout(
-            transaction_id=transaction_id,
-            driver_id=driver_id,
-            amount=amount,
-            status=PayoutStatus.PENDING
-        )
-        payout_id = await supabase_manager.create_payout(payout)
-        logger.info(f"Payout record created: {payout_id}")
-        
-        # Initiate payout via IntaSend
-        payout_response = await intasend_api.initiate_payout(
-            phone_number=driver_phone,
-            amount=amount,
-            reference=transaction_id,
-            name=driver_name
-        )
-        
-        tracking_id = payout_response.get('tracking_id')
-        
-        if tracking_id:
-            # Update payout record with tracking ID
-            await supabase_manager.update_payout_status(
-                payout_id=payout_id,
-                status=PayoutStatus.PROCESSING,
-                tracking_id=tracking_id,
-                intasend_response=payout_response
-            )
-            
-            # Update transaction with payout details
-            await supabase_manager.update_transaction_payout(
-                transaction_id=transaction_id,
-                tracking_id=tracking_id,
-                payout_status='processing',
-                payout_response=payout_response
-            )
-            
-            logger.info(f"Payout initiated successfully. Tracking ID: {tracking_id}")
-        else:
-            raise Exception("No tracking ID in payout response")
-            
-    except Exception as e:
-        logger.error(f"Payout processing failed: {str(e)}")
-        # Update payout status to failed
-        try:
-            await supabase_manager.update_payout_status(
-                payout_id=payout_id,
-                status=PayoutStatus.FAILED,
-                failure_reason=str(e)
-            )
-            await supabase_manager.update_transaction_payout(
-                transaction_id=transaction_id,
-                tracking_id='',
-                payout_status='failed'
-            )
-        except:
-            pass
+def publish_transaction_event(transaction_id: str, status: str, **fields) -> None:
+    """Push a transaction status change to open event streams."""
+    event_bus.publish(transaction_id, {"transaction_id": transaction_id, "status": status, **fields})
 
 
 # === API Routes ===
@@ -136,11 +191,16 @@ async def root():
             <h2>API Endpoints:</h2>
             <ul>
                 <li><code>POST /api/register_driver</code> - Register new driver</li>
+                <li><code>POST /api/register_drivers/bulk</code> - Register many drivers (JSON or CSV)</li>
                 <li><code>GET /api/driver/{driver_id}</code> - Get driver details</li>
+                <li><code>GET /qr/{driver_id}.png</code> - Driver payment QR code (.png or .svg)</li>
                 <li><code>GET /pay?driver_id={id}&phone={phone}</code> - Payment page</li>
+                <li><code>GET /p/{short_code}</code> - Payment page (QR code short URL)</li>
                 <li><code>POST /api/pay</code> - Initiate payment collection</li>
                 <li><code>POST /api/webhooks/intasend</code> - IntaSend webhook handler</li>
                 <li><code>GET /api/transaction/{id}/status</code> - Check transaction status</li>
+                <li><code>GET /api/transaction/{id}</code> - Full transaction details</li>
+                <li><code>GET /api/admin/transactions?cursor=</code> - All transactions (paginated)</li>
                 <li><code>GET /driver/{driver_id}/dashboard</code> - Driver dashboard</li>
                 <li><code>GET /admin/dashboard</code> - Admin dashboard</li>
             </ul>
@@ -173,14 +233,10 @@ async def register_driver(driver_data: DriverRegistration) -> dict:
         driver_id = await supabase_manager.create_driver(driver)
         logger.info(f"Driver registered: {driver_id}")
         
-        # Generate QR code with driver's phone pre-filled
-        qr_bytes = generate_payment_qr(driver_id, driver_data.phone)
-        
-        # Upload QR code to Supabase Storage
-        qr_url = await supabase_manager.upload_qr_code(driver_id, qr_bytes)
-        
-        # Update driver with QR code URL
+        # QR code (driver's phone pre-filled) is served by /qr/{driver_id}.png
+        qr_url = driver_qr_url(driver_id)
         await supabase_manager.update_driver(driver_id, {"qr_code_url": qr_url})
+        qr_mirror.submit(driver_id, driver_data.phone)
         
         return {
             "status": "success",
@@ -193,6 +249,28 @@ async def register_driver(driver_data: DriverRegistration) -> dict:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/register_drivers/bulk", response_model=BulkRegistrationResponse)
+async def register_drivers_bulk(request: Request) -> BulkRegistrationResponse:
+    """
+    Register many drivers at once (e.g. a SACCO fleet).
+    
+    Send a JSON list of driver objects, or CSV with Content-Type text/csv
+    and a header row: name,phone,email,vehicle_type,vehicle_number.
+    Returns one result per row; rows that fail do not affect the others.
+    """
+    try:
+        rows = parse_driver_rows(await request.body(), request.headers.get("content-type", ""))
+    except BulkInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(rows) > BULK_REGISTRATION_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_REGISTRATION_MAX_ROWS} drivers per request"
+        )
+    
+    return await create_bulk_onboarder(supabase_manager).register(rows)
+
+
 @app.get("/api/driver/{driver_id}", response_model=Driver)
 async def get_driver(driver_id: str) -> Driver:
     """Get driver details by ID."""
@@ -202,6 +280,32 @@ async def get_driver(driver_id: str) -> Driver:
     return driver
 
 
+@app.get("/qr/{driver_id}.{extension}")
+async def driver_qr_image(request: Request, driver_id: str, extension: str) -> Response:
+    """
+    Driver payment QR code (.png or .svg), rendered on demand and cached.
+    
+    Responses carry a strong ETag and a long-lived Cache-Control; a matching
+    If-None-Match is answered with 304 without rendering.
+    """
+    fmt = QR_EXTENSIONS.get(extension)
+    if fmt is None:
+        raise HTTPException(status_code=404, detail="Unknown QR image format")
+    
+    driver = await supabase_manager.get_driver(driver_id)
+    if not driver:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    
+    payload = qr_token_signer.qr_payload(driver, driver.phone)
+    etag = qr_etag(payload, fmt)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={QR_HTTP_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    image = await render_qr_async(payload, fmt)
+    return Response(content=image, media_type=QR_CONTENT_TYPES[fmt], headers=headers)
+
+
 @app.get("/pay", response_class=HTMLResponse)
 async def payment_page(request: Request, driver_id: str, phone: str = None, mode: str = "backend"):
     """
@@ -210,12 +314,41 @@ async def payment_page(request: Request, driver_id: str, phone: str = None, mode
     Passengers access this page by scanning the driver's QR code.
     The phone parameter can be pre-filled for better UX.
     
+    Rendered pages are cached per driver, mode and whether a phone is
+    pre-filled (the page fills the number in from the URL), so repeat scans
+    skip the database and Jinja entirely.
+    
     Args:
         mode: "backend" for server-side STK push, "inline" for IntaSend SDK
     """
-    driver = await supabase_manager.get_driver(driver_id)
-    if not driver:
-        raise HTTPException(status_code=404, detail="Driver not found")
+    mode = "inline" if mode == "inline" else "backend"
+    variant = (mode, bool(phone), None)
+    settings = _payment_page_settings(request)
+    page = payment_page_cache.get(driver_id, variant, settings)
+    if page is None:
+        generation = payment_page_cache.generation
+        driver = await supabase_manager.get_driver(driver_id)
+        if not driver:
+            raise HTTPException(status_code=404, detail="Driver not found")
+        page = _render_payment_page(request, driver, variant, settings, generation)
+    
+    return _payment_page_response(request, page)
+
+
+def _payment_page_settings(request: Request) -> tuple:
+    """Everything besides the driver a cached payment page depends on."""
+    return (
+        intasend_api.platform_fee_percentage,
+        intasend_api.platform_fee_fixed,
+        intasend_api.publishable_key,
+        intasend_api.is_test,
+        str(request.base_url)  # url_for() in the templates renders absolute URLs
+    )
+
+
+def _render_payment_page(request: Request, driver, variant: tuple, settings: tuple, generation: int) -> CachedPage:
+    """Render and cache the payment page for a Driver (or the QRTokenClaims of a signed QR token)."""
+    mode, phone_prefilled, _ = variant
     
     # Calculate fee information for display
     fee_info = intasend_api.calculate_fees(100)  # Example for 100 KES
@@ -223,32 +356,123 @@ async def payment_page(request: Request, driver_id: str, phone: str = None, mode
     # Choose template based on mode
     template_name = "pay_inline.html" if mode == "inline" else "pay.html"
     
-    return templates.TemplateResponse(
-        template_name,
-        {
-            "request": request, 
-            "driver": driver,
-            "passenger_phone": phone,
-            "platform_fee_percentage": fee_info['fee_percentage'],
-            "publishable_key": intasend_api.publishable_key,
-            "is_test_mode": intasend_api.is_test
-        }
-    )
+    html = templates.get_template(template_name).render({
+        "request": request, 
+        "driver": driver,
+        "phone_prefilled": phone_prefilled,
+        "platform_fee_percentage": fee_info['fee_percentage'],
+        "publishable_key": intasend_api.publishable_key,
+        "is_test_mode": intasend_api.is_test
+    })
+    return payment_page_cache.put(driver.id, variant, settings, html, generation)
+
+
+def _payment_page_response(request: Request, page: CachedPage) -> Response:
+    """Serve a cached page in the best encoding the client accepts; 304 on a matching ETag."""
+    body, encoding, etag = page.variant(request.headers.get("accept-encoding", ""))
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="text/html; charset=utf-8", headers=headers)
+
+
+@app.get("/p/{short_code}", response_class=HTMLResponse)
+async def short_payment_page(request: Request, short_code: str, phone: str = None, mode: str = "backend"):
+    """
+    Payment page behind a driver's QR code (/p/<short_code>).
+    
+    The code is resolved from the in-memory short code index and the page
+    is rendered directly, without a redirect to /pay.
+    """
+    driver_id = await short_code_index.resolve(short_code)
+    if not driver_id:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    return await payment_page(request, driver_id, phone, mode)
+
+
+@app.get("/t/{token}", response_class=HTMLResponse)
+async def token_payment_page(request: Request, token: str, phone: str = None, mode: str = "backend"):
+    """
+    Payment page behind a signed QR token (/t/<token>, QR_PAYLOAD=token).
+    
+    The driver's name and vehicle come from the verified token, so the page
+    renders without a database call; the driver is loaded by /api/pay.
+    """
+    try:
+        claims = qr_token_signer.verify(token)
+    except RevokedQRToken:
+        raise HTTPException(status_code=410, detail="This QR code has been revoked")
+    except InvalidQRToken:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    
+    mode = "inline" if mode == "inline" else "backend"
+    # Tokens carry their own name/vehicle, so each token gets its own page
+    variant = (mode, bool(phone), token)
+    settings = _payment_page_settings(request)
+    page = payment_page_cache.get(claims.id, variant, settings)
+    if page is None:
+        page = _render_payment_page(request, claims, variant, settings, payment_page_cache.generation)
+    
+    return _payment_page_response(request, page)
 
 
 @app.post("/api/pay", response_model=PaymentInitiateResponse)
-async def initiate_payment(payment: PaymentRequest, background_tasks: BackgroundTasks) -> PaymentInitiateResponse:
+async def initiate_payment(
+    payment: PaymentRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None)
+) -> PaymentInitiateResponse:
     """
     Initiate payment collection via IntaSend STK Push.
     
+    Send an Idempotency-Key header to make retries safe: duplicates wait
+    for the first request and get its response (marked with an
+    Idempotent-Replayed header) instead of a second STK push. Without the
+    header, the same driver + phone + amount within IDEMPOTENCY_AUTO_WINDOW
+    seconds is treated as a duplicate.
+    """
+    if idempotency_key:
+        if len(idempotency_key) > 200:
+            raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+        key = f"pay:{idempotency_key}"
+        fingerprint = request_fingerprint(payment.model_dump())
+        ttl = None
+    elif IDEMPOTENCY_AUTO_WINDOW > 0:
+        key = derive_payment_key(payment.driver_id, payment.passenger_phone, payment.amount)
+        fingerprint = key
+        ttl = IDEMPOTENCY_AUTO_WINDOW
+    else:
+        return await create_payment(payment)
+    
+    async def run_payment() -> dict:
+        return (await create_payment(payment)).model_dump()
+    
+    try:
+        result, replayed = await payment_idempotency.run(key, fingerprint, run_payment, ttl=ttl)
+    except IdempotencyKeyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return PaymentInitiateResponse(**result)
+
+
+async def create_payment(payment: PaymentRequest) -> PaymentInitiateResponse:
+    """
+    Create the transaction and send the STK push.
+    
     Workflow:
     1. Verify driver exists
     2. Calculate platform fee and driver amount
-    3. Create transaction record
-    4. Initiate IntaSend collection
+    3. Create transaction record and initiate IntaSend collection (concurrently)
+    4. Store the collection ID
     5. Return response to frontend
     6. Wait for webhook to confirm payment
-    7. Automatically initiate payout to driver (background task)
+    7. Payout to driver is queued and sent by the payout worker
     """
     try:
         # Verify driver exists
@@ -263,9 +487,13 @@ async def initiate_payment(payment: PaymentRequest, background_tasks: Background
         
         logger.info(f"Payment initiated: {payment.amount} KES - Fee: {platform_fee} - Driver: {driver_amount}")
         
+        # Time-ordered id generated here, so the insert does not have to
+        # finish before the STK push can reference it
+        transaction_id = uuid7()
+        
         # Create pending transaction
         transaction = Transaction(
-            id="",  # Will be set by Supabase
+            id=transaction_id,
             driver_id=payment.driver_id,
             passenger_phone=payment.passenger_phone,
             amount_paid=payment.amount,
@@ -276,20 +504,50 @@ async def initiate_payment(payment: PaymentRequest, background_tasks: Background
             fee_fixed=fee_breakdown['fee_fixed']
         )
         
-        # Save transaction
-        transaction_id = await supabase_manager.create_transaction_with_intasend(transaction)
-        logger.info(f"Transaction created: {transaction_id}")
-        
-        # Initiate IntaSend collection (STK Push)
-        collection_response = await intasend_api.initiate_collection(
-            phone_number=payment.passenger_phone,
-            amount=payment.amount,
-            reference=transaction_id,
-            email=payment.passenger_email,
-            name=payment.passenger_name
+        # Save transaction and initiate IntaSend collection (STK Push) concurrently.
+        # The passenger still has to confirm on the phone, so the webhook
+        # arrives long after the insert has committed.
+        insert_result, collection_response = await asyncio.gather(
+            supabase_manager.create_transaction_with_intasend(transaction),
+            intasend_api.initiate_collection(
+                phone_number=payment.passenger_phone,
+                amount=payment.amount,
+                reference=transaction_id,
+                email=payment.passenger_email,
+                name=payment.passenger_name
+            ),
+            return_exceptions=True
         )
         
+        if isinstance(collection_response, BaseException):
+            if isinstance(insert_result, BaseException):
+                raise insert_result
+            raise collection_response
+        
         collection_id = collection_response.get('id')
+        saved = True
+        if isinstance(insert_result, BaseException):
+            # The passenger is being charged: the transaction must exist
+            # for the collection webhook, so it is not given up on here
+            logger.error(
+                f"STK push {collection_id} sent for transaction {transaction_id} "
+                f"but the transaction was not saved: {str(insert_result)}"
+            )
+            saved = await save_transaction_after_push(transaction, collection_response)
+        else:
+            logger.info(f"Transaction created: {transaction_id}")
+        
+        if collection_id and not saved:
+            # Recorded in orphaned_collections; the webhook reconciles it
+            return PaymentInitiateResponse(
+                status="success",
+                transaction_id=transaction_id,
+                collection_id=collection_id,
+                message="Payment request sent. Please check your phone for M-Pesa prompt.",
+                amount=payment.amount,
+                platform_fee=platform_fee,
+                driver_amount=driver_amount
+            )
         
         if collection_id:
             # Update transaction with collection ID
@@ -319,10 +577,43 @@ async def initiate_payment(payment: PaymentRequest, background_tasks: Background
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def save_transaction_after_push(transaction: Transaction, collection_response: dict) -> bool:
+    """
+    Retry saving a transaction whose STK push already went out, with the
+    collection id filled in. Returns False when it still could not be saved;
+    it is then kept in orphaned_collections for the webhook to reconcile.
+    """
+    transaction = transaction.model_copy(update={
+        "intasend_collection_id": collection_response.get('id'),
+        "collection_status": 'pending',
+        "collection_response": collection_response
+    })
+    
+    for attempt in range(1, ORPHAN_INSERT_ATTEMPTS + 1):
+        await asyncio.sleep(0.2 * 2 ** (attempt - 1))
+        try:
+            # The failed insert may have committed after all
+            if await supabase_manager.get_transaction(transaction.id) is None:
+                await supabase_manager.create_transaction_with_intasend(transaction)
+            logger.info(f"Transaction {transaction.id} saved on retry {attempt}")
+            return True
+        except Exception as e:
+            logger.warning(f"Saving transaction {transaction.id} failed (retry {attempt}/{ORPHAN_INSERT_ATTEMPTS}): {str(e)}")
+    
+    try:
+        await orphaned_collections.save(transaction)
+    except OSError as e:
+        logger.critical(
+            f"Transaction {transaction.id} (collection {transaction.intasend_collection_id}) "
+            f"could not be saved or recorded: {str(e)}"
+        )
+        raise
+    return False
+
+
 @app.post("/api/webhooks/intasend")
 async def intasend_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
     x_intasend_signature: str = Header(None)
 ):
     """
@@ -331,96 +622,132 @@ async def intasend_webhook(
     This endpoint receives real-time updates from IntaSend when:
     - Payment collection is completed/failed
     - Payout is completed/failed
+    
+    The event is verified, written to the ingest spool and acknowledged
+    straight away; processing happens in the background consumers.
     """
+    # Get raw body for signature verification
+    body = await request.body()
+    
+    # Verify webhook signature (if configured) over the raw bytes
+    if x_intasend_signature and os.getenv('INTASEND_WEBHOOK_SECRET'):
+        is_valid = intasend_api.validate_webhook_signature(body, x_intasend_signature)
+        if not is_valid:
+            logger.warning("Invalid webhook signature")
+            raise HTTPException(status_code=401, detail="Invalid signature")
+    
+    # Parse once, straight into the model
+    try:
+        webhook = IntaSendWebhook.model_validate_json(body)
+    except ValidationError as e:
+        logger.error(f"Invalid webhook payload: {str(e)}")
+        # Return 200 to prevent IntaSend from retrying
+        return {"status": "error", "message": "Invalid webhook payload"}
+    
+    logger.info(f"Webhook received: {webhook.state} - {webhook.api_ref}")
+    
+    # Retries of an event this process already handled need no spooling
+    event_key = webhook_event_key(webhook.id or webhook.invoice_id or webhook.tracking_id, webhook.state)
+    if event_key and webhook_dedup.seen(event_key):
+        metrics.incr("webhook_dedup.duplicates_memory")
+        return {"status": "duplicate", "message": "Webhook already processed"}
+    
+    # Events for the same transaction / payout are processed in order
+    partition_key = webhook.api_ref or webhook.tracking_id or ''
+    try:
+        await webhook_queue.enqueue(body, partition_key, webhook)
+    except IngestQueueFull:
+        logger.warning("Webhook queue full, asking IntaSend to retry")
+        raise HTTPException(status_code=503, detail="Webhook queue full, retry later")
+    
+    return {"status": "accepted", "message": "Webhook queued"}
+
+
+async def process_webhook(body: bytes, webhook: Optional[IntaSendWebhook] = None):
+    """Process one queued webhook (called by the ingest consumers)."""
+    if webhook is None:
+        # Replayed from the spool after a restart
+        webhook = IntaSendWebhook.model_validate_json(body)
+    
+    # Short-circuit provider retries before any other database call; an event
+    # claimed by another consumer raises WebhookInProgress and stays spooled
+    event_key = webhook_event_key(webhook.id or webhook.invoice_id or webhook.tracking_id, webhook.state)
+    if event_key and not await webhook_dedup.claim(event_key):
+        logger.info(f"Duplicate webhook {event_key}, skipping")
+        return
+    
     try:
-        # Get raw body for signature verification
-        body = await request.body()
-        body_str = body.decode('utf-8')
-        
-        # Verify webhook signature (if configured)
-        if x_intasend_signature and os.getenv('INTASEND_WEBHOOK_SECRET'):
-            is_valid = intasend_api.validate_webhook_signature(body_str, x_intasend_signature)
-            if not is_valid:
-                logger.warning("Invalid webhook signature")
-                raise HTTPException(status_code=401, detail="Invalid signature")
-        
-        # Parse webhook data
-        webhook_data = await request.json()
-        logger.info(f"Webhook received: {webhook_data.get('state')} - {webhook_data.get('api_ref')}")
-        
-        webhook = IntaSendWebhook(**webhook_data)
-        
         # Determine if this is a collection or payout webhook
         if webhook.api_ref:
             # This is a collection webhook
-            await handle_collection_webhook(webhook, background_tasks)
+            await handle_collection_webhook(webhook)
         elif webhook.tracking_id:
             # This is a payout webhook
             await handle_payout_webhook(webhook)
         else:
-            logger.warning(f"Unknown webhook type: {webhook_data}")
-        
-        return {"status": "success", "message": "Webhook processed"}
-        
-    except Exception as e:
-        logger.error(f"Webhook processing failed: {str(e)}")
-        # Return 200 to prevent IntaSend from retrying
-        return {"status": "error", "message": str(e)}
+            logger.warning(f"Unknown webhook type: {webhook.payload}")
+    except Exception:
+        if event_key:
+            await webhook_dedup.release(event_key)
+        raise
+    
+    if event_key:
+        await webhook_dedup.complete(event_key)
 
 
-async def handle_collection_webhook(webhook: IntaSendWebhook, background_tasks: BackgroundTasks):
+async def handle_collection_webhook(webhook: IntaSendWebhook):
     """Handle payment collection webhook."""
     transaction_id = webhook.api_ref
     state = webhook.state.upper()
     
-    # Get transaction
-    transaction = await supabase_manager.get_transaction(transaction_id)
-    if not transaction:
-        logger.error(f"Transaction not found: {transaction_id}")
-        return
-    
     # Update transaction based on state
     if state == "COMPLETE":
-        # Payment collected successfully
-        await supabase_manager.update_transaction_collection(
+        # Payment collected successfully: one RPC updates the transaction,
+        # records the platform fee and creates the pending payout, which a
+        # database trigger enqueues for the payout worker (app.payout_worker)
+        completion = await supabase_manager.complete_collection(
             transaction_id=transaction_id,
             collection_id=webhook.id or webhook.invoice_id,
-            collection_status='completed',
-            collection_response=webhook.model_dump()
-        )
-        
-        # Record platform fee
-        platform_fee = PlatformFee(
-            transaction_id=transaction_id,
-            amount=transaction.platform_fee,
-            fee_type="percentage",
-            percentage_applied=transaction.fee_percentage,
-            fixed_amount_applied=transaction.fee_fixed
+            collection_response=webhook.payload
         )
-        await supabase_manager.create_platform_fee(platform_fee)
+        if not completion and await orphaned_collections.reconcile(supabase_manager, transaction_id):
+            # The STK push went out but the insert failed; it is saved now
+            completion = await supabase_manager.complete_collection(
+                transaction_id=transaction_id,
+                collection_id=webhook.id or webhook.invoice_id,
+                collection_response=webhook.payload
+            )
+        if not completion:
+            # Not acked: after the ingest retries the event is kept in the
+            # spool's failed directory for reconciliation
+            raise Exception(f"Transaction not found for completed collection: {transaction_id}")
         
-        # Get driver details for payout
-        driver = await supabase_manager.get_driver(transaction.driver_id)
+        if completion.already_completed:
+            logger.info(f"Collection already completed for transaction {transaction_id}, ignoring")
+            return
         
-        # Schedule automatic payout in background
-        background_tasks.add_task(
-            process_payout,
-            transaction_id=transaction_id,
-            driver_id=transaction.driver_id,
-            driver_phone=driver.phone,
-            amount=transaction.driver_amount,
-            driver_name=driver.name
+        publish_transaction_event(
+            transaction_id,
+            TransactionStatus.PAYOUT_PENDING.value,
+            collection_status='completed'
         )
-        
-        logger.info(f"Payment collected. Payout scheduled for {transaction.driver_amount} KES")
+        logger.info(f"Payment collected. Payout {completion.payout_id} queued for {completion.driver_amount} KES")
         
     elif state == "FAILED":
         # Payment failed
-        await supabase_manager.update_transaction_collection(
+        updated = await supabase_manager.update_transaction_collection(
             transaction_id=transaction_id,
             collection_id=webhook.id or webhook.invoice_id,
             collection_status='failed',
-            collection_response=webhook.model_dump()
+            collection_response=webhook.payload
+        )
+        if not updated:
+            logger.error(f"Transaction not found: {transaction_id}")
+            return
+        publish_transaction_event(
+            transaction_id,
+            TransactionStatus.FAILED.value,
+            collection_status='failed'
         )
         logger.info(f"Payment failed for transaction {transaction_id}")
 
@@ -441,23 +768,30 @@ async def handle_payout_webhook(webhook: IntaSendWebhook):
         await supabase_manager.update_payout_status(
             payout_id=payout.id,
             status=PayoutStatus.COMPLETED,
-            intasend_response=webhook.model_dump()
+            intasend_response=webhook.payload
         )
         
         await supabase_manager.update_transaction_payout(
             transaction_id=payout.transaction_id,
             tracking_id=tracking_id,
             payout_status='completed',
-            payout_response=webhook.model_dump()
+            payout_response=webhook.payload
         )
+        # The payout added a driver_ledger entry; show the new balance right away
+        supabase_manager.driver_cache.invalidate(payout.driver_id)
         
+        publish_transaction_event(
+            payout.transaction_id,
+            TransactionStatus.PAYOUT_COMPLETED.value,
+            payout_status='completed'
+        )
         logger.info(f"Payout completed: {payout.amount} KES to driver {payout.driver_id}")
         
     elif state == "FAILED":
         await supabase_manager.update_payout_status(
             payout_id=payout.id,
             status=PayoutStatus.FAILED,
-            intasend_response=webhook.model_dump(),
+            intasend_response=webhook.payload,
             failure_reason=f"IntaSend payout failed: {state}"
         )
         
@@ -465,9 +799,14 @@ async def handle_payout_webhook(webhook: IntaSendWebhook):
             transaction_id=payout.transaction_id,
             tracking_id=tracking_id,
             payout_status='failed',
-            payout_response=webhook.model_dump()
+            payout_response=webhook.payload
         )
         
+        publish_transaction_event(
+            payout.transaction_id,
+            TransactionStatus.PAYOUT_FAILED.value,
+            payout_status='failed'
+        )
         logger.error(f"Payout failed for driver {payout.driver_id}")
 
 
@@ -477,22 +816,112 @@ async def get_transaction_status(transaction_id: str) -> TransactionStatusRespon
     Get current status of a transaction.
     
     Returns detailed information about payment collection and payout status.
+    Only the status columns are read; use /api/transaction/{id} for the full
+    record including provider payloads.
     """
+    status = await supabase_manager.get_transaction_status(transaction_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    return status
+
+
+@app.get("/api/transaction/{transaction_id}", response_model=Transaction)
+async def get_transaction(transaction_id: str) -> Transaction:
+    """Get the full transaction record, including IntaSend collection/payout responses."""
     transaction = await supabase_manager.get_transaction(transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    return TransactionStatusResponse(
-        transaction_id=transaction.id,
-        status=transaction.status,
-        collection_status=transaction.collection_status,
-        payout_status=transaction.payout_status,
-        amount_paid=transaction.amount_paid,
-        platform_fee=transaction.platform_fee,
-        driver_amount=transaction.driver_amount,
-        created_at=transaction.created_at,
-        collection_completed_at=transaction.collection_completed_at,
-        payout_completed_at=transaction.payout_completed_at
+    return transaction
+
+
+def _transaction_event(status: TransactionStatusResponse) -> dict:
+    """Status snapshot sent as the first event of a stream."""
+    return {
+        "transaction_id": status.transaction_id,
+        "status": status.status.value,
+        "collection_status": status.collection_status,
+        "payout_status": status.payout_status
+    }
+
+
+@app.get("/api/transaction/{transaction_id}/events")
+async def transaction_events(request: Request, transaction_id: str):
+    """
+    Stream transaction status changes as server-sent events.
+    
+    Sends the current status first, then every change published by the
+    webhook handlers. The stream ends once the transaction reaches a final
+    status or after SSE_IDLE_TIMEOUT seconds without events (EventSource
+    reconnects automatically and receives a fresh snapshot).
+    """
+    # Subscribe before reading the snapshot so no event can slip in between
+    try:
+        queue = event_bus.subscribe(transaction_id)
+    except SubscriberLimitReached as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    try:
+        transaction = await supabase_manager.get_transaction_status(transaction_id)
+    except Exception:
+        event_bus.unsubscribe(transaction_id, queue)
+        raise
+    if not transaction:
+        event_bus.unsubscribe(transaction_id, queue)
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    async def stream():
+        loop = asyncio.get_running_loop()
+        try:
+            snapshot = _transaction_event(transaction)
+            yield f"retry: 3000\n{format_sse('status', snapshot)}"
+            if snapshot["status"] in FINAL_TRANSACTION_STATUSES:
+                return
+            
+            last_status = snapshot["status"]
+            idle_deadline = loop.time() + SSE_IDLE_TIMEOUT
+            next_recheck = loop.time() + SSE_RECHECK_INTERVAL
+            while True:
+                now = loop.time()
+                if now >= idle_deadline:
+                    yield format_sse('timeout', {"transaction_id": transaction_id})
+                    return
+                
+                wait = min(SSE_KEEPALIVE_INTERVAL, idle_deadline - now)
+                if SSE_RECHECK_INTERVAL > 0:
+                    wait = min(wait, max(next_recheck - now, 0))
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=wait)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    if SSE_RECHECK_INTERVAL > 0 and loop.time() >= next_recheck:
+                        next_recheck = loop.time() + SSE_RECHECK_INTERVAL
+                        current = await supabase_manager.get_transaction_status(transaction_id)
+                        if current and current.status.value != last_status:
+                            event = _transaction_event(current)
+                        else:
+                            continue
+                    else:
+                        yield ": keepalive\n\n"
+                        continue
+                
+                last_status = event["status"]
+                idle_deadline = loop.time() + SSE_IDLE_TIMEOUT
+                yield format_sse('status', event)
+                if event["status"] in FINAL_TRANSACTION_STATUSES:
+                    return
+        finally:
+            event_bus.unsubscribe(transaction_id, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
     )
 
 
@@ -503,7 +932,8 @@ async def driver_dashboard(request: Request, driver_id: str):
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
-    transactions = await supabase_manager.get_driver_transactions(driver_id)
+    rows = await supabase_manager.get_driver_transactions(driver_id, limit=DEFAULT_PAGE_SIZE + 1)
+    transactions, next_cursor = paginate(rows, DEFAULT_PAGE_SIZE)
     payouts = await supabase_manager.get_driver_payouts(driver_id)
     
     return templates.TemplateResponse(
@@ -512,6 +942,7 @@ async def driver_dashboard(request: Request, driver_id: str):
             "request": request,
             "driver": driver,
             "transactions": transactions,
+            "next_cursor": next_cursor,
             "payouts": payouts
         }
     )
@@ -519,36 +950,153 @@ async def driver_dashboard(request: Request, driver_id: str):
 
 @app.get("/admin/dashboard", response_class=HTMLResponse)
 async def admin_dashboard(request: Request):
-    """Render admin dashboard with platform statistics."""
-    stats = await supabase_manager.get_admin_stats()
-    transactions = await supabase_manager.get_all_transactions()
+    """Render admin dashboard with platform statistics (served from the admin caches)."""
+    (stats, stats_age), (rows, rows_age) = await asyncio.gather(
+        admin_stats_cache.get(), admin_transactions_cache.get()
+    )
+    transactions, next_cursor = paginate(rows, ADMIN_PAGE_SIZE)
+    data_age = int(max(stats_age, rows_age))
     
     return templates.TemplateResponse(
         "admin_dashboard.html",
         {
             "request": request,
             "stats": stats,
-            "transactions": transactions
-        }
+            "transactions": transactions,
+            "next_cursor": next_cursor,
+            "data_age": data_age
+        },
+        headers={"Age": str(data_age)}
     )
 
 
+@app.post("/api/admin/qr_tokens/revoke")
+async def revoke_qr_tokens(revocation: QRTokenRevocation) -> dict:
+    """
+    Revoke a signed QR token, or every token of a driver.
+    
+    Revoking a token bumps its driver's qr_generation, so the driver's QR
+    code (/qr/{driver_id}.png) encodes a new token that can be reprinted.
+    
+    The denylist is in memory and per process: only the worker handling this
+    call rejects the token, which the response says. Add lasting
+    revocations to QR_TOKEN_DENYLIST so every worker loads them. Rotate keys
+    with QR_TOKEN_KEYS / QR_TOKEN_KEY_VERSION.
+    """
+    if not revocation.token and not revocation.driver_id:
+        raise HTTPException(status_code=400, detail="Provide token or driver_id")
+    try:
+        claims = qr_token_signer.revoke_token(revocation.token) if revocation.token else None
+        if revocation.driver_id:
+            qr_token_signer.revoke_driver(revocation.driver_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Reissue: the driver's QR code now encodes a new token, not the revoked one
+    reissued = False
+    if claims:
+        driver = await supabase_manager.get_driver(claims.id)
+        if driver and driver.qr_generation % 65536 == claims.generation:
+            await supabase_manager.update_driver(claims.id, {"qr_generation": driver.qr_generation + 1})
+            reissued = True
+    
+    return {
+        "status": "revoked",
+        "reissued": reissued,
+        "scope": "worker",
+        "message": "Revoked on this worker only; add the token or driver id to QR_TOKEN_DENYLIST so every worker rejects it"
+    }
+
+
 @app.get("/api/admin/stats", response_model=AdminStats)
-async def get_admin_stats() -> AdminStats:
-    """Get platform statistics for admin."""
-    return await supabase_manager.get_admin_stats()
+async def get_admin_stats(response: Response) -> AdminStats:
+    """Get platform statistics for admin. The Age header gives the data's age in seconds."""
+    stats, age = await admin_stats_cache.get()
+    response.headers["Age"] = str(int(age))
+    return stats
+
+
+@app.get("/api/admin/stats/timeseries", response_model=StatsTimeseries)
+async def get_stats_timeseries(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    granularity: StatsGranularity = StatsGranularity.HOUR,
+    vehicle_type: Optional[VehicleType] = None
+) -> StatsTimeseries:
+    """
+    Revenue, platform fees and payouts per hour or day in [from, to).
+    
+    Served from the rollup tables (database/stats_rollup_migration.sql);
+    empty buckets are included as zeros. Defaults to the last 24 hours
+    (hour) or 30 days (day).
+    """
+    try:
+        start, end = resolve_timeseries_range(start, end, granularity)
+    except InvalidStatsRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    buckets = await supabase_manager.get_stats_timeseries(
+        start, end, granularity, vehicle_type.value if vehicle_type else None
+    )
+    return StatsTimeseries(
+        start=start, end=end, granularity=granularity,
+        vehicle_type=vehicle_type, buckets=buckets
+    )
+
+
+@app.get("/api/admin/transactions", response_model=TransactionPage)
+async def get_all_transactions(
+    response: Response,
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+) -> TransactionPage:
+    """
+    Get all transactions, newest first. Pass next_cursor back as cursor for older ones.
+    
+    The first page (limit up to ADMIN_PAGE_SIZE) comes from the admin cache
+    and carries an Age header; older pages are read directly.
+    """
+    if cursor is None and limit <= ADMIN_PAGE_SIZE:
+        rows, age = await admin_transactions_cache.get()
+        rows = rows[:limit + 1]
+        response.headers["Age"] = str(int(age))
+    else:
+        try:
+            rows = await supabase_manager.get_all_transactions(limit=limit + 1, cursor=cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    items, next_cursor = paginate(rows, limit)
+    return TransactionPage(items=items, next_cursor=next_cursor)
 
 
-@app.get("/api/driver/{driver_id}/transactions", response_model=List[Transaction])
-async def get_driver_transactions(driver_id: str) -> List[Transaction]:
-    """Get transactions for a specific driver."""
-    return await supabase_manager.get_driver_transactions(driver_id)
+@app.get("/api/driver/{driver_id}/transactions", response_model=TransactionPage)
+async def get_driver_transactions(
+    driver_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+) -> TransactionPage:
+    """Get transactions for a specific driver, newest first (cursor paginated)."""
+    try:
+        rows = await supabase_manager.get_driver_transactions(driver_id, limit=limit + 1, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items, next_cursor = paginate(rows, limit)
+    return TransactionPage(items=items, next_cursor=next_cursor)
 
 
-@app.get("/api/driver/{driver_id}/payouts", response_model=List[Payout])
-async def get_driver_payouts(driver_id: str) -> List[Payout]:
-    """Get payouts for a specific driver."""
-    return await supabase_manager.get_driver_payouts(driver_id)
+@app.get("/api/driver/{driver_id}/payouts", response_model=PayoutPage)
+async def get_driver_payouts(
+    driver_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+) -> PayoutPage:
+    """Get payouts for a specific driver, newest first (cursor paginated)."""
+    try:
+        rows = await supabase_manager.get_driver_payouts(driver_id, limit=limit + 1, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items, next_cursor = paginate(rows, limit)
+    return PayoutPage(items=items, next_cursor=next_cursor)
 
 
 # Health check endpoint
@@ -562,6 +1110,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def get_metrics() -> dict:
+    """In-process metrics for monitoring."""
+    return metrics.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
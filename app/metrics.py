@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Any
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry.
+
+    Counters only ever increase, gauges hold the latest value and timings keep
+    count/sum/max so averages can be derived. Exposed as JSON via /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._started_at = time.time()
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration in seconds."""
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            timing["count"] += 1
+            timing["sum"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of all metrics."""
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self._started_at, 1),
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {
+                    name: {**timing, "avg": timing["sum"] / timing["count"] if timing["count"] else 0.0}
+                    for name, timing in self._timings.items()
+                }
+            }
+
+
+# Process-wide registry
+metrics = Metrics()
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from functools import cached_property
 from datetime import datetime
 from enum import Enum
 
@@ -18,6 +19,10 @@ class TransactionStatus(str, Enum):
     PAYOUT_COMPLETED = "payout_completed"
     PAYOUT_FAILED = "payout_failed"
 
+class StatsGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
 class PayoutStatus(str, Enum):
     PENDING = "pending"
     PROCESSING = "processing"
@@ -33,6 +38,8 @@ class Driver(BaseModel):
     vehicle_type: VehicleType
     vehicle_number: str
     qr_code_url: Optional[str] = None
+    short_code: Optional[str] = None  # assigned by the database; QR codes encode /p/<short_code>
+    qr_generation: int = 0  # bumped to reissue a revoked signed QR token
     balance: float = 0.0
     total_earnings: float = 0.0
     created_at: Optional[datetime] = None
@@ -88,6 +95,64 @@ class PlatformFee(BaseModel):
     collected_at: Optional[datetime] = None
     created_at: Optional[datetime] = None
 
+class CollectionCompletion(BaseModel):
+    """Result of the complete_collection RPC."""
+    transaction_id: str
+    payout_id: Optional[str] = None
+    driver_id: str
+    driver_phone: str
+    driver_name: str
+    driver_amount: float
+    already_completed: bool = False
+
+class PayoutJob(BaseModel):
+    """A claimed payout job from the payout_jobs queue."""
+    job_id: int
+    payout_id: str
+    transaction_id: str
+    driver_id: str
+    driver_phone: str
+    driver_name: str
+    amount: float
+    attempts: int
+    max_attempts: int
+
+class TransactionListItem(BaseModel):
+    """Transaction as shown in lists and dashboards (no provider payloads)."""
+    id: str
+    driver_id: str
+    passenger_phone: str
+    amount_paid: float
+    platform_fee: float
+    driver_amount: float
+    status: TransactionStatus
+    mpesa_receipt: Optional[str] = None
+    collection_status: Optional[str] = None
+    payout_status: Optional[str] = None
+    created_at: datetime
+
+class PayoutListItem(BaseModel):
+    """Payout as shown in lists (no provider payload)."""
+    id: str
+    transaction_id: str
+    driver_id: str
+    amount: float
+    tracking_id: Optional[str] = None
+    status: PayoutStatus
+    failure_reason: Optional[str] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+
+class TransactionPage(BaseModel):
+    """One page of transactions; pass next_cursor back as ?cursor= for the next."""
+    items: List[TransactionListItem]
+    next_cursor: Optional[str] = None
+
+class PayoutPage(BaseModel):
+    """One page of payouts; pass next_cursor back as ?cursor= for the next."""
+    items: List[PayoutListItem]
+    next_cursor: Optional[str] = None
+
 class AdminStats(BaseModel):
     total_transactions: int = 0
     total_revenue: float = 0.0
@@ -98,6 +163,22 @@ class AdminStats(BaseModel):
     failed_payouts: int = 0
     updated_at: Optional[datetime] = None
 
+class StatsBucket(BaseModel):
+    """Totals for one time bucket; bucket is the start of the hour/day."""
+    bucket: datetime
+    transactions: int = 0
+    revenue: float = 0.0
+    platform_fees: float = 0.0
+    payouts: int = 0
+    payout_amount: float = 0.0
+
+class StatsTimeseries(BaseModel):
+    start: datetime
+    end: datetime
+    granularity: StatsGranularity
+    vehicle_type: Optional[VehicleType] = None
+    buckets: List[StatsBucket]
+
 # Request/Response models
 class DriverRegistration(BaseModel):
     name: str
@@ -106,6 +187,25 @@ class DriverRegistration(BaseModel):
     vehicle_type: VehicleType
     vehicle_number: str
 
+class BulkDriverResult(BaseModel):
+    """Outcome for one input row (row numbers start at 1)."""
+    row: int
+    status: str  # created, qr_failed, failed
+    driver_id: Optional[str] = None
+    qr_code_url: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkRegistrationResponse(BaseModel):
+    created: int
+    failed: int
+    qr_failed: int
+    results: List[BulkDriverResult]
+
+class QRTokenRevocation(BaseModel):
+    """Revoke one QR token, or every token issued for a driver."""
+    token: Optional[str] = None
+    driver_id: Optional[str] = None
+
 class PaymentRequest(BaseModel):
     driver_id: str
     passenger_phone: str
@@ -144,6 +244,11 @@ class IntaSendWebhook(BaseModel):
     meta: Optional[Dict[str, Any]] = None
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
+    
+    @cached_property
+    def payload(self) -> Dict[str, Any]:
+        """Serialized webhook, built once and reused for every stored response."""
+        return self.model_dump()
 
 class TransactionStatusResponse(BaseModel):
     transaction_id: str
@@ -2,8 +2,10 @@ import os
 import base64
 import json
 from datetime import datetime
-import requests
-from typing import Dict, Any, Optional
+import httpx
+from typing import Dict, Any, Optional, Tuple
+
+from .token_cache import TokenCache
 
 class MpesaAPI:
     def __init__(self):
@@ -16,15 +18,39 @@ class MpesaAPI:
         self.callback_url = os.getenv('DARAJA_CALLBACK_URL')
         self.account_ref = os.getenv('DARAJA_ACCOUNT_REF')
         self.transaction_desc = os.getenv('DARAJA_TRANSACTION_DESC')
-
-    def _get_auth_token(self) -> str:
-        """Get OAuth token for API authentication."""
+        self.timeout = float(os.getenv('DARAJA_HTTP_TIMEOUT', '30'))
+
+        # OAuth tokens are cached until shortly before `expires_in` runs out.
+        # DARAJA_TOKEN_STORE shares them across uvicorn workers via a small file.
+        self.token_cache = TokenCache(
+            fetch=self._fetch_auth_token,
+            refresh_margin=float(os.getenv('DARAJA_TOKEN_REFRESH_MARGIN', '120')),
+            store_path=os.getenv('DARAJA_TOKEN_STORE') or None,
+            metrics_prefix="mpesa.token"
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared keep-alive HTTP client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def _fetch_auth_token(self) -> Tuple[str, float]:
+        """Request a new OAuth token. Returns (access_token, expires_in seconds)."""
         auth_string = f"{self.consumer_key}:{self.consumer_secret}"
         auth_bytes = auth_string.encode("ascii")
         auth_base64 = base64.b64encode(auth_bytes).decode('ascii')
 
         try:
-            response = requests.get(
+            response = await self.client.get(
                 f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials",
                 headers={
                     "Authorization": f"Basic {auth_base64}"
@@ -32,10 +58,14 @@ class MpesaAPI:
             )
             response.raise_for_status()
             result = response.json()
-            return result['access_token']
-        except requests.exceptions.RequestException as e:
+            return result['access_token'], float(result.get('expires_in', 3599))
+        except httpx.HTTPError as e:
             raise Exception(f"Failed to get auth token: {str(e)}")
 
+    async def _get_auth_token(self) -> str:
+        """Get OAuth token for API authentication (served from the token cache)."""
+        return await self.token_cache.get()
+
     def _generate_password(self, timestamp: str) -> str:
         """Generate password for STK Push."""
         password_string = f"{self.shortcode}{self.passkey}{timestamp}"
@@ -62,7 +92,7 @@ class MpesaAPI:
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
         
         # Get auth token
-        token = self._get_auth_token()
+        token = await self._get_auth_token()
         
         # Generate password
         password = self._generate_password(timestamp)
@@ -88,14 +118,16 @@ class MpesaAPI:
         }
         
         try:
-            response = requests.post(
+            response = await self.client.post(
                 f"{self.base_url}/mpesa/stkpush/v1/processrequest",
                 json=payload,
                 headers=headers
             )
+            if response.status_code == 401:
+                self.token_cache.invalidate()
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             raise Exception(f"STK push failed: {str(e)}")
 
     async def verify_transaction(self, checkout_request_id: str) -> Optional[Dict[str, Any]]:
@@ -109,7 +141,7 @@ class MpesaAPI:
             Dict containing the transaction status or None if verification fails
         """
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        token = self._get_auth_token()
+        token = await self._get_auth_token()
         password = self._generate_password(timestamp)
         
         headers = {
@@ -125,14 +157,16 @@ class MpesaAPI:
         }
         
         try:
-            response = requests.post(
+            response = await self.client.post(
                 f"{self.base_url}/mpesa/stkpushquery/v1/query",
                 json=payload,
                 headers=headers
             )
+            if response.status_code == 401:
+                self.token_cache.invalidate()
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException:
+        except httpx.HTTPError:
             return None
 
 
@@ -0,0 +1,290 @@
+import os
+import io
+import csv
+import json
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .models import Driver, DriverRegistration, BulkDriverResult, BulkRegistrationResponse
+from .qr_utils import render_qr, driver_qr_url
+from .qr_tokens import qr_token_signer
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BulkInputError(ValueError):
+    """Raised when a bulk registration payload cannot be parsed at all."""
+
+
+def parse_driver_rows(body: bytes, content_type: str = "application/json") -> List[Dict[str, Any]]:
+    """
+    Decode a bulk registration payload into raw rows.
+
+    CSV needs a header row (name,phone,email,vehicle_type,vehicle_number).
+    JSON is a list of driver objects, or {"drivers": [...]}.
+    """
+    if "csv" in content_type:
+        try:
+            text = body.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            raise BulkInputError(f"CSV must be UTF-8: {str(e)}")
+        return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise BulkInputError(f"Invalid JSON: {str(e)}")
+    if isinstance(data, dict) and isinstance(data.get("drivers"), list):
+        data = data["drivers"]
+    if not isinstance(data, list):
+        raise BulkInputError("Expected a JSON list of drivers")
+    return data
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+
+def _render_qr_batch(payloads: List[str]) -> List[bytes]:
+    """Render QR PNGs for a batch of payloads. Runs in a worker process."""
+    return [render_qr(payload) for payload in payloads]
+
+
+class BulkDriverOnboarder:
+    """
+    Registers many drivers at once.
+
+    - Rows are validated up front; invalid rows and phone/email duplicates
+      within the upload are reported without touching the database.
+    - Drivers are inserted ``chunk_size`` at a time. If a chunk is rejected
+      (e.g. one phone already registered) its rows are retried one by one so
+      only the offending rows fail.
+    - Each chunk's QR URLs (served by /qr/{driver_id}.png) are written back
+      with one set_driver_qr_urls call.
+    - With ``mirror_to_storage`` the QR images are also rendered in a process
+      pool, ``qr_batch_size`` per task, and uploaded to Storage with at most
+      ``upload_concurrency`` uploads in flight. Mirror failures are logged
+      and counted but do not fail the driver.
+    - Chunks are pipelined: the next chunk is inserted while the previous
+      one's URLs are saved and its images mirrored.
+
+    A driver whose QR URL cannot be saved is still registered and reported
+    as ``qr_failed`` with an empty qr_code_url.
+    """
+
+    def __init__(
+        self,
+        data_manager,
+        chunk_size: int = 500,
+        qr_processes: Optional[int] = None,
+        qr_batch_size: int = 50,
+        upload_concurrency: int = 16,
+        mirror_to_storage: bool = False
+    ):
+        self.data_manager = data_manager
+        self.chunk_size = chunk_size
+        self.qr_processes = qr_processes or os.cpu_count() or 1
+        self.qr_batch_size = qr_batch_size
+        self.upload_concurrency = upload_concurrency
+        self.mirror_to_storage = mirror_to_storage
+
+    async def register(self, rows: List[Dict[str, Any]]) -> BulkRegistrationResponse:
+        """Register every row; returns one result per row, in input order."""
+        started = time.perf_counter()
+        results: Dict[int, BulkDriverResult] = {}
+        valid = self._validate(rows, results)
+
+        upload_slots = asyncio.Semaphore(self.upload_concurrency)
+        # spawn: forking a process that runs an event loop and thread pools is unsafe
+        pool = ProcessPoolExecutor(
+            max_workers=self.qr_processes,
+            mp_context=multiprocessing.get_context("spawn")
+        ) if self.mirror_to_storage else None
+        try:
+            finishing = []
+            for start in range(0, len(valid), self.chunk_size):
+                created = await self._insert_chunk(valid[start:start + self.chunk_size], results)
+                if created:
+                    finishing.append(asyncio.create_task(
+                        self._finish_chunk(created, pool, upload_slots, results)
+                    ))
+            await asyncio.gather(*finishing)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        ordered = [results[row] for row in sorted(results)]
+        response = BulkRegistrationResponse(
+            created=sum(1 for r in ordered if r.status == "created"),
+            failed=sum(1 for r in ordered if r.status == "failed"),
+            qr_failed=sum(1 for r in ordered if r.status == "qr_failed"),
+            results=ordered
+        )
+        elapsed = time.perf_counter() - started
+        metrics.incr("bulk_onboarding.created", response.created)
+        metrics.incr("bulk_onboarding.failed", response.failed + response.qr_failed)
+        metrics.observe("bulk_onboarding.seconds", elapsed)
+        logger.info(
+            f"Bulk onboarding: {response.created} created, {response.qr_failed} without QR, "
+            f"{response.failed} failed in {elapsed:.1f}s"
+        )
+        return response
+
+    def _validate(
+        self, rows: List[Dict[str, Any]], results: Dict[int, BulkDriverResult]
+    ) -> List[Tuple[int, DriverRegistration]]:
+        valid = []
+        seen_phones = set()
+        seen_emails = set()
+        for row_number, raw in enumerate(rows, start=1):
+            try:
+                if not isinstance(raw, dict):
+                    raise TypeError("Row must be an object")
+                registration = DriverRegistration(**raw)
+            except ValidationError as e:
+                results[row_number] = BulkDriverResult(row=row_number, status="failed", error=_validation_message(e))
+                continue
+            except TypeError as e:
+                results[row_number] = BulkDriverResult(row=row_number, status="failed", error=str(e))
+                continue
+
+            if registration.phone in seen_phones or registration.email in seen_emails:
+                results[row_number] = BulkDriverResult(
+                    row=row_number, status="failed", error="Duplicate phone or email in upload"
+                )
+                continue
+            seen_phones.add(registration.phone)
+            seen_emails.add(registration.email)
+            valid.append((row_number, registration))
+        return valid
+
+    @staticmethod
+    def _driver(registration: DriverRegistration) -> Driver:
+        return Driver(
+            name=registration.name,
+            phone=registration.phone,
+            email=registration.email,
+            vehicle_type=registration.vehicle_type,
+            vehicle_number=registration.vehicle_number
+        )
+
+    async def _insert_chunk(
+        self, chunk: List[Tuple[int, DriverRegistration]], results: Dict[int, BulkDriverResult]
+    ) -> List[Tuple[int, str, DriverRegistration]]:
+        """Insert a chunk; returns (row, driver_id, registration) for the drivers created."""
+        try:
+            ids = await self.data_manager.create_drivers([self._driver(reg) for _, reg in chunk])
+            created = [(row, ids[reg.phone], reg) for row, reg in chunk]
+        except Exception as e:
+            logger.warning(f"Bulk insert of {len(chunk)} drivers failed, retrying row by row: {str(e)}")
+            created = await self._insert_rows(chunk, results)
+
+        for row, driver_id, _ in created:
+            results[row] = BulkDriverResult(row=row, status="created", driver_id=driver_id)
+        return created
+
+    async def _insert_rows(
+        self, chunk: List[Tuple[int, DriverRegistration]], results: Dict[int, BulkDriverResult]
+    ) -> List[Tuple[int, str, DriverRegistration]]:
+        slots = asyncio.Semaphore(self.upload_concurrency)
+
+        async def insert(row: int, registration: DriverRegistration) -> Optional[Tuple[int, str, DriverRegistration]]:
+            async with slots:
+                try:
+                    driver_id = await self.data_manager.create_driver(self._driver(registration))
+                except Exception as e:
+                    results[row] = BulkDriverResult(row=row, status="failed", error=str(e))
+                    return None
+            return row, driver_id, registration
+
+        inserted = await asyncio.gather(*(insert(row, reg) for row, reg in chunk))
+        return [item for item in inserted if item is not None]
+
+    async def _finish_chunk(
+        self,
+        created: List[Tuple[int, str, DriverRegistration]],
+        pool: Optional[ProcessPoolExecutor],
+        upload_slots: asyncio.Semaphore,
+        results: Dict[int, BulkDriverResult]
+    ) -> None:
+        """Save the QR URLs of one inserted chunk and mirror its images if enabled."""
+        qr_urls = {driver_id: driver_qr_url(driver_id) for _, driver_id, _ in created}
+        try:
+            await self.data_manager.set_driver_qr_urls(qr_urls)
+        except Exception as e:
+            for row, driver_id, _ in created:
+                results[row] = BulkDriverResult(
+                    row=row, status="qr_failed", driver_id=driver_id, error=f"Could not save QR URL: {str(e)}"
+                )
+        else:
+            for row, driver_id, _ in created:
+                results[row].qr_code_url = qr_urls[driver_id]
+
+        if pool is not None:
+            await self._mirror_chunk(created, pool, upload_slots)
+
+    async def _mirror_chunk(
+        self,
+        created: List[Tuple[int, str, DriverRegistration]],
+        pool: ProcessPoolExecutor,
+        upload_slots: asyncio.Semaphore
+    ) -> None:
+        """Render one chunk's QR codes in the process pool and upload them to Storage."""
+        try:
+            short_codes = await self.data_manager.get_driver_short_codes([driver_id for _, driver_id, _ in created])
+        except Exception as e:
+            metrics.incr("qr_mirror.failed", len(created))
+            logger.warning(f"Could not load short codes for {len(created)} drivers, not mirroring: {str(e)}")
+            return
+
+        loop = asyncio.get_running_loop()
+        batches = [created[i:i + self.qr_batch_size] for i in range(0, len(created), self.qr_batch_size)]
+        rendered = await asyncio.gather(
+            *(loop.run_in_executor(pool, _render_qr_batch, [
+                qr_token_signer.qr_payload(
+                    self._driver(reg).model_copy(update={"id": driver_id, "short_code": short_codes.get(driver_id)}),
+                    reg.phone
+                )
+                for _, driver_id, reg in batch
+            ]) for batch in batches),
+            return_exceptions=True
+        )
+
+        async def upload(driver_id: str, png: bytes) -> None:
+            async with upload_slots:
+                try:
+                    await self.data_manager.upload_qr_code(driver_id, png)
+                    metrics.incr("qr_mirror.uploaded")
+                except Exception as e:
+                    metrics.incr("qr_mirror.failed")
+                    logger.warning(f"QR mirror upload failed for driver {driver_id}: {str(e)}")
+
+        uploads = []
+        for batch, pngs in zip(batches, rendered):
+            if isinstance(pngs, BaseException):
+                metrics.incr("qr_mirror.failed", len(batch))
+                logger.warning(f"QR render failed for {len(batch)} drivers: {str(pngs)}")
+                continue
+            uploads.extend(upload(driver_id, png) for (_, driver_id, _), png in zip(batch, pngs))
+        await asyncio.gather(*uploads)
+
+
+def create_bulk_onboarder(data_manager) -> BulkDriverOnboarder:
+    """Build a BulkDriverOnboarder from the BULK_* environment settings."""
+    return BulkDriverOnboarder(
+        data_manager,
+        chunk_size=int(os.getenv('BULK_ONBOARDING_CHUNK_SIZE', '500')),
+        qr_processes=int(os.getenv('BULK_QR_PROCESSES', '0')) or None,
+        qr_batch_size=int(os.getenv('BULK_QR_BATCH_SIZE', '50')),
+        upload_concurrency=int(os.getenv('BULK_UPLOAD_CONCURRENCY', '16')),
+        mirror_to_storage=os.getenv('QR_STORAGE_MIRROR', 'false').lower() == 'true'
+    )
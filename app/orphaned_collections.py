@@ -0,0 +1,94 @@
+import os
+import asyncio
+import logging
+from typing import List, Optional
+
+from .models import Transaction
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class OrphanedCollectionStore:
+    """
+    Local record of STK pushes whose transaction row could not be saved.
+
+    /api/pay inserts the transaction and sends the STK push concurrently. If
+    the push goes out but the insert keeps failing, the passenger is charged
+    with no transaction for the collection webhook to complete. The
+    transaction (with its collection id) is written here, one fsynced JSON
+    file per transaction, and ``reconcile`` inserts it once the database is
+    reachable again: from the collection webhook that finds no transaction,
+    and at startup.
+
+    The store is per host. A webhook handled on another host without the
+    record raises instead of acking, so the event ends up in the webhook
+    spool's ``failed`` directory for manual reconciliation.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, transaction_id: str) -> str:
+        return os.path.join(self.directory, f"{transaction_id}.json")
+
+    def _write(self, transaction: Transaction) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(transaction.id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(transaction.model_dump_json())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _read(self, transaction_id: str) -> Optional[Transaction]:
+        try:
+            with open(self._path(transaction_id)) as f:
+                return Transaction.model_validate_json(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _remove(self, transaction_id: str) -> None:
+        try:
+            os.remove(self._path(transaction_id))
+        except FileNotFoundError:
+            pass
+
+    def _list(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [name[:-len(".json")] for name in names if name.endswith(".json")]
+
+    async def save(self, transaction: Transaction) -> None:
+        """Record a transaction whose STK push was sent but which is not in the database."""
+        await asyncio.to_thread(self._write, transaction)
+        metrics.incr("orphaned_collections.saved")
+        logger.error(
+            f"Transaction {transaction.id} (collection {transaction.intasend_collection_id}) "
+            f"not saved, kept in {self.directory} for reconciliation"
+        )
+
+    async def reconcile(self, data_manager, transaction_id: str) -> bool:
+        """Insert a recorded transaction. True if it is now in the database."""
+        transaction = await asyncio.to_thread(self._read, transaction_id)
+        if transaction is None:
+            return False
+        if await data_manager.get_transaction(transaction_id) is None:
+            await data_manager.create_transaction_with_intasend(transaction)
+        await asyncio.to_thread(self._remove, transaction_id)
+        metrics.incr("orphaned_collections.reconciled")
+        logger.info(f"Reconciled orphaned transaction {transaction_id}")
+        return True
+
+    async def reconcile_all(self, data_manager) -> int:
+        """Insert every recorded transaction; failures stay recorded. Returns how many were saved."""
+        reconciled = 0
+        for transaction_id in await asyncio.to_thread(self._list):
+            try:
+                reconciled += await self.reconcile(data_manager, transaction_id)
+            except Exception as e:
+                logger.warning(f"Could not reconcile orphaned transaction {transaction_id}: {str(e)}")
+        return reconciled
@@ -0,0 +1,122 @@
+import gzip
+import time
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional, Tuple
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:  # brotli is optional; pages are then served gzip or identity
+    BROTLI_AVAILABLE = False
+
+from .metrics import metrics
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Codings the client accepts (q > 0) from an Accept-Encoding header."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+@dataclass
+class CachedPage:
+    """A rendered page with its precompressed variants."""
+    body: bytes
+    gzip_body: bytes
+    br_body: Optional[bytes]
+    digest: str
+    settings: Hashable
+    stored_at: float
+
+    def variant(self, accept_encoding: str) -> Tuple[bytes, Optional[str], str]:
+        """(body, Content-Encoding, strong ETag) of the best variant for the client."""
+        accepted = _accepted_encodings(accept_encoding)
+        if self.br_body is not None and "br" in accepted:
+            return self.br_body, "br", f'"{self.digest}-br"'
+        if "gzip" in accepted:
+            return self.gzip_body, "gzip", f'"{self.digest}-gz"'
+        return self.body, None, f'"{self.digest}"'
+
+
+class PageCache:
+    """
+    Rendered HTML pages per driver, with gzip (and brotli) variants.
+
+    - Pages are grouped by driver id; each driver has a few variants (mode,
+      phone pre-filled or not, ...). At most ``maxsize`` drivers are kept,
+      least recently used first out.
+    - ``settings`` is a fingerprint of everything else the page depends on
+      (fees, publishable key, base URL). A page rendered under different
+      settings is a miss, so config changes never serve stale HTML.
+    - ``invalidate_driver`` drops a driver's pages; wire it to the driver
+      cache's invalidation listener. Entries also expire after ``ttl``
+      seconds, which bounds staleness from updates made by other processes.
+    - ``put`` with the ``generation`` read before loading the driver is
+      ignored when an invalidation happened in between, so a render from
+      data loaded before an update is not cached.
+    """
+
+    def __init__(self, maxsize: int = 2000, ttl: float = 30.0, name: str = "page_cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._drivers: "OrderedDict[str, Dict[Hashable, CachedPage]]" = OrderedDict()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, driver_id: str, variant: Hashable, settings: Hashable) -> Optional[CachedPage]:
+        pages = self._drivers.get(driver_id)
+        page = pages.get(variant) if pages else None
+        if page is None or page.settings != settings or time.monotonic() - page.stored_at > self.ttl:
+            metrics.incr(f"{self.name}.misses")
+            return None
+        self._drivers.move_to_end(driver_id)
+        metrics.incr(f"{self.name}.hits")
+        return page
+
+    def put(
+        self, driver_id: str, variant: Hashable, settings: Hashable, html: str, generation: Optional[int] = None
+    ) -> CachedPage:
+        """Compress and store a rendered page; returns it (stored or not)."""
+        body = html.encode()
+        page = CachedPage(
+            body=body,
+            gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+            br_body=brotli.compress(body, quality=9) if BROTLI_AVAILABLE else None,
+            digest=hashlib.sha256(body).hexdigest()[:32],
+            settings=settings,
+            stored_at=time.monotonic()
+        )
+        if generation is not None and generation != self._generation:
+            return page
+
+        self._drivers.setdefault(driver_id, {})[variant] = page
+        self._drivers.move_to_end(driver_id)
+        while len(self._drivers) > self.maxsize:
+            self._drivers.popitem(last=False)
+        metrics.set_gauge(f"{self.name}.drivers", len(self._drivers))
+        return page
+
+    def invalidate_driver(self, driver_id: Hashable) -> None:
+        self._generation += 1
+        self._drivers.pop(driver_id, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._drivers.clear()
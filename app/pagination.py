@@ -0,0 +1,45 @@
+import json
+import uuid
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+# Page size bounds for list endpoints
+DEFAULT_PAGE_SIZE = 50
+ADMIN_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    """Opaque cursor pointing just past the row (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), str(row_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Return the (created_at, id) position encoded in a cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        # Parsing both parts also keeps cursor text out of query filters
+        return datetime.fromisoformat(created_at), str(uuid.UUID(row_id))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {str(e)}")
+
+
+def paginate(rows: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Split ``limit + 1`` fetched rows into a page and the cursor of the next one.
+
+    Rows must be ordered by (created_at DESC, id DESC) and have ``created_at``
+    and ``id`` attributes. The extra row only signals that more pages exist.
+    """
+    items = list(rows[:limit])
+    if len(rows) <= limit or not items:
+        return items, None
+    last = items[-1]
+    return items, encode_cursor(last.created_at, last.id)
@@ -0,0 +1,286 @@
+"""
+Payout worker
+-------------
+
+Processes driver payouts from the durable ``payout_jobs`` queue. Run one or
+more of these next to the API processes:
+
+    python -m app.payout_worker --concurrency 20
+
+Jobs are claimed with FOR UPDATE SKIP LOCKED, so workers scale out
+horizontally. Attempts IntaSend provably never acted on (connection
+failures, 4xx rejections) are retried with exponential backoff and
+dead-lettered after ``max_attempts``; any other failure may already have
+paid the driver, so the job is dead-lettered for manual review at once. SIGTERM/SIGINT stop claiming new
+jobs and drain the in-flight ones before exiting.
+"""
+import os
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+from typing import Optional, Set
+
+from dotenv import load_dotenv
+
+from .models import PayoutJob, PayoutStatus
+from .supabase_util import SupabaseManager
+from .intasend import IntaSendAPI, IntaSendError
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PayoutWorker:
+    """Claims payout jobs and sends them to IntaSend with bounded concurrency."""
+
+    def __init__(
+        self,
+        data_manager: SupabaseManager,
+        intasend_api: IntaSendAPI,
+        concurrency: int = 10,
+        poll_interval: float = 1.0,
+        lease_seconds: int = 300,
+        base_backoff: float = 5.0,
+        max_backoff: float = 600.0,
+        drain_timeout: float = 60.0,
+        worker_id: Optional[str] = None
+    ):
+        self.data_manager = data_manager
+        self.intasend_api = intasend_api
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.drain_timeout = drain_timeout
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+        self._active: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._slot_freed = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; in-flight jobs are drained by run()."""
+        if not self._stopping.is_set():
+            logger.info(f"Worker {self.worker_id} draining {len(self._active)} in-flight payouts")
+            self._stopping.set()
+            self._slot_freed.set()
+
+    def backoff_for(self, attempts: int) -> int:
+        """Exponential backoff in seconds for the given attempt number."""
+        return int(min(self.base_backoff * (2 ** max(attempts - 1, 0)), self.max_backoff))
+
+    async def run(self) -> None:
+        """Poll for jobs until stopped, then drain in-flight payouts."""
+        logger.info(f"Payout worker {self.worker_id} started (concurrency {self.concurrency})")
+
+        while not self._stopping.is_set():
+            free_slots = self.concurrency - len(self._active)
+            if free_slots <= 0:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+                continue
+
+            try:
+                jobs = await self.data_manager.claim_payout_jobs(
+                    self.worker_id, limit=free_slots, lease_seconds=self.lease_seconds
+                )
+            except Exception as e:
+                logger.error(f"Claiming payout jobs failed: {str(e)}")
+                jobs = []
+
+            for job in jobs:
+                task = asyncio.create_task(self._run_job(job))
+                self._active.add(task)
+                task.add_done_callback(self._job_finished)
+
+            metrics.set_gauge("payout_worker.in_flight", len(self._active))
+
+            if not jobs:
+                # Nothing due: sleep until the next poll or until asked to stop
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        await self._drain()
+
+    def _job_finished(self, task: asyncio.Task) -> None:
+        self._active.discard(task)
+        self._slot_freed.set()
+
+    async def _drain(self) -> None:
+        if not self._active:
+            return
+        done, pending = await asyncio.wait(self._active, timeout=self.drain_timeout)
+        if pending:
+            # Their leases will expire and the jobs get dead-lettered for review
+            logger.warning(f"{len(pending)} payouts still running after {self.drain_timeout}s drain, abandoning")
+            for task in pending:
+                task.cancel()
+
+    async def _run_job(self, job: PayoutJob) -> None:
+        try:
+            tracking_id, payout_response = await self.send_payout(job)
+        except Exception as e:
+            await self._handle_failure(job, e)
+            return
+
+        # IntaSend accepted the payout: from here on the job must never be
+        # retried, so bookkeeping failures are logged instead of raised
+        metrics.incr("payout_worker.completed")
+        try:
+            await self.record_payout(job, tracking_id, payout_response)
+        except Exception as e:
+            logger.error(f"Payout {job.payout_id} sent (tracking {tracking_id}) but not recorded: {str(e)}")
+        try:
+            await self.data_manager.complete_payout_job(job.job_id, self.worker_id)
+        except Exception as e:
+            logger.error(f"Could not mark payout job {job.job_id} done: {str(e)}")
+
+    async def send_payout(self, job: PayoutJob):
+        """Send one payout via IntaSend. Returns (tracking_id, response)."""
+        logger.info(f"Processing payout {job.payout_id} for transaction {job.transaction_id} (attempt {job.attempts})")
+
+        # Initiate payout via IntaSend
+        payout_response = await self.intasend_api.initiate_payout(
+            phone_number=job.driver_phone,
+            amount=job.amount,
+            reference=job.transaction_id,
+            name=job.driver_name
+        )
+
+        tracking_id = payout_response.get('tracking_id')
+        if not tracking_id:
+            raise Exception("No tracking ID in payout response")
+        return tracking_id, payout_response
+
+    async def record_payout(self, job: PayoutJob, tracking_id: str, payout_response: dict) -> None:
+        """Store the tracking ID on the payout and its transaction."""
+        # Update payout record with tracking ID
+        await self.data_manager.update_payout_status(
+            payout_id=job.payout_id,
+            status=PayoutStatus.PROCESSING,
+            tracking_id=tracking_id,
+            intasend_response=payout_response
+        )
+
+        # Update transaction with payout details
+        await self.data_manager.update_transaction_payout(
+            transaction_id=job.transaction_id,
+            tracking_id=tracking_id,
+            payout_status='processing',
+            payout_response=payout_response
+        )
+
+        logger.info(f"Payout initiated successfully. Tracking ID: {tracking_id}")
+
+    async def _handle_failure(self, job: PayoutJob, error: Exception) -> None:
+        if not (isinstance(error, IntaSendError) and error.retry_safe):
+            await self._dead_letter_unconfirmed(job, error)
+            return
+
+        retry_in = self.backoff_for(job.attempts)
+        logger.error(f"Payout job {job.job_id} failed (attempt {job.attempts}/{job.max_attempts}): {str(error)}")
+
+        try:
+            status = await self.data_manager.fail_payout_job(job.job_id, self.worker_id, str(error), retry_in)
+        except Exception as e:
+            logger.error(f"Could not record failure for payout job {job.job_id}: {str(e)}")
+            return
+
+        if status == 'dead':
+            metrics.incr("payout_worker.dead_lettered")
+            logger.error(f"Payout job {job.job_id} dead-lettered after {job.attempts} attempts")
+            try:
+                await self.data_manager.update_payout_status(
+                    payout_id=job.payout_id,
+                    status=PayoutStatus.FAILED,
+                    failure_reason=str(error)
+                )
+                await self.data_manager.update_transaction_payout(
+                    transaction_id=job.transaction_id,
+                    tracking_id='',
+                    payout_status='failed'
+                )
+            except Exception as e:
+                logger.error(f"Could not mark payout {job.payout_id} failed: {str(e)}")
+        else:
+            metrics.incr("payout_worker.retried")
+
+    async def _dead_letter_unconfirmed(self, job: PayoutJob, error: Exception) -> None:
+        """
+        The payout request may have reached IntaSend (timeout, 5xx, response
+        without a tracking ID), so retrying could pay the driver twice.
+        IntaSend's status lookup needs the tracking ID we did not get, so the
+        job is dead-lettered for manual review and the payout left pending,
+        like jobs whose lease expired.
+        """
+        metrics.incr("payout_worker.dead_lettered")
+        logger.error(
+            f"Payout job {job.job_id} outcome unknown, dead-lettered for manual review "
+            f"(payout {job.payout_id}, attempt {job.attempts}): {str(error)}"
+        )
+        try:
+            await self.data_manager.dead_letter_payout_job(
+                job.job_id, self.worker_id, f"outcome unknown, not retried: {str(error)}"
+            )
+        except Exception as e:
+            logger.error(f"Could not dead-letter payout job {job.job_id}: {str(e)}")
+
+
+async def run_worker(args: argparse.Namespace) -> None:
+    """Create the managers, run the worker and close everything on exit."""
+    from .data_backend import create_data_manager
+
+    data_manager = create_data_manager()
+    intasend_api = IntaSendAPI()
+    await data_manager.startup()
+    await intasend_api.startup()
+
+    worker = PayoutWorker(
+        data_manager,
+        intasend_api,
+        concurrency=args.concurrency,
+        poll_interval=args.poll_interval,
+        lease_seconds=args.lease_seconds,
+        base_backoff=args.base_backoff,
+        max_backoff=args.max_backoff,
+        drain_timeout=args.drain_timeout
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:  # Windows
+            pass
+
+    try:
+        await worker.run()
+    finally:
+        await intasend_api.aclose()
+        await data_manager.aclose()
+        logger.info("Payout worker stopped")
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="GoPay payout worker")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('PAYOUT_WORKER_CONCURRENCY', '10')))
+    parser.add_argument("--poll-interval", type=float, default=float(os.getenv('PAYOUT_WORKER_POLL_INTERVAL', '1.0')))
+    parser.add_argument("--lease-seconds", type=int, default=int(os.getenv('PAYOUT_WORKER_LEASE_SECONDS', '300')))
+    parser.add_argument("--base-backoff", type=float, default=float(os.getenv('PAYOUT_WORKER_BASE_BACKOFF', '5')))
+    parser.add_argument("--max-backoff", type=float, default=float(os.getenv('PAYOUT_WORKER_MAX_BACKOFF', '600')))
+    parser.add_argument("--drain-timeout", type=float, default=float(os.getenv('PAYOUT_WORKER_DRAIN_TIMEOUT', '60')))
+    args = parser.parse_args()
+
+    asyncio.run(run_worker(args))
+
+
+if __name__ == "__main__":
+    main()
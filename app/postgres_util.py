@@ -0,0 +1,630 @@
+import os
+import json
+from decimal import Decimal
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from uuid import UUID
+
+from .models import (
+    Driver, Transaction, AdminStats, TransactionStatus,
+    Payout, PayoutStatus, PlatformFee, CollectionCompletion, PayoutJob,
+    TransactionListItem, PayoutListItem, TransactionStatusResponse,
+    StatsBucket, StatsGranularity
+)
+from .supabase_util import (
+    SupabaseManager, TRANSACTION_LIST_COLUMNS, PAYOUT_LIST_COLUMNS, TRANSACTION_STATUS_COLUMNS
+)
+from .pagination import decode_cursor
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+
+# Hot queries are module-level constants so asyncpg's per-connection statement
+# cache keeps them as server-side prepared statements: after the first call on
+# a connection they skip parsing and planning entirely.
+
+# driver_accounts = drivers with the balance materialized from driver_ledger
+GET_DRIVER_SQL = "SELECT * FROM driver_accounts WHERE id = $1"
+
+INSERT_DRIVERS_SQL = """
+    INSERT INTO drivers (name, phone, email, vehicle_type, vehicle_number, created_at, updated_at)
+    SELECT name, phone, email, vehicle_type::vehicle_type, vehicle_number, NOW(), NOW()
+    FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[])
+        AS t(name, phone, email, vehicle_type, vehicle_number)
+    RETURNING id, phone
+"""
+
+DRIVER_SHORT_CODES_SQL = "SELECT id, short_code FROM drivers"
+
+DRIVER_SHORT_CODES_BY_ID_SQL = "SELECT id, short_code FROM drivers WHERE id = ANY($1::uuid[])"
+
+GET_DRIVER_ID_BY_SHORT_CODE_SQL = "SELECT id FROM drivers WHERE short_code = $1"
+
+GET_TRANSACTION_SQL = "SELECT * FROM transactions WHERE id = $1"
+
+GET_TRANSACTION_STATUS_SQL = f"SELECT {TRANSACTION_STATUS_COLUMNS} FROM transactions WHERE id = $1"
+
+GET_TRANSACTION_BY_COLLECTION_ID_SQL = "SELECT * FROM transactions WHERE intasend_collection_id = $1 LIMIT 1"
+
+INSERT_TRANSACTION_SQL = """
+    INSERT INTO transactions (
+        id, driver_id, passenger_phone, amount_paid, platform_fee, driver_amount, status,
+        mpesa_receipt, checkout_request_id, intasend_collection_id, intasend_tracking_id,
+        collection_status, payout_status, collection_response, payout_response,
+        fee_percentage, fee_fixed, created_at, updated_at
+    ) VALUES (
+        COALESCE($1::uuid, uuid_generate_v4()),
+        $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, NOW(), NOW()
+    )
+    RETURNING id
+"""
+
+# M-Pesa (STK push) flow in app/main.py
+UPDATE_TRANSACTION_STATUS_SQL = """
+    UPDATE transactions SET
+        status = $2,
+        mpesa_receipt = COALESCE($3, mpesa_receipt),
+        updated_at = NOW()
+    WHERE checkout_request_id = $1
+    RETURNING id
+"""
+
+GET_TRANSACTION_BY_CHECKOUT_ID_SQL = "SELECT * FROM transactions WHERE checkout_request_id = $1 LIMIT 1"
+
+UPDATE_TRANSACTION_CHECKOUT_ID_SQL = """
+    UPDATE transactions SET checkout_request_id = $2, updated_at = NOW()
+    WHERE id = $1
+    RETURNING id
+"""
+
+UPDATE_TRANSACTION_COLLECTION_SQL = """
+    UPDATE transactions SET
+        intasend_collection_id = $2,
+        collection_status = $3::text,
+        collection_response = COALESCE($4, collection_response),
+        status = CASE $3::text
+            WHEN 'completed' THEN 'payout_pending'::transaction_status
+            WHEN 'failed' THEN 'failed'::transaction_status
+            ELSE status
+        END,
+        collection_completed_at = CASE WHEN $3::text = 'completed' THEN NOW() ELSE collection_completed_at END,
+        updated_at = NOW()
+    WHERE id = $1
+    RETURNING id
+"""
+
+UPDATE_TRANSACTION_PAYOUT_SQL = """
+    UPDATE transactions SET
+        intasend_tracking_id = $2,
+        payout_status = $3::text,
+        payout_response = COALESCE($4, payout_response),
+        status = CASE $3::text
+            WHEN 'completed' THEN 'payout_completed'::transaction_status
+            WHEN 'failed' THEN 'payout_failed'::transaction_status
+            ELSE status
+        END,
+        payout_completed_at = CASE WHEN $3::text = 'completed' THEN NOW() ELSE payout_completed_at END,
+        updated_at = NOW()
+    WHERE id = $1
+    RETURNING id
+"""
+
+INSERT_PAYOUT_SQL = """
+    INSERT INTO payouts (
+        transaction_id, driver_id, amount, tracking_id, status, intasend_response,
+        failure_reason, initiated_at, created_at, updated_at
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, NOW(), NOW(), NOW())
+    RETURNING id
+"""
+
+UPDATE_PAYOUT_STATUS_SQL = """
+    UPDATE payouts SET
+        status = $2::text,
+        tracking_id = COALESCE($3, tracking_id),
+        intasend_response = COALESCE($4, intasend_response),
+        failure_reason = COALESCE($5, failure_reason),
+        completed_at = CASE WHEN $2::text = 'completed' THEN NOW() ELSE completed_at END,
+        updated_at = NOW()
+    WHERE id = $1
+    RETURNING id
+"""
+
+COMPLETE_COLLECTION_SQL = "SELECT * FROM complete_collection($1, $2, $3)"
+
+CLAIM_PAYOUT_JOBS_SQL = "SELECT * FROM claim_payout_jobs($1, $2, $3)"
+
+GET_ADMIN_STATS_SQL = "SELECT * FROM get_admin_stats()"
+
+STATS_TIMESERIES_SQL = "SELECT * FROM get_stats_timeseries($1, $2, $3, $4)"
+
+# Keyset pages ordered by (created_at DESC, id DESC); a NULL cursor means the
+# first page. The row comparison is served by the created_at, id indexes.
+DRIVER_TRANSACTIONS_PAGE_SQL = f"""
+    SELECT {TRANSACTION_LIST_COLUMNS} FROM transactions
+    WHERE driver_id = $1
+      AND ($2::timestamptz IS NULL OR (created_at, id) < ($2::timestamptz, $3::uuid))
+    ORDER BY created_at DESC, id DESC
+    LIMIT $4
+"""
+
+ALL_TRANSACTIONS_PAGE_SQL = f"""
+    SELECT {TRANSACTION_LIST_COLUMNS} FROM transactions
+    WHERE ($1::timestamptz IS NULL OR (created_at, id) < ($1::timestamptz, $2::uuid))
+    ORDER BY created_at DESC, id DESC
+    LIMIT $3
+"""
+
+DRIVER_PAYOUTS_PAGE_SQL = f"""
+    SELECT {PAYOUT_LIST_COLUMNS} FROM payouts
+    WHERE driver_id = $1
+      AND ($2::timestamptz IS NULL OR (created_at, id) < ($2::timestamptz, $3::uuid))
+    ORDER BY created_at DESC, id DESC
+    LIMIT $4
+"""
+
+GET_PAYOUT_BY_TRACKING_ID_SQL = "SELECT * FROM payouts WHERE tracking_id = $1"
+
+INSERT_PLATFORM_FEE_SQL = """
+    INSERT INTO platform_fees (
+        transaction_id, amount, fee_type, percentage_applied, fixed_amount_applied,
+        collected_at, created_at
+    ) VALUES ($1, $2, $3, $4, $5, NOW(), NOW())
+    RETURNING id
+"""
+
+# Columns update_driver may touch; anything else is rejected.
+DRIVER_UPDATABLE_COLUMNS = {
+    'name', 'phone', 'email', 'vehicle_type', 'vehicle_number',
+    'qr_code_url', 'qr_generation', 'balance', 'total_earnings'
+}
+
+
+def _record_to_dict(record) -> Dict[str, Any]:
+    """Convert an asyncpg Record to plain Python types the models accept."""
+    data = {}
+    for key, value in record.items():
+        if isinstance(value, UUID):
+            value = str(value)
+        elif isinstance(value, Decimal):
+            value = float(value)
+        data[key] = value
+    return data
+
+
+def _transaction_args(transaction: Transaction) -> tuple:
+    """INSERT_TRANSACTION_SQL parameters for a Transaction."""
+    return (
+        UUID(transaction.id) if transaction.id else None,
+        UUID(transaction.driver_id), transaction.passenger_phone, transaction.amount_paid,
+        transaction.platform_fee, transaction.driver_amount, transaction.status.value,
+        transaction.mpesa_receipt, transaction.checkout_request_id,
+        transaction.intasend_collection_id, transaction.intasend_tracking_id,
+        transaction.collection_status, transaction.payout_status,
+        transaction.collection_response, transaction.payout_response,
+        transaction.fee_percentage, transaction.fee_fixed
+    )
+
+
+def _cursor_args(cursor: Optional[str]) -> Tuple[Optional[datetime], Optional[UUID]]:
+    """Query parameters for a keyset cursor (both None for the first page)."""
+    if not cursor:
+        return None, None
+    created_at, row_id = decode_cursor(cursor)
+    return created_at, UUID(row_id)
+
+
+class PostgresManager(SupabaseManager):
+    """
+    Data manager that talks to the Supabase Postgres directly over asyncpg.
+
+    Method signatures match SupabaseManager so it can be swapped in through
+    DATA_BACKEND=asyncpg, for both the IntaSend app and the M-Pesa flow in
+    app/main.py. Storage (QR uploads) still goes through the Supabase client
+    inherited from SupabaseManager.
+    """
+
+    def __init__(self):
+        """Initialize configuration. The pool is opened in startup()."""
+        if not ASYNCPG_AVAILABLE:
+            raise ImportError("asyncpg is required for DATA_BACKEND=asyncpg. Install with: pip install asyncpg")
+
+        super().__init__()
+
+        self.database_url = os.getenv('DATABASE_URL')
+        if not self.database_url:
+            raise ValueError("DATABASE_URL must be set when DATA_BACKEND=asyncpg")
+
+        self.pool_min_size = int(os.getenv('DATABASE_POOL_MIN', '2'))
+        self.pool_max_size = int(os.getenv('DATABASE_POOL_MAX', '20'))
+        # Must be 0 behind a transaction-mode pooler (pgbouncer / Supavisor :6543),
+        # which cannot keep prepared statements across transactions.
+        self.statement_cache_size = int(os.getenv('DATABASE_STATEMENT_CACHE_SIZE', '256'))
+
+        self._pool: Optional["asyncpg.Pool"] = None
+
+    @staticmethod
+    async def _init_connection(conn) -> None:
+        """Decode json/jsonb columns to Python objects on every pooled connection."""
+        for type_name in ('json', 'jsonb'):
+            await conn.set_type_codec(
+                type_name,
+                encoder=json.dumps,
+                decoder=json.loads,
+                schema='pg_catalog'
+            )
+
+    async def startup(self) -> None:
+        """Open the connection pool."""
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(
+                self.database_url,
+                min_size=self.pool_min_size,
+                max_size=self.pool_max_size,
+                statement_cache_size=self.statement_cache_size,
+                init=self._init_connection
+            )
+
+    async def aclose(self) -> None:
+        """Close the connection pool and the inherited Supabase executor."""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        await super().aclose()
+
+    async def _get_pool(self) -> "asyncpg.Pool":
+        if self._pool is None:
+            await self.startup()
+        return self._pool
+
+    async def _fetchrow(self, query: str, *args) -> Optional[Dict[str, Any]]:
+        pool = await self._get_pool()
+        record = await pool.fetchrow(query, *args)
+        return _record_to_dict(record) if record else None
+
+    async def _fetch(self, query: str, *args) -> List[Dict[str, Any]]:
+        pool = await self._get_pool()
+        return [_record_to_dict(record) for record in await pool.fetch(query, *args)]
+
+    # === Drivers ===
+
+    async def create_driver(self, driver: Driver) -> str:
+        """Create a new driver."""
+        row = await self._fetchrow(
+            """
+            INSERT INTO drivers (
+                name, phone, email, vehicle_type, vehicle_number, qr_code_url,
+                balance, total_earnings, created_at, updated_at
+            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, NOW(), NOW())
+            RETURNING id
+            """,
+            driver.name, driver.phone, driver.email, driver.vehicle_type.value,
+            driver.vehicle_number, driver.qr_code_url, driver.balance, driver.total_earnings
+        )
+
+        if row:
+            return row['id']
+        else:
+            raise Exception("Failed to create driver")
+
+    async def create_drivers(self, drivers: List[Driver]) -> Dict[str, str]:
+        """Insert several drivers in one statement (all or nothing). Returns phone -> driver id."""
+        rows = await self._fetch(
+            INSERT_DRIVERS_SQL,
+            [d.name for d in drivers], [d.phone for d in drivers], [d.email for d in drivers],
+            [d.vehicle_type.value for d in drivers], [d.vehicle_number for d in drivers]
+        )
+        return {row['phone']: row['id'] for row in rows}
+
+    async def _fetch_driver(self, driver_id: str) -> Optional[Driver]:
+        """Load a driver from the database, bypassing the cache."""
+        row = await self._fetchrow(GET_DRIVER_SQL, UUID(driver_id))
+        return Driver(**row) if row else None
+
+    async def get_driver_short_codes(self, driver_ids: Optional[List[str]] = None) -> Dict[str, str]:
+        """Map driver id -> short_code for the given drivers, or for every driver."""
+        if driver_ids is None:
+            rows = await self._fetch(DRIVER_SHORT_CODES_SQL)
+        else:
+            rows = await self._fetch(DRIVER_SHORT_CODES_BY_ID_SQL, [UUID(driver_id) for driver_id in driver_ids])
+        return {row['id']: row['short_code'] for row in rows}
+
+    async def get_driver_id_by_short_code(self, short_code: str) -> Optional[str]:
+        """Resolve a QR short code to a driver id."""
+        row = await self._fetchrow(GET_DRIVER_ID_BY_SHORT_CODE_SQL, short_code)
+        return row['id'] if row else None
+
+    async def _update_driver_row(self, driver_id: str, data: Dict[str, Any]) -> bool:
+        """Write driver changes to the database."""
+        columns = [column for column in data if column != 'updated_at']
+        unknown = set(columns) - DRIVER_UPDATABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Cannot update driver columns: {', '.join(sorted(unknown))}")
+        if not columns:
+            return False
+
+        assignments = ", ".join(f"{column} = ${i}" for i, column in enumerate(columns, start=2))
+        row = await self._fetchrow(
+            f"UPDATE drivers SET {assignments}, updated_at = NOW() WHERE id = $1 RETURNING id",
+            UUID(driver_id), *(data[column] for column in columns)
+        )
+        return row is not None
+
+    async def get_driver_transactions(self, driver_id: str, limit: int = 50, cursor: Optional[str] = None) -> List[TransactionListItem]:
+        """Get transactions for a specific driver, newest first, after an optional cursor."""
+        rows = await self._fetch(DRIVER_TRANSACTIONS_PAGE_SQL, UUID(driver_id), *_cursor_args(cursor), limit)
+        return [TransactionListItem(**tx) for tx in rows]
+
+    # === Admin ===
+
+    async def get_admin_stats(self) -> AdminStats:
+        """Get admin statistics (sum of the admin_stats_shards counters)."""
+        row = await self._fetchrow(GET_ADMIN_STATS_SQL)
+        return AdminStats(**row) if row and row['total_transactions'] is not None else AdminStats()
+
+    async def get_all_transactions(self, limit: int = 100, cursor: Optional[str] = None) -> List[TransactionListItem]:
+        """Get all transactions for admin view, newest first, after an optional cursor."""
+        rows = await self._fetch(ALL_TRANSACTIONS_PAGE_SQL, *_cursor_args(cursor), limit)
+        return [TransactionListItem(**tx) for tx in rows]
+
+    async def get_stats_timeseries(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: StatsGranularity,
+        vehicle_type: Optional[str] = None
+    ) -> List[StatsBucket]:
+        """Revenue/payout totals per bucket in [start, end) from the rollup tables."""
+        rows = await self._fetch(STATS_TIMESERIES_SQL, start, end, granularity.value, vehicle_type)
+        return [StatsBucket(**row) for row in rows]
+
+    # === M-Pesa transactions ===
+
+    async def create_transaction(self, transaction: Transaction) -> str:
+        """Create a transaction and credit the driver and admin stats in one database transaction."""
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    transaction_id = await conn.fetchval(INSERT_TRANSACTION_SQL, *_transaction_args(transaction))
+                    await conn.execute(
+                        "SELECT update_driver_balance($1, $2)",
+                        UUID(transaction.driver_id), transaction.driver_amount
+                    )
+                    await conn.execute(
+                        "SELECT update_admin_stats($1, $2, $3)",
+                        1, transaction.amount_paid, transaction.platform_fee
+                    )
+        except Exception as e:
+            raise Exception(f"Transaction creation failed: {str(e)}")
+
+        # The driver's balance changed
+        self.driver_cache.invalidate(transaction.driver_id)
+        return str(transaction_id)
+
+    async def update_transaction_status(self, checkout_request_id: str, status: TransactionStatus, mpesa_receipt: Optional[str] = None) -> bool:
+        """Update transaction status based on M-Pesa callback."""
+        rows = await self._fetch(UPDATE_TRANSACTION_STATUS_SQL, checkout_request_id, status.value, mpesa_receipt)
+        return len(rows) > 0
+
+    async def get_transaction_by_checkout_id(self, checkout_request_id: str) -> Optional[Transaction]:
+        """Get transaction by checkout request ID."""
+        row = await self._fetchrow(GET_TRANSACTION_BY_CHECKOUT_ID_SQL, checkout_request_id)
+        return Transaction(**row) if row else None
+
+    async def update_transaction_checkout_id(self, transaction_id: str, checkout_request_id: str) -> bool:
+        """Update transaction with checkout request ID."""
+        row = await self._fetchrow(UPDATE_TRANSACTION_CHECKOUT_ID_SQL, UUID(transaction_id), checkout_request_id)
+        return row is not None
+
+    # === IntaSend-specific methods ===
+
+    async def create_transaction_with_intasend(self, transaction: Transaction) -> str:
+        """Create a new transaction for IntaSend workflow (uses transaction.id when set)."""
+        row = await self._fetchrow(INSERT_TRANSACTION_SQL, *_transaction_args(transaction))
+
+        if row:
+            return row['id']
+        else:
+            raise Exception("Failed to create transaction")
+
+    async def update_transaction_collection(
+        self,
+        transaction_id: str,
+        collection_id: str,
+        collection_status: str,
+        collection_response: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Update transaction with IntaSend collection details."""
+        row = await self._fetchrow(
+            UPDATE_TRANSACTION_COLLECTION_SQL,
+            UUID(transaction_id), collection_id, collection_status, collection_response or None
+        )
+        return row is not None
+
+    async def complete_collection(
+        self,
+        transaction_id: str,
+        collection_id: str,
+        collection_response: Optional[Dict[str, Any]] = None
+    ) -> Optional[CollectionCompletion]:
+        """Complete a collection in one round trip via the complete_collection function."""
+        row = await self._fetchrow(
+            COMPLETE_COLLECTION_SQL,
+            UUID(transaction_id), collection_id, collection_response or None
+        )
+        return CollectionCompletion(**row) if row else None
+
+    async def get_transaction(self, transaction_id: str) -> Optional[Transaction]:
+        """Get transaction by ID."""
+        row = await self._fetchrow(GET_TRANSACTION_SQL, UUID(transaction_id))
+        return Transaction(**row) if row else None
+
+    async def get_transaction_status(self, transaction_id: str) -> Optional[TransactionStatusResponse]:
+        """Get only the status columns of a transaction."""
+        row = await self._fetchrow(GET_TRANSACTION_STATUS_SQL, UUID(transaction_id))
+        if not row:
+            return None
+        return TransactionStatusResponse(transaction_id=row.pop('id'), **row)
+
+    async def get_transaction_by_collection_id(self, collection_id: str) -> Optional[Transaction]:
+        """Get transaction by IntaSend collection ID."""
+        row = await self._fetchrow(GET_TRANSACTION_BY_COLLECTION_ID_SQL, collection_id)
+        return Transaction(**row) if row else None
+
+    async def create_payout(self, payout: Payout) -> str:
+        """Create a new payout record."""
+        row = await self._fetchrow(
+            INSERT_PAYOUT_SQL,
+            UUID(payout.transaction_id), UUID(payout.driver_id), payout.amount,
+            payout.tracking_id, payout.status.value, payout.intasend_response, payout.failure_reason
+        )
+
+        if row:
+            return row['id']
+        else:
+            raise Exception("Failed to create payout")
+
+    async def update_payout_status(
+        self,
+        payout_id: str,
+        status: PayoutStatus,
+        tracking_id: Optional[str] = None,
+        intasend_response: Optional[Dict[str, Any]] = None,
+        failure_reason: Optional[str] = None
+    ) -> bool:
+        """Update payout status."""
+        row = await self._fetchrow(
+            UPDATE_PAYOUT_STATUS_SQL,
+            UUID(payout_id), status.value, tracking_id or None,
+            intasend_response or None, failure_reason or None
+        )
+        return row is not None
+
+    async def update_transaction_payout(
+        self,
+        transaction_id: str,
+        tracking_id: str,
+        payout_status: str,
+        payout_response: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Update transaction with payout details."""
+        row = await self._fetchrow(
+            UPDATE_TRANSACTION_PAYOUT_SQL,
+            UUID(transaction_id), tracking_id, payout_status, payout_response or None
+        )
+        return row is not None
+
+    async def get_payout_by_tracking_id(self, tracking_id: str) -> Optional[Payout]:
+        """Get payout by tracking ID."""
+        row = await self._fetchrow(GET_PAYOUT_BY_TRACKING_ID_SQL, tracking_id)
+        return Payout(**row) if row else None
+
+    async def create_platform_fee(self, platform_fee: PlatformFee) -> str:
+        """Record platform fee collection."""
+        row = await self._fetchrow(
+            INSERT_PLATFORM_FEE_SQL,
+            UUID(platform_fee.transaction_id), platform_fee.amount, platform_fee.fee_type,
+            platform_fee.percentage_applied, platform_fee.fixed_amount_applied
+        )
+
+        if row:
+            return row['id']
+        else:
+            raise Exception("Failed to record platform fee")
+
+    async def get_driver_payouts(self, driver_id: str, limit: int = 50, cursor: Optional[str] = None) -> List[PayoutListItem]:
+        """Get payouts for a specific driver, newest first, after an optional cursor."""
+        rows = await self._fetch(DRIVER_PAYOUTS_PAGE_SQL, UUID(driver_id), *_cursor_args(cursor), limit)
+        return [PayoutListItem(**payout) for payout in rows]
+
+    async def get_pending_payouts(self, limit: int = 100) -> List[Payout]:
+        """Get all pending payouts."""
+        rows = await self._fetch(
+            "SELECT * FROM payouts WHERE status = $1 ORDER BY created_at ASC LIMIT $2",
+            PayoutStatus.PENDING.value, limit
+        )
+        return [Payout(**payout) for payout in rows]
+
+    # === Payout job queue ===
+
+    async def claim_payout_jobs(self, worker_id: str, limit: int = 10, lease_seconds: int = 300) -> List[PayoutJob]:
+        """Claim due payout jobs for a worker (FOR UPDATE SKIP LOCKED)."""
+        rows = await self._fetch(CLAIM_PAYOUT_JOBS_SQL, worker_id, limit, lease_seconds)
+        return [PayoutJob(**job) for job in rows]
+
+    async def complete_payout_job(self, job_id: int, worker_id: str) -> bool:
+        """Mark a claimed payout job as done."""
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT complete_payout_job($1, $2)", job_id, worker_id)
+
+    async def fail_payout_job(self, job_id: int, worker_id: str, error: str, retry_in_seconds: int) -> Optional[str]:
+        """Record a failed attempt. Returns the new job status ('queued' or 'dead')."""
+        pool = await self._get_pool()
+        return await pool.fetchval(
+            "SELECT fail_payout_job($1, $2, $3, $4)",
+            job_id, worker_id, error, retry_in_seconds
+        )
+
+    async def dead_letter_payout_job(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Dead-letter a claimed payout job for manual review, without retrying."""
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT dead_letter_payout_job($1, $2, $3)", job_id, worker_id, error)
+
+    async def set_driver_qr_urls(self, qr_urls: Dict[str, str]) -> int:
+        """Set qr_code_url for many drivers in one call (driver id -> url). Returns rows updated."""
+        items = [{'id': driver_id, 'qr_code_url': url} for driver_id, url in qr_urls.items()]
+        pool = await self._get_pool()
+        try:
+            return await pool.fetchval("SELECT set_driver_qr_urls($1::jsonb)", items)
+        finally:
+            for driver_id in qr_urls:
+                self.driver_cache.invalidate(driver_id)
+
+    # === Driver ledger ===
+
+    async def compact_driver_ledger(self, limit: int = 100000) -> int:
+        """Fold new ledger entries into the balance snapshots. Returns entries folded."""
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT compact_driver_ledger($1)", limit)
+
+    async def check_driver_ledger(self) -> List[Dict[str, Any]]:
+        """Drivers whose materialized balance disagrees with the full ledger (empty when consistent)."""
+        return await self._fetch("SELECT * FROM check_driver_ledger()")
+
+    # === Webhook deduplication ===
+
+    async def claim_webhook_event(self, event_key: str, lease_seconds: int = 300) -> str:
+        """Claim a webhook delivery. Returns 'claimed', 'done' (already processed) or 'processing' (held elsewhere)."""
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT claim_webhook_event($1, $2)", event_key, lease_seconds)
+
+    async def complete_webhook_event(self, event_key: str) -> bool:
+        """Mark a claimed webhook delivery as processed."""
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT complete_webhook_event($1)", event_key)
+
+    async def release_webhook_event(self, event_key: str) -> bool:
+        """Drop a claim after a processing failure so a retry is processed."""
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT release_webhook_event($1)", event_key)
+
+    async def claim_idempotency_key(self, key: str, fingerprint: str, ttl_seconds: int) -> Dict[str, Any]:
+        """Claim an idempotency key (see SupabaseManager.claim_idempotency_key)."""
+        row = await self._fetchrow("SELECT * FROM claim_idempotency_key($1, $2, $3)", key, fingerprint, ttl_seconds)
+        if not row:
+            return {'claimed': False, 'fingerprint': fingerprint, 'response': None}
+        return row
+
+    async def save_idempotency_response(self, key: str, response: Dict[str, Any]) -> bool:
+        """Store the response for a claimed idempotency key."""
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT save_idempotency_response($1, $2)", key, response)
+
+    async def release_idempotency_key(self, key: str) -> bool:
+        """Drop the claim of a failed request."""
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT release_idempotency_key($1)", key)
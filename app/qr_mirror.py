@@ -0,0 +1,82 @@
+import os
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from .qr_utils import render_qr_async
+from .qr_tokens import qr_token_signer
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QRStorageMirror:
+    """
+    Optional background copy of driver QR codes to Supabase Storage.
+
+    QR images are served by the app itself (/qr/{driver_id}.png), so nothing
+    waits on Storage. When enabled, ``submit`` queues a driver and a few
+    workers render and upload the image in the background, for anyone who
+    still wants the files in the bucket. Uploads that fail are logged and
+    counted, never retried; when the queue is full new drivers are skipped.
+    """
+
+    def __init__(self, data_manager, enabled: bool = False, workers: int = 2, queue_size: int = 10000):
+        self.data_manager = data_manager
+        self.enabled = enabled
+        self.workers = workers
+        self._queue: "asyncio.Queue[Tuple[str, Optional[str]]]" = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, driver_id: str, phone: Optional[str] = None) -> None:
+        """Queue a driver's QR code for upload; returns immediately."""
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait((driver_id, phone))
+        except asyncio.QueueFull:
+            metrics.incr("qr_mirror.dropped")
+            logger.warning(f"QR mirror queue full, not uploading QR for driver {driver_id}")
+
+    async def _worker(self) -> None:
+        while True:
+            driver_id, phone = await self._queue.get()
+            try:
+                # Render exactly what /qr/{driver_id}.png serves
+                driver = await self.data_manager.get_driver(driver_id)
+                if not driver:
+                    raise Exception("Driver not found")
+                qr_bytes = await render_qr_async(qr_token_signer.qr_payload(driver, phone))
+                await self.data_manager.upload_qr_code(driver_id, qr_bytes)
+                metrics.incr("qr_mirror.uploaded")
+            except Exception as e:
+                metrics.incr("qr_mirror.failed")
+                logger.warning(f"QR mirror upload failed for driver {driver_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        if self.enabled and not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Give queued uploads ``drain_timeout`` seconds to finish, then stop."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"QR mirror stopped with {self._queue.qsize()} uploads pending")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def create_qr_mirror(data_manager) -> QRStorageMirror:
+    """Build the Storage mirror from QR_STORAGE_MIRROR / QR_MIRROR_WORKERS."""
+    return QRStorageMirror(
+        data_manager,
+        enabled=os.getenv('QR_STORAGE_MIRROR', 'false').lower() == 'true',
+        workers=int(os.getenv('QR_MIRROR_WORKERS', '2'))
+    )
@@ -0,0 +1,229 @@
+import os
+import hmac
+import base64
+import hashlib
+import logging
+import struct
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from .models import Driver, VehicleType
+from .qr_utils import payment_qr_payload, token_payment_url
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Byte index of each vehicle type in a token; append new types, never reorder
+_VEHICLE_TYPES = list(VehicleType)
+# Display fields are cut to keep tokens (and the QR codes) small
+MAX_NAME_BYTES = 40
+MAX_VEHICLE_NUMBER_BYTES = 16
+
+
+class InvalidQRToken(ValueError):
+    """Raised when a QR token is malformed, tampered with or signed with an unknown key."""
+
+
+class RevokedQRToken(InvalidQRToken):
+    """Raised when a valid QR token (or its driver) is on the denylist."""
+
+
+@dataclass
+class QRTokenClaims:
+    """What a verified token says about the driver; shaped like Driver for the payment templates."""
+    id: str
+    name: str
+    vehicle_type: VehicleType
+    vehicle_number: str
+    generation: int
+    key_version: int
+    phone: str = ""  # not carried in tokens
+
+
+def _truncate(text: str, max_bytes: int) -> bytes:
+    return text.encode()[:max_bytes].decode(errors="ignore").encode()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class QRTokenSigner:
+    """
+    Issues and verifies the signed tokens QR codes can carry (/t/<token>).
+
+    A token is base64url of:
+
+        key version (1 byte) | driver UUID (16) | QR generation (2)
+        | vehicle type (1) | name length (1) + name
+        | vehicle number length (1) + vehicle number
+        | HMAC-SHA256 of all the above, truncated to ``mac_bytes``
+
+    so the payment page can show the driver without a database call.
+    Tokens are deterministic per driver and ``Driver.qr_generation``, so
+    the QR image (and its ETag) only changes when the generation is bumped.
+
+    - Rotation: ``keys`` maps version -> secret. New tokens are signed with
+      ``current_version``; tokens of any other configured version still
+      verify until that version is removed.
+    - Revocation: a small in-memory denylist of token MACs and driver ids.
+      It is per process; list permanent revocations in QR_TOKEN_DENYLIST so
+      every worker loads them at startup. To reprint a revoked QR code, bump
+      the driver's qr_generation: the new token differs from the revoked one.
+    """
+
+    def __init__(
+        self,
+        keys: Dict[int, bytes],
+        current_version: Optional[int] = None,
+        mac_bytes: int = 12,
+        embed_in_qr: bool = False
+    ):
+        for version in keys:
+            if not 0 <= version <= 255:
+                raise ValueError(f"QR token key version must be 0-255, got {version}")
+        self.keys = keys
+        self.current_version = current_version if current_version is not None else max(keys, default=None)
+        if self.current_version is not None and self.current_version not in keys:
+            raise ValueError(f"No QR token key for version {self.current_version}")
+        self.mac_bytes = mac_bytes
+        self.embed_in_qr = embed_in_qr
+        self._revoked_macs: Set[bytes] = set()
+        self._revoked_drivers: Set[str] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.current_version is not None
+
+    def _mac(self, version: int, body: bytes) -> bytes:
+        return hmac.new(self.keys[version], body, hashlib.sha256).digest()[:self.mac_bytes]
+
+    def issue(self, driver: Driver) -> str:
+        """Signed token for ``driver`` with the current key."""
+        if not self.enabled:
+            raise InvalidQRToken("No QR token signing key configured")
+        name = _truncate(driver.name, MAX_NAME_BYTES)
+        vehicle_number = _truncate(driver.vehicle_number, MAX_VEHICLE_NUMBER_BYTES)
+        body = (
+            struct.pack("B", self.current_version)
+            + uuid.UUID(driver.id).bytes
+            + struct.pack(">H", driver.qr_generation % 65536)
+            + struct.pack("BB", _VEHICLE_TYPES.index(driver.vehicle_type), len(name)) + name
+            + struct.pack("B", len(vehicle_number)) + vehicle_number
+        )
+        return _b64encode(body + self._mac(self.current_version, body))
+
+    def verify(self, token: str) -> QRTokenClaims:
+        """Check a token's signature and the denylist; returns its claims."""
+        claims, mac = self._decode(token)
+        if mac in self._revoked_macs or claims.id in self._revoked_drivers:
+            metrics.incr("qr_tokens.revoked")
+            raise RevokedQRToken("QR token has been revoked")
+
+        metrics.incr("qr_tokens.verified")
+        return claims
+
+    def _decode(self, token: str) -> Tuple[QRTokenClaims, bytes]:
+        """Check a token's signature and parse it; returns (claims, MAC)."""
+        try:
+            raw = _b64decode(token)
+        except ValueError:
+            raise InvalidQRToken("Malformed QR token")
+        if len(raw) < 22 + self.mac_bytes:
+            raise InvalidQRToken("Malformed QR token")
+
+        body, mac = raw[:-self.mac_bytes], raw[-self.mac_bytes:]
+        version = body[0]
+        if version not in self.keys:
+            metrics.incr("qr_tokens.unknown_key")
+            raise InvalidQRToken(f"Unknown QR token key version {version}")
+        if not hmac.compare_digest(mac, self._mac(version, body)):
+            metrics.incr("qr_tokens.bad_signature")
+            raise InvalidQRToken("Bad QR token signature")
+
+        try:
+            driver_id = str(uuid.UUID(bytes=body[1:17]))
+            (generation,) = struct.unpack(">H", body[17:19])
+            vehicle_type = _VEHICLE_TYPES[body[19]]
+            name_end = 21 + body[20]
+            name = body[21:name_end].decode()
+            vehicle_number = body[name_end + 1:name_end + 1 + body[name_end]].decode()
+        except (IndexError, UnicodeDecodeError):
+            raise InvalidQRToken("Malformed QR token")
+
+        claims = QRTokenClaims(
+            id=driver_id,
+            name=name,
+            vehicle_type=vehicle_type,
+            vehicle_number=vehicle_number,
+            generation=generation,
+            key_version=version
+        )
+        return claims, mac
+
+    def revoke_token(self, token: str) -> QRTokenClaims:
+        """
+        Deny one token; returns its claims. Bump the driver's qr_generation
+        past ``claims.generation`` so a reprinted QR gets a new token.
+        """
+        claims, mac = self._decode(token)
+        self._revoked_macs.add(mac)
+        return claims
+
+    def revoke_driver(self, driver_id: str) -> None:
+        """Deny every token issued for a driver."""
+        self._revoked_drivers.add(str(uuid.UUID(driver_id)))
+
+    def qr_payload(self, driver: Driver, passenger_phone: str = None) -> str:
+        """
+        Text to encode in a driver's QR code: the /t/<token> URL when
+        QR_PAYLOAD=token and a signing key is set, otherwise the short URL.
+        """
+        if self.embed_in_qr and self.enabled:
+            return token_payment_url(self.issue(driver))
+        return payment_qr_payload(driver.id, passenger_phone, driver.short_code)
+
+
+def _parse_keys(value: str) -> Dict[int, bytes]:
+    keys = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        version, _, secret = item.partition(":")
+        if not secret:
+            raise ValueError("QR_TOKEN_KEYS entries must look like <version>:<secret>")
+        keys[int(version)] = secret.encode()
+    return keys
+
+
+def create_qr_token_signer() -> QRTokenSigner:
+    """
+    Build the signer from the environment.
+
+    - QR_TOKEN_KEYS: comma-separated <version>:<secret> pairs
+    - QR_TOKEN_KEY_VERSION: version new tokens are signed with (default: highest)
+    - QR_PAYLOAD: ``short`` (default) or ``token`` for what new QR codes encode
+    - QR_TOKEN_DENYLIST: comma-separated driver ids and tokens to reject
+    """
+    keys = _parse_keys(os.getenv('QR_TOKEN_KEYS', ''))
+    current = os.getenv('QR_TOKEN_KEY_VERSION')
+    embed = os.getenv('QR_PAYLOAD', 'short').lower() == 'token'
+    if embed and not keys:
+        logger.warning("QR_PAYLOAD=token but QR_TOKEN_KEYS is not set; QR codes use short URLs")
+
+    signer = QRTokenSigner(keys, current_version=int(current) if current else None, embed_in_qr=embed)
+    for entry in filter(None, (part.strip() for part in os.getenv('QR_TOKEN_DENYLIST', '').split(","))):
+        try:
+            signer.revoke_driver(entry)
+        except ValueError:
+            try:
+                signer.revoke_token(entry)
+            except InvalidQRToken:
+                logger.warning(f"Ignoring malformed QR_TOKEN_DENYLIST entry: {entry}")
+    return signer
+
+
+qr_token_signer = create_qr_token_signer()
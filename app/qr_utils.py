@@ -1,55 +1,264 @@
 import os
+import asyncio
+import hashlib
+import threading
 import qrcode
+import qrcode.image.svg
 from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
-def generate_payment_qr(driver_id: str, passenger_phone: str = None) -> bytes:
+from .metrics import metrics
+
+# png:  PNG as written by qrcode/PIL (the original output)
+# png1: 2-colour palette PNG at 1 bit per pixel, zlib-optimized
+# svg:  vector path, scales to any print size
+QR_FORMATS = ("png", "png1", "svg")
+QR_CONTENT_TYPES = {"png": "image/png", "png1": "image/png", "svg": "image/svg+xml"}
+
+# Format and module size of the QR images stored for drivers (png or png1)
+QR_IMAGE_FORMAT = os.getenv('QR_IMAGE_FORMAT', 'png1')
+QR_BOX_SIZE = int(os.getenv('QR_BOX_SIZE', '10'))
+QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', '1024'))
+QR_RENDER_WORKERS = int(os.getenv('QR_RENDER_WORKERS', '2'))
+# Browser/CDN cache lifetime of /qr/{driver_id}.png|.svg
+QR_HTTP_MAX_AGE = int(os.getenv('QR_HTTP_MAX_AGE', '604800'))
+
+# /qr/{driver_id}.<extension> -> render format
+QR_EXTENSIONS = {"png": QR_IMAGE_FORMAT if QR_IMAGE_FORMAT in ("png", "png1") else "png1", "svg": "svg"}
+
+_ERROR_CORRECTION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+class QRRenderCache:
     """
-    Generate QR code for driver payment URL.
-    
-    Args:
-        driver_id: The unique identifier for the driver
-        passenger_phone: Optional phone number to pre-fill in payment form
-        
-    Returns:
-        Bytes of the QR code image in PNG format
+    Thread-safe LRU of rendered QR images.
+
+    Keys are a SHA-256 of the payload and render options, so the same
+    content always maps to the same entry whoever asks for it. Shared
+    between the event loop (lookups) and the render threads (stores).
     """
+
+    def __init__(self, maxsize: int = 1024, name: str = "qr_cache"):
+        self.maxsize = maxsize
+        self.name = name
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(data: str, fmt: str, box_size: int, border: int, error_correction: str) -> str:
+        options = f"{fmt}|{box_size}|{border}|{error_correction}|"
+        return hashlib.sha256(options.encode() + data.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+        metrics.incr(f"{self.name}.hits" if image is not None else f"{self.name}.misses")
+        return image
+
+    def set(self, key: str, image: bytes) -> None:
+        with self._lock:
+            self._entries[key] = image
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            size = len(self._entries)
+        metrics.set_gauge(f"{self.name}.size", size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+qr_cache = QRRenderCache(maxsize=QR_CACHE_SIZE)
+_render_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _encode(data: str, fmt: str, box_size: int, border: int, error_correction: str) -> bytes:
+    if fmt not in QR_FORMATS:
+        raise ValueError(f"Unknown QR format: {fmt}")
+
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=_ERROR_CORRECTION[error_correction],
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img_buffer = BytesIO()
+    if fmt == "svg":
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(img_buffer)
+        return img_buffer.getvalue()
+
+    qr_image = qr.make_image(fill_color="black", back_color="white")
+    if fmt == "png1":
+        qr_image.get_image().convert("1").convert("P").save(img_buffer, format='PNG', bits=1, optimize=True)
+    else:
+        qr_image.save(img_buffer, format='PNG')
+    return img_buffer.getvalue()
+
+
+def _render_and_store(key: str, data: str, fmt: str, box_size: int, border: int, error_correction: str) -> bytes:
+    image = _encode(data, fmt, box_size, border, error_correction)
+    qr_cache.set(key, image)
+    return image
+
+
+def render_qr(
+    data: str,
+    fmt: str = QR_IMAGE_FORMAT,
+    box_size: int = QR_BOX_SIZE,
+    border: int = 4,
+    error_correction: str = "L"
+) -> bytes:
+    """
+    Render ``data`` as a QR image in ``fmt`` (png, png1 or svg).
+
+    Results are cached by content; identical requests return the same bytes
+    without re-rendering.
+    """
+    key = qr_cache.key(data, fmt, box_size, border, error_correction)
+    image = qr_cache.get(key)
+    if image is None:
+        image = _render_and_store(key, data, fmt, box_size, border, error_correction)
+    return image
+
+
+async def render_qr_async(
+    data: str,
+    fmt: str = QR_IMAGE_FORMAT,
+    box_size: int = QR_BOX_SIZE,
+    border: int = 4,
+    error_correction: str = "L"
+) -> bytes:
+    """
+    render_qr without blocking the event loop.
+
+    Cache hits are answered inline; misses are rendered on a small thread
+    pool (QR_RENDER_WORKERS) so request handlers keep running meanwhile.
+    """
+    global _render_pool
+    key = qr_cache.key(data, fmt, box_size, border, error_correction)
+    image = qr_cache.get(key)
+    if image is not None:
+        return image
+
+    if _render_pool is None:
+        _render_pool = ThreadPoolExecutor(max_workers=QR_RENDER_WORKERS, thread_name_prefix="qr-render")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _render_pool, _render_and_store, key, data, fmt, box_size, border, error_correction
+    )
+
+
+def _base_url() -> str:
     # Get base URL from environment
     base_url = os.getenv('BASE_PUBLIC_URL')
     if not base_url:
         # Fallback to localhost if BASE_PUBLIC_URL not set
         base_url = "http://localhost:8000"
-    
+
     # Remove any trailing slashes
-    base_url = base_url.rstrip('/')
-    
-    # Generate payment URL
-    payment_url = f"{base_url}/pay?driver_id={driver_id}"
+    return base_url.rstrip('/')
+
+
+def payment_url(driver_id: str, passenger_phone: str = None) -> str:
+    """Payment page URL encoded in a driver's QR code."""
+    url = f"{_base_url()}/pay?driver_id={driver_id}"
     if passenger_phone:
-        payment_url += f"&phone={passenger_phone}"
-    
-    # Create QR code instance
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    
-    # Add data
-    qr.add_data(payment_url)
+        url += f"&phone={passenger_phone}"
+    return url
+
+
+def short_payment_url(short_code: str) -> str:
+    """Compact payment URL (/p/<short_code>) encoded in new QR codes."""
+    return f"{_base_url()}/p/{short_code}"
+
+
+def token_payment_url(token: str) -> str:
+    """Payment URL carrying a signed driver token (/t/<token>, see qr_tokens)."""
+    return f"{_base_url()}/t/{token}"
+
+
+def payment_qr_payload(driver_id: str, passenger_phone: str = None, short_code: str = None) -> str:
+    """
+    Text encoded in a driver's QR code: the short URL when the driver has a
+    short code, otherwise the full /pay URL.
+    """
+    if short_code:
+        return short_payment_url(short_code)
+    return payment_url(driver_id, passenger_phone)
+
+
+def qr_version(data: str, error_correction: str = "L") -> int:
+    """Smallest QR version (1-40) that fits ``data``; each step adds 4 modules per side."""
+    qr = qrcode.QRCode(version=None, error_correction=_ERROR_CORRECTION[error_correction])
+    qr.add_data(data)
     qr.make(fit=True)
-    
-    # Create image
-    qr_image = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to bytes
-    img_buffer = BytesIO()
-    qr_image.save(img_buffer, format='PNG')
-    return img_buffer.getvalue()
+    return qr.version
+
+
+def driver_qr_url(driver_id: str, extension: str = "png") -> str:
+    """Public URL of a driver's QR image served by the app (stored as qr_code_url)."""
+    return f"{_base_url()}/qr/{driver_id}.{extension}"
+
+
+def qr_etag(data: str, fmt: str = QR_IMAGE_FORMAT) -> str:
+    """
+    Strong ETag of the QR image for ``data``.
+
+    Derived from the render cache key (payload + options), so it is known
+    without rendering and changes whenever the image would.
+    """
+    return f'"{qr_cache.key(data, fmt, QR_BOX_SIZE, 4, "L")[:32]}"'
 
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header covers ``etag`` (weak comparison, per RFC 9110)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
 
 
+def generate_payment_qr(
+    driver_id: str, passenger_phone: str = None, fmt: str = QR_IMAGE_FORMAT, short_code: str = None
+) -> bytes:
+    """
+    Generate QR code for driver payment URL.
+
+    Args:
+        driver_id: The unique identifier for the driver
+        passenger_phone: Optional phone number to pre-fill in payment form
+        fmt: png, png1 (1-bit palette PNG) or svg; defaults to QR_IMAGE_FORMAT
+        short_code: The driver's short code; when set the QR encodes /p/<short_code>
+
+    Returns:
+        Bytes of the QR code image
+    """
+    return render_qr(payment_qr_payload(driver_id, passenger_phone, short_code), fmt)
+
 
+async def generate_payment_qr_async(
+    driver_id: str, passenger_phone: str = None, fmt: str = QR_IMAGE_FORMAT, short_code: str = None
+) -> bytes:
+    """generate_payment_qr for async handlers; renders off the event loop."""
+    return await render_qr_async(payment_qr_payload(driver_id, passenger_phone, short_code), fmt)
 
 
+def shutdown_render_pool() -> None:
+    """Stop the render threads (called from the app lifespan on shutdown)."""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False)
+        _render_pool = None
@@ -0,0 +1,78 @@
+import re
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Base62 codes assigned by short_codes_migration.sql (random_base62(7))
+SHORT_CODE_PATTERN = re.compile(r'[0-9A-Za-z]{7}')
+
+
+class ShortCodeIndex:
+    """
+    In-memory short_code -> driver_id map behind the /p/{code} resolver.
+
+    ``warm`` loads every driver's code at startup so scans resolve without a
+    database round trip. Codes of drivers registered after that are looked
+    up on first use and kept. Codes never change, so entries are never
+    invalidated; malformed codes are rejected before reaching the database.
+
+    Well-formed codes with no driver are remembered for ``miss_ttl``
+    seconds (at most ``miss_cache_size`` of them, oldest dropped first), so
+    scans of unknown codes cannot hammer the database.
+    """
+
+    def __init__(self, data_manager, miss_ttl: float = 60.0, miss_cache_size: int = 10000):
+        self.data_manager = data_manager
+        self.miss_ttl = miss_ttl
+        self.miss_cache_size = miss_cache_size
+        self._drivers: Dict[str, str] = {}
+        # Unknown code -> monotonic time until which it is answered from memory
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+    async def warm(self) -> None:
+        """Load every driver's short code. On failure codes are looked up on demand."""
+        started = time.perf_counter()
+        try:
+            codes = await self.data_manager.get_driver_short_codes()
+        except Exception as e:
+            logger.warning(f"Could not warm the short code index: {str(e)}")
+            return
+        self._drivers.update({code: driver_id for driver_id, code in codes.items() if code})
+        metrics.set_gauge("short_codes.size", len(self._drivers))
+        logger.info(f"Short code index warmed with {len(self._drivers)} drivers in {time.perf_counter() - started:.2f}s")
+
+    async def resolve(self, short_code: str) -> Optional[str]:
+        """Driver id for ``short_code``, or None if there is no such driver."""
+        driver_id = self._drivers.get(short_code)
+        if driver_id is not None:
+            metrics.incr("short_codes.hits")
+            return driver_id
+        if not SHORT_CODE_PATTERN.fullmatch(short_code):
+            return None
+
+        now = time.monotonic()
+        expires_at = self._misses.get(short_code)
+        if expires_at is not None:
+            if now < expires_at:
+                metrics.incr("short_codes.negative_hits")
+                return None
+            del self._misses[short_code]
+
+        metrics.incr("short_codes.misses")
+        driver_id = await self.data_manager.get_driver_id_by_short_code(short_code)
+        if driver_id is not None:
+            self._drivers[short_code] = driver_id
+            metrics.set_gauge("short_codes.size", len(self._drivers))
+        else:
+            self._misses[short_code] = now + self.miss_ttl
+            while len(self._misses) > self.miss_cache_size:
+                self._misses.popitem(last=False)
+        return driver_id
@@ -0,0 +1,70 @@
+// Infinite scroll for cursor-paginated tables.
+//
+// Loads the next page from `url?cursor=...` when the sentinel element comes
+// into view and appends one row per item using `renderRow(item)`. The API
+// returns {items: [...], next_cursor: "..."}; a null cursor means the end.
+function infiniteScroll({ tbody, sentinel, url, renderRow, onAppend }) {
+    let nextCursor = sentinel.dataset.nextCursor;
+    let loading = false;
+
+    function sentinelVisible() {
+        return sentinel.getBoundingClientRect().top < window.innerHeight + 200;
+    }
+
+    async function loadNextPage() {
+        if (!nextCursor || loading) return;
+        loading = true;
+        sentinel.textContent = 'Loading...';
+        try {
+            const separator = url.includes('?') ? '&' : '?';
+            const response = await fetch(`${url}${separator}cursor=${encodeURIComponent(nextCursor)}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const page = await response.json();
+            page.items.forEach((item) => tbody.appendChild(renderRow(item)));
+            nextCursor = page.next_cursor;
+            sentinel.textContent = nextCursor ? '' : 'No more transactions';
+            if (onAppend) onAppend(page.items);
+        } catch (error) {
+            sentinel.textContent = 'Could not load more. Scroll to retry.';
+        } finally {
+            loading = false;
+        }
+        // Short pages can leave the sentinel on screen without a new intersection
+        if (nextCursor && sentinelVisible()) loadNextPage();
+    }
+
+    if (!nextCursor) return;
+    new IntersectionObserver((entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) loadNextPage();
+    }, { rootMargin: '200px' }).observe(sentinel);
+}
+
+// Helpers shared by the dashboard row renderers
+function tableCell(text, classes) {
+    const td = document.createElement('td');
+    td.className = `px-6 py-4 whitespace-nowrap text-sm ${classes}`;
+    td.textContent = text;
+    return td;
+}
+
+function statusCell(status) {
+    const td = document.createElement('td');
+    td.className = 'px-6 py-4 whitespace-nowrap';
+    const badge = document.createElement('span');
+    const colors = status === 'completed' ? 'bg-green-100 text-green-800'
+        : status === 'pending' ? 'bg-yellow-100 text-yellow-800'
+        : 'bg-red-100 text-red-800';
+    badge.className = `px-2 inline-flex text-xs leading-5 font-semibold rounded-full ${colors}`;
+    badge.textContent = status;
+    td.appendChild(badge);
+    return td;
+}
+
+function formatDate(iso) {
+    // Same format as the server-rendered rows: YYYY-MM-DD HH:MM
+    return iso.slice(0, 16).replace('T', ' ');
+}
+
+function formatKes(amount) {
+    return `KES ${Number(amount).toFixed(2)}`;
+}
@@ -0,0 +1,64 @@
+// Revenue chart for the admin dashboard.
+//
+// Fetches /api/admin/stats/timeseries and draws one bar per bucket (revenue,
+// with the platform fee share darker) as inline SVG. Hovering a bar shows
+// its totals.
+const SVG_NS = 'http://www.w3.org/2000/svg';
+
+function svgElement(name, attrs) {
+    const el = document.createElementNS(SVG_NS, name);
+    Object.entries(attrs).forEach(([key, value]) => el.setAttribute(key, value));
+    return el;
+}
+
+function bucketLabel(iso, granularity) {
+    const date = new Date(iso);
+    return granularity === 'hour'
+        ? date.toLocaleString([], { month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit' })
+        : date.toLocaleDateString([], { month: 'short', day: 'numeric' });
+}
+
+function drawStatsChart(container, series) {
+    const width = 800;
+    const height = 200;
+    const buckets = series.buckets;
+    const maxRevenue = Math.max(1, ...buckets.map((b) => b.revenue));
+    const slot = width / Math.max(buckets.length, 1);
+    const barWidth = Math.max(1, slot * 0.8);
+
+    const svg = svgElement('svg', { viewBox: `0 0 ${width} ${height}`, class: 'w-full h-48', preserveAspectRatio: 'none' });
+    buckets.forEach((b, i) => {
+        const x = i * slot + (slot - barWidth) / 2;
+        const revenueHeight = (b.revenue / maxRevenue) * height;
+        const feeHeight = (b.platform_fees / maxRevenue) * height;
+        const group = svgElement('g', {});
+        const title = svgElement('title', {});
+        title.textContent = `${bucketLabel(b.bucket, series.granularity)}\n`
+            + `${b.transactions} payments, ${formatKes(b.revenue)}\n`
+            + `Fees ${formatKes(b.platform_fees)}, payouts ${formatKes(b.payout_amount)}`;
+        group.append(
+            title,
+            svgElement('rect', { x, y: height - revenueHeight, width: barWidth, height: revenueHeight, fill: '#4ade80' }),
+            svgElement('rect', { x, y: height - feeHeight, width: barWidth, height: feeHeight, fill: '#2563eb' })
+        );
+        svg.appendChild(group);
+    });
+    container.replaceChildren(svg);
+}
+
+async function loadStatsChart({ container, summary, granularity }) {
+    container.textContent = 'Loading...';
+    try {
+        const response = await fetch(`/api/admin/stats/timeseries?granularity=${granularity}`);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const series = await response.json();
+        drawStatsChart(container, series);
+        const revenue = series.buckets.reduce((sum, b) => sum + b.revenue, 0);
+        const fees = series.buckets.reduce((sum, b) => sum + b.platform_fees, 0);
+        const count = series.buckets.reduce((sum, b) => sum + b.transactions, 0);
+        summary.textContent = `${count} payments, ${formatKes(revenue)} revenue, ${formatKes(fees)} fees`;
+    } catch (error) {
+        container.textContent = 'Could not load revenue chart.';
+        summary.textContent = '';
+    }
+}
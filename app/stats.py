@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from .models import StatsGranularity
+
+# Default window when ?from= is omitted
+DEFAULT_TIMESERIES_SPAN = {
+    StatsGranularity.HOUR: timedelta(hours=24),
+    StatsGranularity.DAY: timedelta(days=30),
+}
+BUCKET_SIZE = {
+    StatsGranularity.HOUR: timedelta(hours=1),
+    StatsGranularity.DAY: timedelta(days=1),
+}
+# Upper bound on buckets per request (~3 months hourly, ~5 years daily)
+MAX_TIMESERIES_BUCKETS = 2000
+
+
+class InvalidStatsRange(ValueError):
+    """Raised when a time-series range is empty or too long."""
+
+
+def resolve_timeseries_range(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    granularity: StatsGranularity
+) -> Tuple[datetime, datetime]:
+    """
+    Fill in defaults for a time-series query and validate it.
+
+    ``end`` defaults to now and ``start`` to one default span before ``end``.
+    Naive datetimes are taken as UTC.
+    """
+    end = end or datetime.now(timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    start = start or end - DEFAULT_TIMESERIES_SPAN[granularity]
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+
+    if start >= end:
+        raise InvalidStatsRange("'from' must be before 'to'")
+    if (end - start) / BUCKET_SIZE[granularity] > MAX_TIMESERIES_BUCKETS:
+        raise InvalidStatsRange(
+            f"Range too long for granularity '{granularity.value}' "
+            f"(max {MAX_TIMESERIES_BUCKETS} buckets)"
+        )
+    return start, end
@@ -1,11 +1,32 @@
 import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 from .models import (
     Driver, Transaction, AdminStats, TransactionStatus,
-    Payout, PayoutStatus, PlatformFee
+    Payout, PayoutStatus, PlatformFee, CollectionCompletion, PayoutJob,
+    TransactionListItem, PayoutListItem, TransactionStatusResponse,
+    StatsBucket, StatsGranularity
 )
+from .cache import TTLCache
+from .pagination import decode_cursor
+
+# Column projections for list and status paths. They leave out the
+# collection/payout JSONB payloads, which only the detail endpoint returns.
+TRANSACTION_LIST_COLUMNS = ','.join(TransactionListItem.model_fields)
+PAYOUT_LIST_COLUMNS = ','.join(PayoutListItem.model_fields)
+TRANSACTION_STATUS_COLUMNS = (
+    'id,status,collection_status,payout_status,amount_paid,platform_fee,driver_amount,'
+    'created_at,collection_completed_at,payout_completed_at'
+)
+# Rows per request when loading every driver's short code (PostgREST max-rows)
+SHORT_CODE_PAGE_SIZE = 1000
+# Driver ids per in.(...) filter when looking up short codes for a batch
+SHORT_CODE_BATCH_SIZE = 100
 
 class SupabaseManager:
     def __init__(self):
@@ -16,7 +37,45 @@ class SupabaseManager:
         if not self.supabase_url or not self.supabase_key:
             raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables")
         
-        self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
+        # supabase-py is synchronous: every .execute() is a blocking HTTP call.
+        # Queries run on a bounded thread pool so they never block the event loop,
+        # and all threads share the client's single keep-alive connection pool.
+        self.max_workers = int(os.getenv('SUPABASE_MAX_WORKERS', '32'))
+        self.request_timeout = int(os.getenv('SUPABASE_HTTP_TIMEOUT', '15'))
+        
+        self.supabase: Client = create_client(
+            self.supabase_url,
+            self.supabase_key,
+            options=ClientOptions(postgrest_client_timeout=self.request_timeout)
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="supabase"
+        )
+        
+        # Read-through cache in front of get_driver (QR scans, /api/pay, webhooks)
+        self.driver_cache = TTLCache(
+            maxsize=int(os.getenv('DRIVER_CACHE_SIZE', '5000')),
+            ttl=float(os.getenv('DRIVER_CACHE_TTL', '30')),
+            name="driver_cache"
+        )
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking supabase-py call on the bounded executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _execute(self, query) -> Any:
+        """Execute a PostgREST query builder off the event loop."""
+        return await self._run(query.execute)
+
+    async def startup(self) -> None:
+        """Open backend resources. Nothing to do for PostgREST; see PostgresManager."""
+        return None
+
+    async def aclose(self) -> None:
+        """Wait for in-flight queries and release the executor threads."""
+        await asyncio.to_thread(self._executor.shutdown, wait=True)
 
     async def create_driver(self, driver: Driver) -> str:
         """Create a new driver in Supabase."""
@@ -24,16 +83,42 @@ class SupabaseManager:
         driver_data['created_at'] = datetime.utcnow().isoformat()
         driver_data['updated_at'] = datetime.utcnow().isoformat()
         
-        result = self.supabase.table('drivers').insert(driver_data).execute()
+        result = await self._execute(self.supabase.table('drivers').insert(driver_data))
         
         if result.data:
             return result.data[0]['id']
         else:
             raise Exception("Failed to create driver")
 
+    async def create_drivers(self, drivers: List[Driver]) -> Dict[str, str]:
+        """
+        Insert several drivers in one request (all or nothing).
+        
+        Returns:
+            Mapping of phone number to the new driver id
+        """
+        now = datetime.utcnow().isoformat()
+        rows = []
+        for driver in drivers:
+            driver_data = driver.model_dump(mode='json', exclude={'id', 'created_at', 'updated_at'})
+            driver_data['created_at'] = now
+            driver_data['updated_at'] = now
+            rows.append(driver_data)
+        
+        result = await self._execute(self.supabase.table('drivers').insert(rows))
+        
+        if not result.data or len(result.data) != len(drivers):
+            raise Exception("Failed to create drivers")
+        return {row['phone']: row['id'] for row in result.data}
+
     async def get_driver(self, driver_id: str) -> Optional[Driver]:
-        """Get driver details by ID."""
-        result = self.supabase.table('drivers').select('*').eq('id', driver_id).execute()
+        """Get driver details by ID (served from the driver cache when fresh)."""
+        return await self.driver_cache.get_or_load(driver_id, self._fetch_driver)
+
+    async def _fetch_driver(self, driver_id: str) -> Optional[Driver]:
+        """Load a driver from the database, bypassing the cache."""
+        # driver_accounts = drivers with the balance materialized from driver_ledger
+        result = await self._execute(self.supabase.table('driver_accounts').select('*').eq('id', driver_id))
         
         if result.data:
             driver_data = result.data[0]
@@ -41,13 +126,62 @@ class SupabaseManager:
         return None
 
     async def update_driver(self, driver_id: str, data: Dict[str, Any]) -> bool:
-        """Update driver details."""
+        """Update driver details and invalidate the cached driver."""
+        try:
+            return await self._update_driver_row(driver_id, data)
+        finally:
+            self.driver_cache.invalidate(driver_id)
+
+    async def _update_driver_row(self, driver_id: str, data: Dict[str, Any]) -> bool:
+        """Write driver changes to the database."""
         data['updated_at'] = datetime.utcnow().isoformat()
         
-        result = self.supabase.table('drivers').update(data).eq('id', driver_id).execute()
+        result = await self._execute(self.supabase.table('drivers').update(data).eq('id', driver_id))
         
         return len(result.data) > 0
 
+    async def set_driver_qr_urls(self, qr_urls: Dict[str, str]) -> int:
+        """Set qr_code_url for many drivers in one call (driver id -> url). Returns rows updated."""
+        items = [{'id': driver_id, 'qr_code_url': url} for driver_id, url in qr_urls.items()]
+        try:
+            result = await self._execute(self.supabase.rpc('set_driver_qr_urls', {'p_items': items}))
+            return result.data or 0
+        finally:
+            for driver_id in qr_urls:
+                self.driver_cache.invalidate(driver_id)
+
+    async def get_driver_short_codes(self, driver_ids: Optional[List[str]] = None) -> Dict[str, str]:
+        """Map driver id -> short_code for the given drivers, or for every driver."""
+        codes = {}
+        if driver_ids is not None:
+            # Ids go in the query string, so look them up in modest batches
+            for start in range(0, len(driver_ids), SHORT_CODE_BATCH_SIZE):
+                batch = driver_ids[start:start + SHORT_CODE_BATCH_SIZE]
+                result = await self._execute(
+                    self.supabase.table('drivers').select('id,short_code').in_('id', batch)
+                )
+                codes.update({row['id']: row['short_code'] for row in result.data})
+            return codes
+        
+        # PostgREST caps each response (max-rows), so page through all drivers
+        start = 0
+        while True:
+            result = await self._execute(
+                self.supabase.table('drivers').select('id,short_code')
+                .order('id').range(start, start + SHORT_CODE_PAGE_SIZE - 1)
+            )
+            codes.update({row['id']: row['short_code'] for row in result.data})
+            if len(result.data) < SHORT_CODE_PAGE_SIZE:
+                return codes
+            start += SHORT_CODE_PAGE_SIZE
+
+    async def get_driver_id_by_short_code(self, short_code: str) -> Optional[str]:
+        """Resolve a QR short code to a driver id."""
+        result = await self._execute(
+            self.supabase.table('drivers').select('id').eq('short_code', short_code).limit(1)
+        )
+        return result.data[0]['id'] if result.data else None
+
     async def create_transaction(self, transaction: Transaction) -> str:
         """Create a new transaction with atomic updates."""
         transaction_data = transaction.model_dump(exclude={'id', 'created_at', 'updated_at'})
@@ -57,7 +191,7 @@ class SupabaseManager:
         # Start a transaction
         try:
             # Create the transaction
-            transaction_result = self.supabase.table('transactions').insert(transaction_data).execute()
+            transaction_result = await self._execute(self.supabase.table('transactions').insert(transaction_data))
             
             if not transaction_result.data:
                 raise Exception("Failed to create transaction")
@@ -65,23 +199,23 @@ class SupabaseManager:
             transaction_id = transaction_result.data[0]['id']
             
             # Update driver balance and earnings using RPC function
-            balance_result = self.supabase.rpc(
+            balance_result = await self._execute(self.supabase.rpc(
                 'update_driver_balance',
                 {
                     'driver_id': transaction.driver_id,
                     'amount': transaction.driver_amount
                 }
-            ).execute()
+            ))
             
             # Update admin stats using RPC function
-            stats_result = self.supabase.rpc(
+            stats_result = await self._execute(self.supabase.rpc(
                 'update_admin_stats',
                 {
                     'transaction_count': 1,
                     'revenue': transaction.amount_paid,
                     'platform_fee': transaction.platform_fee
                 }
-            ).execute()
+            ))
             
             return transaction_id
             
@@ -89,35 +223,58 @@ class SupabaseManager:
             # In a real implementation, you'd want to rollback here
             raise Exception(f"Transaction creation failed: {str(e)}")
 
-    async def get_driver_transactions(self, driver_id: str, limit: int = 50) -> List[Transaction]:
-        """Get transactions for a specific driver."""
-        result = (self.supabase.table('transactions')
-                 .select('*')
-                 .eq('driver_id', driver_id)
-                 .order('created_at', desc=True)
-                 .limit(limit)
-                 .execute())
+    @staticmethod
+    def _after_cursor(query, cursor: Optional[str]):
+        """Keyset filter: rows strictly after the cursor in (created_at DESC, id DESC) order."""
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            ts = created_at.isoformat()
+            query = query.or_(f'created_at.lt."{ts}",and(created_at.eq."{ts}",id.lt.{row_id})')
+        return query.order('created_at', desc=True).order('id', desc=True)
+    
+    async def get_driver_transactions(self, driver_id: str, limit: int = 50, cursor: Optional[str] = None) -> List[TransactionListItem]:
+        """Get transactions for a specific driver, newest first, after an optional cursor."""
+        query = self.supabase.table('transactions').select(TRANSACTION_LIST_COLUMNS).eq('driver_id', driver_id)
+        result = await self._execute(self._after_cursor(query, cursor).limit(limit))
         
-        return [Transaction(**tx) for tx in result.data]
+        return [TransactionListItem(**tx) for tx in result.data]
 
     async def get_admin_stats(self) -> AdminStats:
-        """Get admin statistics."""
-        result = self.supabase.table('admin_stats').select('*').eq('id', 'revenue').execute()
+        """Get admin statistics (sum of the admin_stats_shards counters)."""
+        result = await self._execute(self.supabase.rpc('get_admin_stats', {}))
         
-        if result.data:
+        if result.data and result.data[0].get('total_transactions') is not None:
             stats_data = result.data[0]
             return AdminStats(**stats_data)
         
         # Return default stats if none exist
         return AdminStats()
 
+    async def get_stats_timeseries(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: StatsGranularity,
+        vehicle_type: Optional[str] = None
+    ) -> List[StatsBucket]:
+        """Revenue/payout totals per bucket in [start, end) from the rollup tables."""
+        result = await self._execute(self.supabase.rpc('get_stats_timeseries', {
+            'p_from': start.isoformat(),
+            'p_to': end.isoformat(),
+            'p_granularity': granularity.value,
+            'p_vehicle_type': vehicle_type
+        }))
+        
+        return [StatsBucket(**row) for row in result.data or []]
+
     async def upload_qr_code(self, driver_id: str, qr_image_bytes: bytes) -> str:
         """Upload QR code image to Supabase Storage."""
         file_path = f'qr_codes/{driver_id}.png'
         
         # Upload to Supabase Storage
         try:
-            storage_result = self.supabase.storage.from_('qr-codes').upload(
+            storage_result = await self._run(
+                self.supabase.storage.from_('qr-codes').upload,
                 file_path, 
                 qr_image_bytes,
                 file_options={"content-type": "image/png"}
@@ -126,18 +283,15 @@ class SupabaseManager:
             raise Exception(f"Failed to upload QR code: {str(e)}")
         
         # Get public URL
-        public_url = self.supabase.storage.from_('qr-codes').get_public_url(file_path)
+        public_url = await self._run(self.supabase.storage.from_('qr-codes').get_public_url, file_path)
         return public_url
 
-    async def get_all_transactions(self, limit: int = 100) -> List[Transaction]:
-        """Get all transactions for admin view."""
-        result = (self.supabase.table('transactions')
-                 .select('*')
-                 .order('created_at', desc=True)
-                 .limit(limit)
-                 .execute())
+    async def get_all_transactions(self, limit: int = 100, cursor: Optional[str] = None) -> List[TransactionListItem]:
+        """Get all transactions for admin view, newest first, after an optional cursor."""
+        query = self.supabase.table('transactions').select(TRANSACTION_LIST_COLUMNS)
+        result = await self._execute(self._after_cursor(query, cursor).limit(limit))
         
-        return [Transaction(**tx) for tx in result.data]
+        return [TransactionListItem(**tx) for tx in result.data]
 
     async def update_transaction_status(self, checkout_request_id: str, status: TransactionStatus, mpesa_receipt: Optional[str] = None) -> bool:
         """Update transaction status based on M-Pesa callback."""
@@ -149,19 +303,17 @@ class SupabaseManager:
         if mpesa_receipt:
             update_data['mpesa_receipt'] = mpesa_receipt
         
-        result = (self.supabase.table('transactions')
+        result = await self._execute(self.supabase.table('transactions')
                  .update(update_data)
-                 .eq('checkout_request_id', checkout_request_id)
-                 .execute())
+                 .eq('checkout_request_id', checkout_request_id))
         
         return len(result.data) > 0
 
     async def get_transaction_by_checkout_id(self, checkout_request_id: str) -> Optional[Transaction]:
         """Get transaction by checkout request ID."""
-        result = (self.supabase.table('transactions')
+        result = await self._execute(self.supabase.table('transactions')
                  .select('*')
-                 .eq('checkout_request_id', checkout_request_id)
-                 .execute())
+                 .eq('checkout_request_id', checkout_request_id))
         
         if result.data:
             return Transaction(**result.data[0])
@@ -174,25 +326,26 @@ class SupabaseManager:
             'updated_at': datetime.utcnow().isoformat()
         }
         
-        result = (self.supabase.table('transactions')
+        result = await self._execute(self.supabase.table('transactions')
                  .update(update_data)
-                 .eq('id', transaction_id)
-                 .execute())
+                 .eq('id', transaction_id))
         
         return len(result.data) > 0
     
     # === IntaSend-specific methods ===
     
     async def create_transaction_with_intasend(self, transaction: Transaction) -> str:
-        """Create a new transaction for IntaSend workflow."""
+        """Create a new transaction for IntaSend workflow (uses transaction.id when set)."""
         transaction_data = transaction.model_dump(
             exclude={'id', 'created_at', 'updated_at'},
             exclude_none=True
         )
+        if transaction.id:
+            transaction_data['id'] = transaction.id
         transaction_data['created_at'] = datetime.utcnow().isoformat()
         transaction_data['updated_at'] = datetime.utcnow().isoformat()
         
-        result = self.supabase.table('transactions').insert(transaction_data).execute()
+        result = await self._execute(self.supabase.table('transactions').insert(transaction_data))
         
         if result.data:
             return result.data[0]['id']
@@ -222,30 +375,64 @@ class SupabaseManager:
         elif collection_status == 'failed':
             update_data['status'] = TransactionStatus.FAILED.value
         
-        result = (self.supabase.table('transactions')
+        result = await self._execute(self.supabase.table('transactions')
                  .update(update_data)
-                 .eq('id', transaction_id)
-                 .execute())
+                 .eq('id', transaction_id))
         
         return len(result.data) > 0
     
+    async def complete_collection(
+        self,
+        transaction_id: str,
+        collection_id: str,
+        collection_response: Optional[Dict[str, Any]] = None
+    ) -> Optional[CollectionCompletion]:
+        """
+        Complete a collection in one round trip via the complete_collection RPC.
+        
+        Marks the collection completed, records the platform fee, creates the
+        pending payout and returns the driver details needed for the payout.
+        Returns None if the transaction does not exist.
+        """
+        result = await self._execute(self.supabase.rpc(
+            'complete_collection',
+            {
+                'p_transaction_id': transaction_id,
+                'p_collection_id': collection_id,
+                'p_collection_response': collection_response
+            }
+        ))
+        
+        if result.data:
+            return CollectionCompletion(**result.data[0])
+        return None
+    
     async def get_transaction(self, transaction_id: str) -> Optional[Transaction]:
         """Get transaction by ID."""
-        result = (self.supabase.table('transactions')
+        result = await self._execute(self.supabase.table('transactions')
                  .select('*')
-                 .eq('id', transaction_id)
-                 .execute())
+                 .eq('id', transaction_id))
         
         if result.data:
             return Transaction(**result.data[0])
         return None
     
+    async def get_transaction_status(self, transaction_id: str) -> Optional[TransactionStatusResponse]:
+        """Get only the status columns of a transaction."""
+        result = await self._execute(self.supabase.table('transactions')
+                 .select(TRANSACTION_STATUS_COLUMNS)
+                 .eq('id', transaction_id))
+        
+        if result.data:
+            row = result.data[0]
+            return TransactionStatusResponse(transaction_id=row.pop('id'), **row)
+        return None
+    
     async def get_transaction_by_collection_id(self, collection_id: str) -> Optional[Transaction]:
         """Get transaction by IntaSend collection ID."""
-        result = (self.supabase.table('transactions')
+        result = await self._execute(self.supabase.table('transactions')
                  .select('*')
-                 .eq('intasend_collection_id', collection_id)
-                 .execute())
+                 .eq('intasend_collection_id', collection_id))
         
         if result.data:
             return Transaction(**result.data[0])
@@ -261,7 +448,7 @@ class SupabaseManager:
         payout_data['created_at'] = datetime.utcnow().isoformat()
         payout_data['updated_at'] = datetime.utcnow().isoformat()
         
-        result = self.supabase.table('payouts').insert(payout_data).execute()
+        result = await self._execute(self.supabase.table('payouts').insert(payout_data))
         
         if result.data:
             return result.data[0]['id']
@@ -291,10 +478,9 @@ class SupabaseManager:
         if status == PayoutStatus.COMPLETED:
             update_data['completed_at'] = datetime.utcnow().isoformat()
         
-        result = (self.supabase.table('payouts')
+        result = await self._execute(self.supabase.table('payouts')
                  .update(update_data)
-                 .eq('id', payout_id)
-                 .execute())
+                 .eq('id', payout_id))
         
         return len(result.data) > 0
     
@@ -321,19 +507,17 @@ class SupabaseManager:
         elif payout_status == 'failed':
             update_data['status'] = TransactionStatus.PAYOUT_FAILED.value
         
-        result = (self.supabase.table('transactions')
+        result = await self._execute(self.supabase.table('transactions')
                  .update(update_data)
-                 .eq('id', transaction_id)
-                 .execute())
+                 .eq('id', transaction_id))
         
         return len(result.data) > 0
     
     async def get_payout_by_tracking_id(self, tracking_id: str) -> Optional[Payout]:
         """Get payout by tracking ID."""
-        result = (self.supabase.table('payouts')
+        result = await self._execute(self.supabase.table('payouts')
                  .select('*')
-                 .eq('tracking_id', tracking_id)
-                 .execute())
+                 .eq('tracking_id', tracking_id))
         
         if result.data:
             return Payout(**result.data[0])
@@ -348,31 +532,152 @@ class SupabaseManager:
         fee_data['collected_at'] = datetime.utcnow().isoformat()
         fee_data['created_at'] = datetime.utcnow().isoformat()
         
-        result = self.supabase.table('platform_fees').insert(fee_data).execute()
+        result = await self._execute(self.supabase.table('platform_fees').insert(fee_data))
         
         if result.data:
             return result.data[0]['id']
         else:
             raise Exception("Failed to record platform fee")
     
-    async def get_driver_payouts(self, driver_id: str, limit: int = 50) -> List[Payout]:
-        """Get payouts for a specific driver."""
-        result = (self.supabase.table('payouts')
-                 .select('*')
-                 .eq('driver_id', driver_id)
-                 .order('created_at', desc=True)
-                 .limit(limit)
-                 .execute())
+    async def get_driver_payouts(self, driver_id: str, limit: int = 50, cursor: Optional[str] = None) -> List[PayoutListItem]:
+        """Get payouts for a specific driver, newest first, after an optional cursor."""
+        query = self.supabase.table('payouts').select(PAYOUT_LIST_COLUMNS).eq('driver_id', driver_id)
+        result = await self._execute(self._after_cursor(query, cursor).limit(limit))
         
-        return [Payout(**payout) for payout in result.data]
+        return [PayoutListItem(**payout) for payout in result.data]
     
     async def get_pending_payouts(self, limit: int = 100) -> List[Payout]:
         """Get all pending payouts."""
-        result = (self.supabase.table('payouts')
+        result = await self._execute(self.supabase.table('payouts')
                  .select('*')
                  .eq('status', PayoutStatus.PENDING.value)
                  .order('created_at', desc=False)
-                 .limit(limit)
-                 .execute())
+                 .limit(limit))
         
-        return [Payout(**payout) for payout in result.data]
\ No newline at end of file
+        return [Payout(**payout) for payout in result.data]
+    
+    # === Payout job queue ===
+    
+    async def claim_payout_jobs(self, worker_id: str, limit: int = 10, lease_seconds: int = 300) -> List[PayoutJob]:
+        """Claim due payout jobs for a worker (FOR UPDATE SKIP LOCKED)."""
+        result = await self._execute(self.supabase.rpc(
+            'claim_payout_jobs',
+            {
+                'p_worker': worker_id,
+                'p_limit': limit,
+                'p_lease_seconds': lease_seconds
+            }
+        ))
+        
+        return [PayoutJob(**job) for job in result.data or []]
+    
+    async def complete_payout_job(self, job_id: int, worker_id: str) -> bool:
+        """Mark a claimed payout job as done."""
+        result = await self._execute(self.supabase.rpc(
+            'complete_payout_job',
+            {'p_job_id': job_id, 'p_worker': worker_id}
+        ))
+        
+        return bool(result.data)
+    
+    async def fail_payout_job(self, job_id: int, worker_id: str, error: str, retry_in_seconds: int) -> Optional[str]:
+        """Record a failed attempt. Returns the new job status ('queued' or 'dead')."""
+        result = await self._execute(self.supabase.rpc(
+            'fail_payout_job',
+            {
+                'p_job_id': job_id,
+                'p_worker': worker_id,
+                'p_error': error,
+                'p_retry_in_seconds': retry_in_seconds
+            }
+        ))
+        
+        return result.data
+    
+    async def dead_letter_payout_job(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Dead-letter a claimed payout job for manual review, without retrying."""
+        result = await self._execute(self.supabase.rpc(
+            'dead_letter_payout_job',
+            {'p_job_id': job_id, 'p_worker': worker_id, 'p_error': error}
+        ))
+        
+        return bool(result.data)
+    
+    # === Driver ledger ===
+    
+    async def compact_driver_ledger(self, limit: int = 100000) -> int:
+        """Fold new ledger entries into the balance snapshots. Returns entries folded."""
+        result = await self._execute(self.supabase.rpc('compact_driver_ledger', {'p_limit': limit}))
+        return result.data or 0
+    
+    async def check_driver_ledger(self) -> List[Dict[str, Any]]:
+        """Drivers whose materialized balance disagrees with the full ledger (empty when consistent)."""
+        result = await self._execute(self.supabase.rpc('check_driver_ledger', {}))
+        return result.data or []
+
+    # === Webhook deduplication ===
+    
+    async def claim_webhook_event(self, event_key: str, lease_seconds: int = 300) -> str:
+        """Claim a webhook delivery. Returns 'claimed', 'done' (already processed) or 'processing' (held elsewhere)."""
+        result = await self._execute(self.supabase.rpc(
+            'claim_webhook_event',
+            {'p_event_key': event_key, 'p_lease_seconds': lease_seconds}
+        ))
+        
+        return result.data
+    
+    async def complete_webhook_event(self, event_key: str) -> bool:
+        """Mark a claimed webhook delivery as processed."""
+        result = await self._execute(self.supabase.rpc(
+            'complete_webhook_event',
+            {'p_event_key': event_key}
+        ))
+        
+        return bool(result.data)
+    
+    async def release_webhook_event(self, event_key: str) -> bool:
+        """Drop a claim after a processing failure so a retry is processed."""
+        result = await self._execute(self.supabase.rpc(
+            'release_webhook_event',
+            {'p_event_key': event_key}
+        ))
+        
+        return bool(result.data)
+    
+    # === Idempotency keys ===
+    
+    async def claim_idempotency_key(self, key: str, fingerprint: str, ttl_seconds: int) -> Dict[str, Any]:
+        """
+        Claim an idempotency key.
+        
+        Returns:
+            Dict with claimed, fingerprint and response (None while the first
+            request is still running)
+        """
+        result = await self._execute(self.supabase.rpc(
+            'claim_idempotency_key',
+            {'p_key': key, 'p_fingerprint': fingerprint, 'p_ttl_seconds': ttl_seconds}
+        ))
+        
+        if not result.data:
+            # Row expired and was removed concurrently: treat as in progress
+            return {'claimed': False, 'fingerprint': fingerprint, 'response': None}
+        return result.data[0]
+    
+    async def save_idempotency_response(self, key: str, response: Dict[str, Any]) -> bool:
+        """Store the response for a claimed idempotency key."""
+        result = await self._execute(self.supabase.rpc(
+            'save_idempotency_response',
+            {'p_key': key, 'p_response': response}
+        ))
+        
+        return bool(result.data)
+    
+    async def release_idempotency_key(self, key: str) -> bool:
+        """Drop the claim of a failed request."""
+        result = await self._execute(self.supabase.rpc(
+            'release_idempotency_key',
+            {'p_key': key}
+        ))
+        
+        return bool(result.data)
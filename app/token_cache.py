@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Tuple
+
+from .metrics import metrics
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: no cross-process refresh lock
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# A fetcher returns (access_token, expires_in_seconds)
+TokenFetcher = Callable[[], Awaitable[Tuple[str, float]]]
+
+
+class TokenCache:
+    """
+    Expiry-aware OAuth token cache with single-flight refresh.
+
+    - Tokens are reused until ``expires_in`` minus ``refresh_margin``.
+    - Inside the margin the cached token is still served while one background
+      refresh fetches a new one.
+    - Concurrent misses share a single upstream call.
+    - With ``store_path`` set, tokens are shared across worker processes
+      through a small JSON file; an flock on ``<store_path>.lock`` makes
+      sure only one worker refreshes at a time.
+    """
+
+    def __init__(
+        self,
+        fetch: TokenFetcher,
+        refresh_margin: float = 60.0,
+        store_path: Optional[str] = None,
+        metrics_prefix: str = "token"
+    ):
+        self._fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.store_path = store_path
+        self._metrics_prefix = metrics_prefix
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+        # Token the API rejected; never adopted again from the shared store
+        self._rejected: Optional[str] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _metric(self, name: str) -> str:
+        return f"{self._metrics_prefix}.{name}"
+
+    def _is_fresh(self, now: float) -> bool:
+        return self._token is not None and now < self._expires_at - self.refresh_margin
+
+    def _is_valid(self, now: float) -> bool:
+        return self._token is not None and now < self._expires_at
+
+    async def get(self) -> str:
+        """Return a valid access token, fetching one only when necessary."""
+        now = time.time()
+
+        if self._is_fresh(now):
+            metrics.incr(self._metric("cache_hits"))
+            return self._token
+
+        if self._is_valid(now):
+            # Serve the current token and refresh ahead of expiry
+            metrics.incr(self._metric("cache_hits"))
+            self._start_refresh()
+            return self._token
+
+        if self._load_shared(now):
+            metrics.incr(self._metric("shared_hits"))
+            return self._token
+
+        metrics.incr(self._metric("cache_misses"))
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self) -> None:
+        """
+        Drop the cached token, e.g. after the API rejects it with 401.
+
+        The token is remembered as rejected so it is not adopted again from
+        the shared store, which other workers may not have replaced yet;
+        the next ``get`` then fetches a new one.
+        """
+        if self._token is not None:
+            self._rejected = self._token
+        self._token = None
+        self._expires_at = 0.0
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Start a refresh unless one is already in flight (single-flight)."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+            self._refresh_task.add_done_callback(self._log_refresh_failure)
+        return self._refresh_task
+
+    def _log_refresh_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            metrics.incr(self._metric("refresh_failures"))
+            logger.warning(f"Token refresh failed: {task.exception()}")
+
+    async def _refresh(self) -> str:
+        lock_file = await asyncio.to_thread(self._acquire_store_lock)
+        try:
+            # Another worker may have refreshed while we waited for the lock
+            now = time.time()
+            if lock_file is not None and self._load_shared(now) and self._is_fresh(now):
+                metrics.incr(self._metric("shared_hits"))
+                return self._token
+
+            token, expires_in = await self._fetch()
+            metrics.incr(self._metric("refreshes"))
+            self._token = token
+            self._expires_at = time.time() + float(expires_in)
+            self._save_shared()
+            return token
+        finally:
+            if lock_file is not None:
+                await asyncio.to_thread(self._release_store_lock, lock_file)
+
+    # === Shared file store ===
+
+    def _load_shared(self, now: float) -> bool:
+        """Adopt a token written by another worker if it is still valid."""
+        if not self.store_path:
+            return False
+        try:
+            with open(self.store_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        expires_at = float(data.get("expires_at", 0))
+        if not data.get("access_token") or now >= expires_at:
+            return False
+        if data["access_token"] == self._rejected:
+            return False
+        self._token = data["access_token"]
+        self._expires_at = expires_at
+        return True
+
+    def _save_shared(self) -> None:
+        """Atomically write the current token for other workers."""
+        if not self.store_path:
+            return
+        tmp_path = f"{self.store_path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"access_token": self._token, "expires_at": self._expires_at}, f)
+            os.replace(tmp_path, self.store_path)
+        except OSError as e:
+            logger.warning(f"Could not persist token to {self.store_path}: {e}")
+
+    def _acquire_store_lock(self):
+        if not self.store_path or not FCNTL_AVAILABLE:
+            return None
+        try:
+            lock_file = open(f"{self.store_path}.lock", "a")
+        except OSError:
+            return None
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _release_store_lock(self, lock_file) -> None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            lock_file.close()
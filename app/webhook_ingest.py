@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import zlib
+import asyncio
+import logging
+import itertools
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Set
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFull(Exception):
+    """Raised when the consumers are too far behind to accept another event."""
+
+
+class RetryLater(Exception):
+    """Raised by a handler when an event cannot be processed yet; it is retried after ``delay`` seconds."""
+
+    def __init__(self, message: str, delay: float = 30.0):
+        super().__init__(message)
+        self.delay = delay
+
+
+@dataclass
+class IngestItem:
+    """One spooled webhook waiting to be processed."""
+    path: str
+    body: bytes
+    partition_key: str
+    received_at: float
+    payload: Any = None
+
+
+# handler(body, payload) processes one event; payload is whatever was passed to
+# enqueue() (None for events replayed from the spool)
+IngestHandler = Callable[[bytes, Any], Awaitable[None]]
+
+
+class WebhookIngestQueue:
+    """
+    Durable, ordered webhook ingestion.
+
+    ``enqueue`` appends the raw body to an on-disk spool (one fsynced file per
+    event) and hands it to a bounded in-memory queue, so the HTTP handler can
+    acknowledge within milliseconds. A pool of consumers processes the events:
+    each partition key (``api_ref`` / ``tracking_id``) always maps to the same
+    consumer, which keeps events for one transaction in order.
+
+    When a consumer's queue stays full for ``enqueue_timeout`` seconds the
+    event is rejected with IngestQueueFull (the endpoint answers 503 and the
+    provider retries later). Processed events are deleted from the spool;
+    events that keep failing are moved to ``<spool>/failed``. Events whose
+    handler raises RetryLater stay in the spool and are queued again after
+    the requested delay. Spool files left by a stopped process are replayed
+    on the next start.
+    """
+
+    def __init__(
+        self,
+        handler: IngestHandler,
+        spool_dir: str,
+        workers: int = 8,
+        queue_size: int = 1000,
+        enqueue_timeout: float = 2.0,
+        max_attempts: int = 3,
+        fsync: bool = True
+    ):
+        self.handler = handler
+        self.spool_dir = spool_dir
+        self.failed_dir = os.path.join(spool_dir, "failed")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self.fsync = fsync
+
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._deferred: Set[asyncio.Task] = set()
+        self._sequence = itertools.count()
+        self._pid = os.getpid()
+
+    @property
+    def depth(self) -> int:
+        """Events waiting across all consumers."""
+        return sum(queue.qsize() for queue in self._queues)
+
+    def _shard(self, partition_key: str) -> asyncio.Queue:
+        return self._queues[zlib.crc32(partition_key.encode()) % len(self._queues)]
+
+    # === Spool files ===
+
+    def _write_spool(self, path: str, body: bytes, partition_key: str, received_at: float) -> None:
+        header = json.dumps({"key": partition_key, "received_at": received_at}).encode()
+        with open(path, "wb") as f:
+            f.write(header + b"\n" + body)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def _read_spool(path: str) -> IngestItem:
+        with open(path, "rb") as f:
+            header, _, body = f.read().partition(b"\n")
+        meta = json.loads(header)
+        return IngestItem(path=path, body=body, partition_key=meta["key"], received_at=meta["received_at"])
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except (PermissionError, OSError):
+            return True
+        return True
+
+    def _claim_orphans(self) -> List[str]:
+        """Take over spool files from processes that are no longer running."""
+        claimed = []
+        for name in os.listdir(self.spool_dir):
+            if not name.endswith(".evt"):
+                continue
+            owner, _, rest = name.partition("-")
+            if not owner.isdigit():
+                continue
+            if int(owner) != self._pid and self._pid_alive(int(owner)):
+                continue
+            target = os.path.join(self.spool_dir, f"{self._pid}-{rest}")
+            try:
+                os.rename(os.path.join(self.spool_dir, name), target)
+            except FileNotFoundError:
+                continue  # Another process claimed it first
+            claimed.append(target)
+        # File names start with the receive time, so this restores arrival order
+        return sorted(claimed, key=lambda path: os.path.basename(path).partition("-")[2])
+
+    # === Lifecycle ===
+
+    async def start(self) -> None:
+        """Create the spool, start consumers and replay unprocessed events."""
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._consume(queue)) for queue in self._queues]
+
+        orphans = await asyncio.to_thread(self._claim_orphans)
+        if orphans:
+            logger.info(f"Replaying {len(orphans)} spooled webhooks")
+        for path in orphans:
+            try:
+                item = await asyncio.to_thread(self._read_spool, path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Unreadable spooled webhook {path}: {str(e)}")
+                await asyncio.to_thread(self._move_to_failed, path)
+                continue
+            # Replay waits for room instead of rejecting
+            await self._shard(item.partition_key).put(item)
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Process what is queued (up to drain_timeout), then stop consumers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)),
+                timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            # Unprocessed events stay in the spool and are replayed on next start
+            logger.warning(f"{self.depth} webhooks left in spool after {drain_timeout}s drain")
+        # Deferred events are still in the spool and are replayed on next start
+        for task in self._tasks + list(self._deferred):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._deferred, return_exceptions=True)
+        self._tasks = []
+        self._deferred.clear()
+
+    # === Producer / consumers ===
+
+    async def enqueue(self, body: bytes, partition_key: str, payload: Any = None) -> None:
+        """Persist an event and queue it for processing. Raises IngestQueueFull."""
+        received_at = time.time()
+        name = f"{self._pid}-{time.time_ns():020d}-{next(self._sequence):06d}.evt"
+        path = os.path.join(self.spool_dir, name)
+        await asyncio.to_thread(self._write_spool, path, body, partition_key, received_at)
+
+        item = IngestItem(path=path, body=body, partition_key=partition_key,
+                          received_at=received_at, payload=payload)
+        try:
+            await asyncio.wait_for(self._shard(partition_key).put(item), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            await asyncio.to_thread(self._remove, path)
+            metrics.incr("webhook_ingest.rejected")
+            raise IngestQueueFull("Webhook queue is full, retry later")
+
+        metrics.incr("webhook_ingest.accepted")
+        metrics.set_gauge("webhook_ingest.depth", self.depth)
+
+    async def _consume(self, queue: asyncio.Queue) -> None:
+        while True:
+            item = await queue.get()
+            try:
+                await self._process(item)
+            finally:
+                queue.task_done()
+                metrics.set_gauge("webhook_ingest.depth", self.depth)
+
+    async def _process(self, item: IngestItem) -> None:
+        metrics.observe("webhook_ingest.lag", time.time() - item.received_at)
+
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                await self.handler(item.body, item.payload)
+            except RetryLater as e:
+                metrics.incr("webhook_ingest.deferred")
+                logger.info(f"Webhook deferred for {e.delay:.0f}s: {str(e)}")
+                task = asyncio.create_task(self._requeue_later(item, e.delay))
+                self._deferred.add(task)
+                task.add_done_callback(self._deferred.discard)
+                return
+            except Exception as e:
+                logger.error(f"Webhook processing failed (attempt {attempt}/{self.max_attempts}): {str(e)}")
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                    continue
+                metrics.incr("webhook_ingest.failed")
+                await asyncio.to_thread(self._move_to_failed, item.path)
+                return
+            else:
+                metrics.observe("webhook_ingest.processing", time.perf_counter() - started)
+                metrics.incr("webhook_ingest.processed")
+                await asyncio.to_thread(self._remove, item.path)
+                return
+
+    async def _requeue_later(self, item: IngestItem, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._shard(item.partition_key).put(item)
+        metrics.set_gauge("webhook_ingest.depth", self.depth)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _move_to_failed(self, path: str) -> None:
+        try:
+            os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1 @@
+"""Benchmarks for GoPay hot paths. Run each module with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,96 @@
+"""
+Concurrent counter updates: single admin_stats row vs sharded counters.
+
+Each simulated payment opens a transaction, bumps the platform totals the
+way a completed payment does, holds the transaction open for ``--hold-ms``
+(the rest of the payment's work before COMMIT) and rolls back, so the
+database is left unchanged. With one row every writer waits for the
+previous one's lock; with admin_stats_shards concurrent writers land on
+different rows.
+
+- single:  UPDATE admin_stats ... WHERE id = 'revenue' (the previous trigger)
+- sharded: SELECT update_admin_stats(...) (admin_stats_shards_migration.sql)
+
+Needs a database with schema.sql, intasend_migration.sql,
+stats_rollup_migration.sql and admin_stats_shards_migration.sql applied and
+DATABASE_URL set.
+
+Usage:
+    python -m benchmarks.bench_admin_stats --seconds 5 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SINGLE_ROW_SQL = """
+    UPDATE admin_stats
+    SET
+        total_transactions = total_transactions + 1,
+        total_revenue = total_revenue + $1,
+        total_platform_fees = total_platform_fees + $2,
+        updated_at = NOW()
+    WHERE id = 'revenue'
+"""
+
+SHARDED_SQL = "SELECT update_admin_stats(1, $1, $2)"
+
+
+async def run_mode(pool: asyncpg.Pool, query: str, concurrency: int, seconds: float, hold: float) -> float:
+    """Return committed-equivalent updates per second."""
+    deadline = time.perf_counter() + seconds
+    done = 0
+
+    async def writer() -> None:
+        nonlocal done
+        async with pool.acquire() as conn:
+            while time.perf_counter() < deadline:
+                tx = conn.transaction()
+                await tx.start()
+                try:
+                    await conn.execute(query, 100, 0.5)
+                    if hold:
+                        await conn.execute("SELECT pg_sleep($1)", hold)
+                finally:
+                    await tx.rollback()
+                done += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(concurrency)))
+    return done / (time.perf_counter() - started)
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        raise SystemExit("DATABASE_URL must be set")
+
+    pool = await asyncpg.create_pool(database_url, min_size=1, max_size=max(args.concurrency))
+    try:
+        shards = await pool.fetchval("SELECT admin_stats_shard_count()")
+        print(f"hold {args.hold_ms}ms per payment, {shards} shards")
+        print(f"{'writers':>8} {'single row/s':>14} {'sharded/s':>12} {'speedup':>8}")
+        for concurrency in args.concurrency:
+            single = await run_mode(pool, SINGLE_ROW_SQL, concurrency, args.seconds, args.hold_ms / 1000)
+            sharded = await run_mode(pool, SHARDED_SQL, concurrency, args.seconds, args.hold_ms / 1000)
+            print(f"{concurrency:>8} {single:>14.0f} {sharded:>12.0f} {sharded / single:>7.1f}x")
+    finally:
+        await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--hold-ms", type=float, default=2.0, help="time the payment transaction stays open")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
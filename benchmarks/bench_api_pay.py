@@ -0,0 +1,101 @@
+"""
+Benchmark /api/pay concurrency against a local mock IntaSend server.
+
+Compares the legacy blocking ``requests`` client (one slow IntaSend call
+stalls the event loop) with the pooled ``httpx.AsyncClient``.
+
+Usage:
+    python -m benchmarks.bench_api_pay --requests 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+import requests
+
+# The app module builds its managers at import time; give it harmless settings.
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench.bench.bench")
+
+from app import main_intasend  # noqa: E402
+from app.intasend import IntaSendAPI  # noqa: E402
+
+from .fakes import InMemorySupabaseManager  # noqa: E402
+from .mock_intasend import MockIntaSendServer  # noqa: E402
+
+
+class BlockingIntaSendAPI(IntaSendAPI):
+    """The pre-pooling client: a fresh blocking request per call, no timeout."""
+
+    async def _make_request(self, method, endpoint, data=None, timeout=None):
+        url = f"{self.base_url}/{endpoint}"
+        if method.upper() == "GET":
+            response = requests.get(url, headers=self._headers, params=data)
+        else:
+            response = requests.post(url, headers=self._headers, json=data)
+        response.raise_for_status()
+        return response.json()
+
+
+async def run_load(api: IntaSendAPI, total: int, concurrency: int) -> dict:
+    """Fire ``total`` /api/pay requests with at most ``concurrency`` in flight."""
+    fake_db = InMemorySupabaseManager()
+    driver_id = fake_db.add_driver()
+    main_intasend.supabase_manager = fake_db
+    main_intasend.intasend_api = api
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main_intasend.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_request(i: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/pay", json={
+                    "driver_id": driver_id,
+                    "passenger_phone": f"2547220{i:05d}",
+                    "amount": 100
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    await api.aclose()
+    latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "throughput": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock IntaSend latency in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = MockIntaSendServer(port=args.port, latency=args.latency).start()
+    os.environ["INTASEND_BASE_URL"] = server.base_url
+    try:
+        print(f"📊 /api/pay x{args.requests}, concurrency {args.concurrency}, IntaSend latency {args.latency * 1000:.0f}ms")
+        for label, api in (("blocking requests", BlockingIntaSendAPI()), ("pooled httpx", IntaSendAPI())):
+            result = asyncio.run(run_load(api, args.requests, args.concurrency))
+            print(f"  {label:<18} {result['elapsed']:7.2f}s  {result['throughput']:8.1f} req/s  "
+                  f"p50 {result['p50'] * 1000:7.1f}ms  p99 {result['p99'] * 1000:7.1f}ms")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
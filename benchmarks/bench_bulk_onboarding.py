@@ -0,0 +1,103 @@
+"""
+Fleet onboarding throughput: one-by-one registration vs the bulk onboarder.
+
+- serial: POST /api/register_driver logic per driver (insert, save the
+  qr_code_url), one driver after another.
+- bulk:   BulkDriverOnboarder (chunked insert, one QR URL write-back per
+  chunk). With ``--mirror`` it also renders every QR code in a process pool
+  and uploads it to (simulated) Storage, as QR_STORAGE_MIRROR=true does.
+
+Uses the in-memory data layer with ``--latency`` seconds per round trip:
+QR rendering is real CPU work, database/storage calls are simulated.
+
+Usage:
+    python -m benchmarks.bench_bulk_onboarding --drivers 1000 --latency 0.02 [--mirror]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+# The app module builds its managers at import time; give it harmless settings.
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench.bench.bench")
+
+from app import main_intasend  # noqa: E402
+from app.models import DriverRegistration  # noqa: E402
+from app.onboarding import BulkDriverOnboarder  # noqa: E402
+
+from .fakes import InMemorySupabaseManager  # noqa: E402
+
+
+def fleet(count: int) -> list:
+    return [
+        {
+            "name": f"Bench Driver {i}",
+            "phone": f"2547{i:08d}",
+            "email": f"driver{i}@example.com",
+            "vehicle_type": "boda",
+            "vehicle_number": f"KMEA {i % 1000:03d}A"
+        }
+        for i in range(count)
+    ]
+
+
+async def run_serial(rows: list, latency: float) -> tuple:
+    fake_db = InMemorySupabaseManager(latency)
+    main_intasend.supabase_manager = fake_db
+    started = time.perf_counter()
+    for row in rows:
+        await main_intasend.register_driver(DriverRegistration(**row))
+    return time.perf_counter() - started, fake_db.calls
+
+
+async def run_bulk(rows: list, latency: float, args: argparse.Namespace) -> tuple:
+    fake_db = InMemorySupabaseManager(latency)
+    onboarder = BulkDriverOnboarder(
+        fake_db,
+        chunk_size=args.chunk_size,
+        qr_processes=args.processes,
+        upload_concurrency=args.upload_concurrency,
+        mirror_to_storage=args.mirror
+    )
+    started = time.perf_counter()
+    result = await onboarder.register(rows)
+    elapsed = time.perf_counter() - started
+    if result.created != len(rows):
+        raise SystemExit(f"bulk run created {result.created} of {len(rows)} drivers")
+    return elapsed, fake_db.calls
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    rows = fleet(args.drivers)
+    print(f"{args.drivers} drivers, {args.latency * 1000:.0f}ms per round trip")
+    print(f"{'mode':>8} {'seconds':>9} {'drivers/min':>12} {'round trips':>12}")
+
+    serial_rows = rows[:args.serial_drivers] if args.serial_drivers else rows
+    serial, serial_calls = await run_serial(serial_rows, args.latency)
+    serial_rate = len(serial_rows) / serial * 60
+    print(f"{'serial':>8} {serial:>9.2f} {serial_rate:>12.0f} {serial_calls:>12}"
+          + (f"  ({len(serial_rows)} drivers)" if args.serial_drivers else ""))
+
+    bulk, bulk_calls = await run_bulk(rows, args.latency, args)
+    bulk_rate = len(rows) / bulk * 60
+    print(f"{'bulk':>8} {bulk:>9.2f} {bulk_rate:>12.0f} {bulk_calls:>12}")
+    print(f"speedup {bulk_rate / serial_rate:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=1000)
+    parser.add_argument("--serial-drivers", type=int, default=0,
+                        help="time the serial path on only this many drivers (it is slow)")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per simulated round trip")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--upload-concurrency", type=int, default=16)
+    parser.add_argument("--mirror", action="store_true", help="render and upload QR images in the bulk run")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
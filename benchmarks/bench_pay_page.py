@@ -0,0 +1,74 @@
+"""
+Benchmark the /pay page: rendering every request vs the rendered page cache.
+
+- cold:   the page cache is cleared before each request (driver lookup,
+          fee calculation and Jinja render every time)
+- cached: repeat scans served from the page cache
+- bytes:  response size per Content-Encoding (identity, gzip, br)
+
+Usage:
+    python -m benchmarks.bench_pay_page --requests 500 --latency 0.005
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+# The app module builds its managers at import time; give it harmless settings.
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench.bench.bench")
+
+from app import main_intasend  # noqa: E402
+
+from .fakes import InMemorySupabaseManager  # noqa: E402
+
+
+async def run_load(client: httpx.AsyncClient, path: str, total: int, cold: bool) -> float:
+    """Requests per second for ``total`` sequential GETs of ``path``."""
+    started = time.perf_counter()
+    for _ in range(total):
+        if cold:
+            main_intasend.payment_page_cache.clear()
+        response = await client.get(path, headers={"Accept-Encoding": "identity"})
+        response.raise_for_status()
+    return total / (time.perf_counter() - started)
+
+
+async def main_async(args) -> None:
+    fake_db = InMemorySupabaseManager(latency=args.latency)
+    driver_id = fake_db.add_driver()
+    main_intasend.supabase_manager = fake_db
+
+    transport = httpx.ASGITransport(app=main_intasend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode in ("backend", "inline"):
+            path = f"/pay?driver_id={driver_id}&mode={mode}"
+            cold = await run_load(client, path, args.requests, cold=True)
+            cached = await run_load(client, path, args.requests, cold=False)
+            print(f"{mode:>8}: cold {cold:8.0f} req/s   cached {cached:8.0f} req/s   ({cached / cold:.1f}x)")
+
+            sizes = []
+            for encoding in ("identity", "gzip", "br"):
+                response = await client.get(path, headers={"Accept-Encoding": encoding})
+                served = response.headers.get("content-encoding", "identity")
+                if served == encoding:
+                    sizes.append(f"{encoding} {len(response.content)}")
+            print(f"{'':>8}  bytes: {', '.join(sizes)}")
+
+            etag = response.headers["etag"]
+            response = await client.get(path, headers={"If-None-Match": etag, "Accept-Encoding": served})
+            print(f"{'':>8}  revalidation with If-None-Match: {response.status_code}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated Supabase round trip (seconds)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
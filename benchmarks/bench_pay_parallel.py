@@ -0,0 +1,135 @@
+"""
+Benchmark /api/pay latency: serial vs concurrent insert + STK push.
+
+The serial flow (previous behaviour) waits for the database to return the
+transaction id before sending the STK push. The current flow generates a
+UUIDv7 in the app and runs the insert and the STK push concurrently.
+Both run against a local mock IntaSend server and the in-memory data layer
+with a simulated round-trip latency.
+
+Usage:
+    python -m benchmarks.bench_pay_parallel --requests 500 --latency 0.2 --db-latency 0.03
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+# The app module builds its managers at import time; give it harmless settings.
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench.bench.bench")
+
+from app import main_intasend  # noqa: E402
+from app.intasend import IntaSendAPI  # noqa: E402
+from app.models import (  # noqa: E402
+    PaymentInitiateResponse, PaymentRequest, Transaction, TransactionStatus
+)
+
+from .fakes import InMemorySupabaseManager  # noqa: E402
+from .mock_intasend import MockIntaSendServer  # noqa: E402
+
+
+async def serial_create_payment(payment: PaymentRequest) -> PaymentInitiateResponse:
+    """The previous flow: insert, then STK push, then store the collection id."""
+    db = main_intasend.supabase_manager
+    api = main_intasend.intasend_api
+
+    driver = await db.get_driver(payment.driver_id)
+    if not driver:
+        raise Exception("Driver not found")
+    fee_breakdown = api.calculate_fees(payment.amount)
+
+    transaction_id = await db.create_transaction_with_intasend(Transaction(
+        id="",
+        driver_id=payment.driver_id,
+        passenger_phone=payment.passenger_phone,
+        amount_paid=payment.amount,
+        platform_fee=fee_breakdown['platform_fee'],
+        driver_amount=fee_breakdown['driver_amount'],
+        status=TransactionStatus.PENDING
+    ))
+    collection_response = await api.initiate_collection(
+        phone_number=payment.passenger_phone,
+        amount=payment.amount,
+        reference=transaction_id
+    )
+    await db.update_transaction_collection(
+        transaction_id=transaction_id,
+        collection_id=collection_response['id'],
+        collection_status='pending',
+        collection_response=collection_response
+    )
+    return PaymentInitiateResponse(
+        status="success",
+        transaction_id=transaction_id,
+        collection_id=collection_response['id'],
+        message="ok",
+        amount=payment.amount,
+        platform_fee=fee_breakdown['platform_fee'],
+        driver_amount=fee_breakdown['driver_amount']
+    )
+
+
+async def run_load(total: int, concurrency: int, db_latency: float) -> dict:
+    """Fire ``total`` /api/pay requests with at most ``concurrency`` in flight."""
+    fake_db = InMemorySupabaseManager(latency=db_latency)
+    driver_id = fake_db.add_driver()
+    api = IntaSendAPI()
+    main_intasend.supabase_manager = fake_db
+    main_intasend.intasend_api = api
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main_intasend.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_request(i: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/pay", json={
+                    "driver_id": driver_id,
+                    "passenger_phone": f"2547220{i:05d}",
+                    "amount": 100
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one_request(i) for i in range(total)))
+
+    await api.aclose()
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[max(int(len(latencies) * 0.99) - 1, 0)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock IntaSend latency in seconds")
+    parser.add_argument("--db-latency", type=float, default=0.03, help="simulated database round trip in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = MockIntaSendServer(port=args.port, latency=args.latency).start()
+    os.environ["INTASEND_BASE_URL"] = server.base_url
+    current = main_intasend.create_payment
+    try:
+        print(f"📊 /api/pay x{args.requests}, concurrency {args.concurrency}, "
+              f"IntaSend {args.latency * 1000:.0f}ms, DB {args.db_latency * 1000:.0f}ms")
+        for label, flow in (("serial insert -> STK", serial_create_payment), ("concurrent (UUIDv7)", current)):
+            main_intasend.create_payment = flow
+            result = asyncio.run(run_load(args.requests, args.concurrency, args.db_latency))
+            print(f"  {label:<22} p50 {result['p50'] * 1000:7.1f}ms  p99 {result['p99'] * 1000:7.1f}ms")
+    finally:
+        main_intasend.create_payment = current
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Drain 1,000 queued payouts through the payout worker against a local
+IntaSend stand-in.
+
+Needs a throwaway local database with schema.sql, intasend_migration.sql,
+collection_rpc_migration.sql and payout_queue_migration.sql applied, the
+data backend configured as for the app (DATA_BACKEND, SUPABASE_URL /
+DATABASE_URL) and an existing driver id.
+
+Usage:
+    python -m benchmarks.bench_payout_queue --driver-id <uuid> --jobs 1000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.data_backend import create_data_manager  # noqa: E402
+from app.intasend import IntaSendAPI  # noqa: E402
+from app.metrics import metrics  # noqa: E402
+from app.models import Payout, PayoutStatus, Transaction, TransactionStatus  # noqa: E402
+from app.payout_worker import PayoutWorker  # noqa: E402
+
+from .mock_intasend import MockIntaSendServer  # noqa: E402
+
+
+async def enqueue(manager, driver_id: str, jobs: int) -> None:
+    """Create transactions with pending payouts; the trigger enqueues the jobs."""
+    semaphore = asyncio.Semaphore(50)
+
+    async def one() -> None:
+        async with semaphore:
+            transaction_id = await manager.create_transaction_with_intasend(Transaction(
+                driver_id=driver_id,
+                passenger_phone="254722000000",
+                amount_paid=100,
+                platform_fee=0.5,
+                driver_amount=99.5,
+                status=TransactionStatus.PAYOUT_PENDING
+            ))
+            await manager.create_payout(Payout(
+                transaction_id=transaction_id,
+                driver_id=driver_id,
+                amount=99.5,
+                status=PayoutStatus.PENDING
+            ))
+
+    await asyncio.gather(*(one() for _ in range(jobs)))
+
+
+async def run(args: argparse.Namespace) -> None:
+    manager = create_data_manager()
+    intasend_api = IntaSendAPI()
+    await manager.startup()
+
+    print(f"📥 Enqueueing {args.jobs} payouts...")
+    await enqueue(manager, args.driver_id, args.jobs)
+
+    worker = PayoutWorker(manager, intasend_api, concurrency=args.concurrency, poll_interval=0.05)
+    started = time.perf_counter()
+    worker_task = asyncio.create_task(worker.run())
+
+    while metrics.snapshot()["counters"].get("payout_worker.completed", 0) < args.jobs:
+        if worker_task.done():
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    worker.stop()
+    await worker_task
+    await intasend_api.aclose()
+    await manager.aclose()
+
+    counters = metrics.snapshot()["counters"]
+    print(f"✅ {counters.get('payout_worker.completed', 0)} payouts sent in {elapsed:.2f}s "
+          f"({counters.get('payout_worker.completed', 0) / elapsed:.1f}/s), "
+          f"retried {counters.get('payout_worker.retried', 0)}, "
+          f"dead-lettered {counters.get('payout_worker.dead_lettered', 0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--driver-id", required=True)
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock IntaSend latency in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = MockIntaSendServer(port=args.port, latency=args.latency).start()
+    os.environ["INTASEND_BASE_URL"] = server.base_url
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Compare select('*') with the slim column projections on list/status paths.
+
+Builds realistic transaction rows (including IntaSend collection and payout
+responses in the JSONB columns) and reports, per request:
+
+- bytes of the database response body (PostgREST returns JSON)
+- time to validate the rows into models
+- time to serialize the API response
+
+for a page of transactions (full ``Transaction`` vs ``TransactionListItem``)
+and for the status endpoint (full row vs the status projection).
+
+Usage:
+    python -m benchmarks.bench_projection --page-size 100 --iterations 200
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from app.models import Transaction, TransactionListItem, TransactionStatusResponse
+from app.supabase_util import TRANSACTION_STATUS_COLUMNS
+
+
+class FullTransactionPage(BaseModel):
+    """The previous list response: complete Transaction rows."""
+    items: List[Transaction]
+    next_cursor: Optional[str] = None
+
+
+class SlimTransactionPage(BaseModel):
+    items: List[TransactionListItem]
+    next_cursor: Optional[str] = None
+
+
+def collection_response(transaction_id: str, phone: str) -> dict:
+    return {
+        "invoice": {
+            "invoice_id": "QXR8PLM",
+            "state": "COMPLETE",
+            "provider": "M-PESA",
+            "charges": "1.50",
+            "net_amount": "98.50",
+            "currency": "KES",
+            "value": "100.00",
+            "account": phone,
+            "api_ref": transaction_id,
+            "mpesa_reference": "SBK7XYZ123",
+            "host": "https://gopay.example.com",
+            "failed_reason": None,
+            "failed_code": None,
+            "created_at": "2024-03-01T10:15:00.000000+03:00",
+            "updated_at": "2024-03-01T10:15:12.000000+03:00",
+        },
+        "customer": {
+            "customer_id": "KR9L2QP",
+            "phone_number": phone,
+            "email": None,
+            "first_name": "Passenger",
+            "last_name": "Customer",
+            "country": "KE",
+            "zipcode": None,
+            "provider": "M-PESA",
+            "created_at": "2024-03-01T10:14:58.000000+03:00",
+            "updated_at": "2024-03-01T10:14:58.000000+03:00",
+        },
+        "payment_link": None,
+        "customer_comment": None,
+        "refundable": False,
+        "created_at": "2024-03-01T10:14:58.000000+03:00",
+        "updated_at": "2024-03-01T10:15:12.000000+03:00",
+    }
+
+
+def payout_response(transaction_id: str, phone: str) -> dict:
+    return {
+        "file_id": "YV0R4PB",
+        "tracking_id": str(uuid.uuid4()),
+        "batch_reference": None,
+        "status": "Completed",
+        "status_code": "BC100",
+        "nonce": "a1b2c3",
+        "wallet": {"wallet_id": "XZY0QW", "label": "default", "currency": "KES", "can_disburse": True},
+        "transactions": [{
+            "transaction_id": "LKJ87H",
+            "status": "Successful",
+            "request_reference_id": transaction_id,
+            "name": "Driver Name",
+            "account": phone,
+            "amount": "98.50",
+            "narrative": "Payment for ride",
+            "provider": "MPESA-B2C",
+        }],
+        "charge_estimate": "10.00",
+        "total_amount": "98.50",
+        "created_at": "2024-03-01T10:15:20.000000+03:00",
+    }
+
+
+def make_rows(count: int) -> List[dict]:
+    started = datetime(2024, 3, 1, 10, 0, tzinfo=timezone.utc)
+    driver_id = str(uuid.uuid4())
+    rows = []
+    for i in range(count):
+        transaction_id = str(uuid.uuid4())
+        phone = f"2547220{i:05d}"
+        created_at = (started + timedelta(minutes=i)).isoformat()
+        rows.append({
+            "id": transaction_id,
+            "driver_id": driver_id,
+            "passenger_phone": phone,
+            "amount_paid": 100.0,
+            "platform_fee": 1.5,
+            "driver_amount": 98.5,
+            "status": "payout_completed",
+            "mpesa_receipt": None,
+            "checkout_request_id": None,
+            "intasend_collection_id": "QXR8PLM",
+            "intasend_tracking_id": str(uuid.uuid4()),
+            "collection_status": "completed",
+            "payout_status": "completed",
+            "collection_response": collection_response(transaction_id, phone),
+            "payout_response": payout_response(transaction_id, phone),
+            "fee_percentage": 1.5,
+            "fee_fixed": 0.0,
+            "collection_completed_at": created_at,
+            "payout_completed_at": created_at,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return rows
+
+
+def project(rows: List[dict], columns) -> List[dict]:
+    return [{column: row[column] for column in columns} for row in rows]
+
+
+def timed(func, iterations: int) -> float:
+    """Return microseconds per call."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def report(label: str, full_body: bytes, slim_body: bytes, full_parse, slim_parse,
+           full_dump, slim_dump, iterations: int) -> None:
+    print(label)
+    print(f"  db response bytes : {len(full_body):>9,}  ->  {len(slim_body):>9,}  "
+          f"({(1 - len(slim_body) / len(full_body)) * 100:.0f}% less)")
+    for name, before, after in (
+        ("validate rows", timed(full_parse, iterations), timed(slim_parse, iterations)),
+        ("serialize response", timed(full_dump, iterations), timed(slim_dump, iterations)),
+    ):
+        print(f"  {name:<18}: {before:9.1f}us ->  {after:9.1f}us  ({(1 - after / before) * 100:.0f}% less)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.page_size)
+
+    # Transaction page
+    slim_rows = project(rows, TransactionListItem.model_fields)
+    full_body = json.dumps(rows).encode()
+    slim_body = json.dumps(slim_rows).encode()
+    full_page = FullTransactionPage(items=[Transaction(**row) for row in rows], next_cursor="c")
+    slim_page = SlimTransactionPage(items=[TransactionListItem(**row) for row in slim_rows], next_cursor="c")
+    report(
+        f"Transaction list ({args.page_size} rows)",
+        full_body, slim_body,
+        lambda: [Transaction(**row) for row in json.loads(full_body)],
+        lambda: [TransactionListItem(**row) for row in json.loads(slim_body)],
+        full_page.model_dump_json,
+        slim_page.model_dump_json,
+        args.iterations
+    )
+
+    # Status endpoint: one row
+    row = rows[0]
+    status_row = project([row], TRANSACTION_STATUS_COLUMNS.split(','))[0]
+    full_body = json.dumps([row]).encode()
+    slim_body = json.dumps([status_row]).encode()
+
+    def from_full():
+        tx = Transaction(**json.loads(full_body)[0])
+        return TransactionStatusResponse(
+            transaction_id=tx.id, status=tx.status, collection_status=tx.collection_status,
+            payout_status=tx.payout_status, amount_paid=tx.amount_paid, platform_fee=tx.platform_fee,
+            driver_amount=tx.driver_amount, created_at=tx.created_at,
+            collection_completed_at=tx.collection_completed_at, payout_completed_at=tx.payout_completed_at
+        )
+
+    def from_slim():
+        data = json.loads(slim_body)[0]
+        return TransactionStatusResponse(transaction_id=data.pop('id'), **data)
+
+    status = from_slim()
+    report(
+        "Transaction status (1 row)",
+        full_body, slim_body,
+        from_full, from_slim,
+        status.model_dump_json, status.model_dump_json,
+        args.iterations * 50
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+QR rendering: throughput and size per output format, cache hits, and how
+much rendering stalls the event loop inline vs on the render threads.
+
+- cold:   unique payment URLs, every call renders
+- cached: the same URLs again, served from the content-addressed cache
+- bytes:  average image size per format (png, png1, svg)
+- loop:   worst event-loop stall while rendering ``--loop-renders`` codes,
+          calling generate_payment_qr inline vs generate_payment_qr_async
+
+Usage:
+    python -m benchmarks.bench_qr_render --codes 300
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from app import qr_utils
+
+
+def bench_format(fmt: str, driver_ids: list) -> tuple:
+    qr_utils.qr_cache.clear()
+    started = time.perf_counter()
+    sizes = [len(qr_utils.generate_payment_qr(driver_id, "254722000000", fmt)) for driver_id in driver_ids]
+    cold = len(driver_ids) / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for driver_id in driver_ids:
+        qr_utils.generate_payment_qr(driver_id, "254722000000", fmt)
+    cached = len(driver_ids) / (time.perf_counter() - started)
+    return cold, cached, sum(sizes) / len(sizes)
+
+
+async def worst_stall(render, count: int) -> float:
+    """Run ``count`` renders while a 1ms ticker records its longest delay."""
+    qr_utils.qr_cache.clear()
+    stall = 0.0
+    running = True
+
+    async def ticker() -> None:
+        nonlocal stall
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - before - 0.001)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await asyncio.gather(*(render(str(uuid.uuid4())) for _ in range(count)))
+    running = False
+    await tick
+    return stall
+
+
+async def inline_render(driver_id: str) -> bytes:
+    return qr_utils.generate_payment_qr(driver_id)
+
+
+async def offloaded_render(driver_id: str) -> bytes:
+    return await qr_utils.generate_payment_qr_async(driver_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codes", type=int, default=300, help="distinct QR codes per format")
+    parser.add_argument("--loop-renders", type=int, default=50)
+    args = parser.parse_args()
+
+    driver_ids = [str(uuid.uuid4()) for _ in range(args.codes)]
+    print(f"{args.codes} codes, box size {qr_utils.QR_BOX_SIZE}")
+    print(f"{'format':>7} {'cold/s':>9} {'cached/s':>10} {'avg bytes':>10}")
+    for fmt in qr_utils.QR_FORMATS:
+        cold, cached, size = bench_format(fmt, driver_ids)
+        print(f"{fmt:>7} {cold:>9.0f} {cached:>10.0f} {size:>10.0f}")
+
+    inline = asyncio.run(worst_stall(inline_render, args.loop_renders))
+    offloaded = asyncio.run(worst_stall(offloaded_render, args.loop_renders))
+    qr_utils.shutdown_render_pool()
+    print(f"worst loop stall over {args.loop_renders} renders: "
+          f"inline {inline * 1000:.1f}ms, offloaded {offloaded * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+QR codes for long /pay URLs vs /p/<short_code> URLs (and /t/<token> URLs
+carrying a signed driver token, QR_PAYLOAD=token).
+
+For each payload it reports the QR version, modules per side, PNG size and
+the physical size of one module on a printed sticker (``--print-mm``): the
+fewer modules, the larger each one is, which is what lets cheap phone
+cameras lock on quickly and from further away.
+
+If opencv-python is installed it also measures scanning: every code is
+downscaled to ``--camera-px`` pixels (a QR filling part of a low-resolution
+camera frame), blurred, and decoded with cv2.QRCodeDetector, reporting the
+decode success rate and time per scan.
+
+Usage:
+    python -m benchmarks.bench_qr_short_urls --base-url https://gopay.co.ke --camera-px 60
+"""
+import argparse
+import io
+import os
+import secrets
+import string
+import time
+import uuid
+
+from app import qr_utils
+from app.models import Driver, VehicleType
+from app.qr_tokens import QRTokenSigner
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+
+from PIL import Image, ImageFilter
+
+
+def payloads(count: int) -> dict:
+    driver_ids = [str(uuid.uuid4()) for _ in range(count)]
+    codes = [''.join(secrets.choice(string.digits + string.ascii_letters) for _ in range(7)) for _ in range(count)]
+    signer = QRTokenSigner({1: secrets.token_bytes(32)})
+    drivers = [
+        Driver(id=driver_id, name="Wanjiku Kamau", phone="254722000000", email="bench@example.com",
+               vehicle_type=VehicleType.BODA, vehicle_number="KMEA 123A")
+        for driver_id in driver_ids
+    ]
+    return {
+        "long + phone": [qr_utils.payment_url(driver_id, "254722000000") for driver_id in driver_ids],
+        "long": [qr_utils.payment_url(driver_id) for driver_id in driver_ids],
+        "short": [qr_utils.short_payment_url(code) for code in codes],
+        "token": [qr_utils.token_payment_url(signer.issue(driver)) for driver in drivers],
+    }
+
+
+def scan(png: bytes, camera_px: int, blur: float) -> tuple:
+    """Decode a degraded copy of ``png``; returns (decoded, seconds)."""
+    image = Image.open(io.BytesIO(png)).convert("L").resize((camera_px, camera_px), Image.BILINEAR)
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    # Pad with a quiet white margin, as the sticker background would
+    frame = Image.new("L", (camera_px * 2, camera_px * 2), 255)
+    frame.paste(image, (camera_px // 2, camera_px // 2))
+    pixels = np.array(frame)
+    started = time.perf_counter()
+    text, _, _ = cv2.QRCodeDetector().detectAndDecode(pixels)
+    return bool(text), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.getenv('BASE_PUBLIC_URL', 'https://gopay.co.ke'))
+    parser.add_argument("--codes", type=int, default=100)
+    parser.add_argument("--print-mm", type=float, default=30.0, help="printed QR width in millimetres")
+    parser.add_argument("--camera-px", type=int, default=60, help="pixels the QR covers in the camera frame")
+    parser.add_argument("--blur", type=float, default=0.6, help="gaussian blur radius applied before decoding")
+    args = parser.parse_args()
+    os.environ['BASE_PUBLIC_URL'] = args.base_url
+
+    print(f"{args.print_mm:.0f}mm sticker, base URL {args.base_url}")
+    header = f"{'payload':>13} {'chars':>6} {'version':>8} {'modules':>8} {'mm/module':>10} {'png1 bytes':>11}"
+    if cv2 is not None:
+        header += f" {'decoded':>8} {'ms/scan':>8}"
+    print(header)
+
+    for name, texts in payloads(args.codes).items():
+        version = max(qr_utils.qr_version(text) for text in texts)
+        modules = 17 + 4 * version
+        pngs = [qr_utils.render_qr(text, "png1") for text in texts]
+        line = (f"{name:>13} {max(len(t) for t in texts):>6} {version:>8} {modules:>8} "
+                f"{args.print_mm / (modules + 8):>10.2f} {sum(map(len, pngs)) / len(pngs):>11.0f}")
+        if cv2 is not None:
+            results = [scan(png, args.camera_px, args.blur) for png in pngs]
+            decoded = sum(ok for ok, _ in results) / len(results)
+            ms = sum(seconds for _, seconds in results) / len(results) * 1000
+            line += f" {decoded:>7.0%} {ms:>8.2f}"
+        print(line)
+
+    if cv2 is None:
+        print("install opencv-python to measure decoding (success rate and time per scan)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark SupabaseManager latency under concurrent load.
+
+Runs ``get_driver`` and ``create_transaction_with_intasend`` with N
+concurrent callers, once with the old inline blocking ``.execute()`` and
+once with the thread-offloaded executor. Also reports how long the event
+loop was stalled (max tick lag), which is what hurts other requests.
+
+Requires SUPABASE_URL / SUPABASE_ANON_KEY for a development project and an
+existing driver id. create_transaction_with_intasend inserts real rows
+into ``transactions`` - do not point this at production.
+
+Usage:
+    python -m benchmarks.bench_supabase_manager --driver-id <uuid> --concurrency 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.models import Transaction, TransactionStatus  # noqa: E402
+from app.supabase_util import SupabaseManager  # noqa: E402
+
+
+class BlockingSupabaseManager(SupabaseManager):
+    """The previous behaviour: .execute() called directly on the event loop."""
+
+    async def _execute(self, query):
+        return query.execute()
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Return the worst delay seen by a periodic timer while the load runs."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(manager: SupabaseManager, operation: str, driver_id: str, concurrency: int) -> dict:
+    async def call() -> float:
+        started = time.perf_counter()
+        if operation == "get_driver":
+            await manager.get_driver(driver_id)
+        else:
+            await manager.create_transaction_with_intasend(Transaction(
+                driver_id=driver_id,
+                passenger_phone="254722000000",
+                amount_paid=100,
+                platform_fee=0.5,
+                driver_amount=99.5,
+                status=TransactionStatus.PENDING
+            ))
+        return time.perf_counter() - started
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(call() for _ in range(concurrency))))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_lag = await lag_task
+    await manager.aclose()
+
+    return {
+        "elapsed": elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[max(int(len(latencies) * 0.99) - 1, 0)],
+        "loop_lag": worst_lag,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--driver-id", required=True)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    for operation in ("get_driver", "create_transaction_with_intasend"):
+        print(f"\n📊 {operation} x{args.concurrency} concurrent")
+        for label, manager_class in (("blocking", BlockingSupabaseManager), ("executor", SupabaseManager)):
+            result = asyncio.run(run(manager_class(), operation, args.driver_id, args.concurrency))
+            print(f"  {label:<9} total {result['elapsed']:6.2f}s  p50 {result['p50'] * 1000:7.1f}ms  "
+                  f"p99 {result['p99'] * 1000:7.1f}ms  max loop stall {result['loop_lag'] * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
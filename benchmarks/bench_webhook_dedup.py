@@ -0,0 +1,100 @@
+"""
+Replay duplicate IntaSend webhooks through the processing path.
+
+Sends one COMPLETE collection webhook followed by N identical retries to
+``process_webhook`` (the ingest consumer handler) against the in-memory
+data layer, and reports data-layer calls and time per delivery. With the
+deduplicator every retry is answered from memory, so cost stays flat no
+matter how many retries arrive. ``--cold`` starts a second deduplicator
+with an empty memory (another worker process / after a restart) to show
+the database claim path: one round trip per duplicate, no further work.
+
+Usage:
+    python -m benchmarks.bench_webhook_dedup --duplicates 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# The app module builds its managers at import time; give it harmless settings.
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench.bench.bench")
+
+from app import main_intasend  # noqa: E402
+from app.dedup import WebhookDeduplicator  # noqa: E402
+
+from .fakes import InMemorySupabaseManager  # noqa: E402
+
+
+def sample_webhook(transaction_id: str) -> bytes:
+    return json.dumps({
+        "id": "QXR8PLM",
+        "invoice_id": "QXR8PLM",
+        "state": "COMPLETE",
+        "provider": "M-PESA",
+        "value": 100.0,
+        "account": "254712345678",
+        "api_ref": transaction_id,
+    }).encode()
+
+
+async def replay(fake_db: InMemorySupabaseManager, body: bytes, duplicates: int) -> dict:
+    calls_before = fake_db.calls
+    chunk = max(duplicates // 10, 1)
+    chunk_times = []
+
+    started = time.perf_counter()
+    chunk_started = started
+    for i in range(1, duplicates + 1):
+        await main_intasend.process_webhook(body)
+        if i % chunk == 0:
+            now = time.perf_counter()
+            chunk_times.append((now - chunk_started) / chunk * 1e6)
+            chunk_started = now
+
+    return {
+        "total_s": time.perf_counter() - started,
+        "db_calls": fake_db.calls - calls_before,
+        "first_chunk_us": chunk_times[0] if chunk_times else 0.0,
+        "last_chunk_us": chunk_times[-1] if chunk_times else 0.0,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    fake_db = InMemorySupabaseManager(latency=args.latency)
+    main_intasend.supabase_manager = fake_db
+    main_intasend.webhook_dedup = WebhookDeduplicator(fake_db)
+
+    body = sample_webhook("7d0c6b8e-4a53-4b3a-9f0e-2f1a5c9d8e71")
+
+    # First delivery does the real work
+    await main_intasend.process_webhook(body)
+    print(f"first delivery: {fake_db.calls} data-layer calls, payouts created: {len(fake_db.payouts_created)}")
+
+    result = await replay(fake_db, body, args.duplicates)
+    print(f"{args.duplicates} duplicates (warm memory): {result['db_calls']} data-layer calls, "
+          f"{result['total_s']:.3f}s total, "
+          f"{result['first_chunk_us']:.1f} us/delivery first 10% vs {result['last_chunk_us']:.1f} us last 10%")
+
+    if args.cold:
+        main_intasend.webhook_dedup = WebhookDeduplicator(fake_db, maxsize=0)
+        result = await replay(fake_db, body, args.duplicates)
+        print(f"{args.duplicates} duplicates (cold memory): {result['db_calls']} data-layer calls "
+              f"({result['db_calls'] / args.duplicates:.2f} per delivery), {result['total_s']:.3f}s total")
+
+    print(f"payouts created overall: {len(fake_db.payouts_created)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duplicates", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated DB round trip (seconds)")
+    parser.add_argument("--cold", action="store_true", help="also replay with an empty in-memory cache")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
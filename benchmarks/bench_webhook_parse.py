@@ -0,0 +1,90 @@
+"""
+Microbenchmark the per-webhook CPU cost of signature check + parsing.
+
+Compares the previous pipeline (decode body to str, re-encode for the HMAC,
+json.loads, IntaSendWebhook(**data), model_dump() for each stored response)
+with the current one (HMAC over raw bytes, model_validate_json, one cached
+payload dump reused for every write).
+
+Usage:
+    python -m benchmarks.bench_webhook_parse --iterations 50000
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import time
+
+from app.models import IntaSendWebhook
+
+SECRET = b"bench-secret"
+
+SAMPLE = {
+    "id": "QXR8PLM",
+    "invoice_id": "QXR8PLM",
+    "state": "COMPLETE",
+    "provider": "M-PESA",
+    "charges": 1.5,
+    "net_amount": 98.5,
+    "currency": "KES",
+    "value": 100.0,
+    "account": "254712345678",
+    "api_ref": "7d0c6b8e-4a53-4b3a-9f0e-2f1a5c9d8e71",
+    "mpesa_reference": "SBK7XYZ123",
+    "tracking_id": None,
+    "meta": {"customer": {"phone_number": "254712345678", "email": None}},
+    "created_at": "2024-03-01T10:15:00.000000+03:00",
+    "updated_at": "2024-03-01T10:15:12.000000+03:00",
+}
+
+
+def old_pipeline(body: bytes, signature: str, writes: int) -> None:
+    body_str = body.decode('utf-8')
+    expected = hmac.new(SECRET, body_str.encode(), hashlib.sha256).hexdigest()
+    assert hmac.compare_digest(expected, signature)
+    webhook = IntaSendWebhook(**json.loads(body))
+    for _ in range(writes):
+        webhook.model_dump()
+
+
+def new_pipeline(body: bytes, signature: str, writes: int) -> None:
+    expected = hmac.new(SECRET, body, hashlib.sha256).hexdigest()
+    assert hmac.compare_digest(expected, signature)
+    webhook = IntaSendWebhook.model_validate_json(body)
+    for _ in range(writes):
+        webhook.payload
+
+
+def measure(pipeline, body: bytes, signature: str, writes: int, iterations: int) -> float:
+    """Return CPU microseconds per webhook."""
+    started = time.process_time()
+    for _ in range(iterations):
+        pipeline(body, signature, writes)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--writes", type=int, default=2,
+                        help="stored responses per webhook (payout webhooks write two)")
+    args = parser.parse_args()
+
+    body = json.dumps(SAMPLE).encode()
+    signature = hmac.new(SECRET, body, hashlib.sha256).hexdigest()
+
+    # Warm up both paths
+    measure(old_pipeline, body, signature, args.writes, 1000)
+    measure(new_pipeline, body, signature, args.writes, 1000)
+
+    old_us = measure(old_pipeline, body, signature, args.writes, args.iterations)
+    new_us = measure(new_pipeline, body, signature, args.writes, args.iterations)
+
+    print(f"body {len(body)} bytes, {args.writes} stored responses, {args.iterations} iterations")
+    print(f"  decode + json.loads + model(**data) + dumps : {old_us:8.2f} us/webhook")
+    print(f"  raw-bytes HMAC + model_validate_json + cached: {new_us:8.2f} us/webhook")
+    print(f"  saving: {old_us - new_us:.2f} us ({(1 - new_us / old_us) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+In-memory data layer used by benchmarks in place of Supabase.
+
+Each call sleeps for ``latency`` seconds (without blocking the event loop)
+to stand in for a PostgREST round trip, so results isolate the app's own
+concurrency behaviour.
+"""
+import asyncio
+import secrets
+import string
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+from app.models import CollectionCompletion, Driver, Transaction, VehicleType
+
+
+def _short_code() -> str:
+    """Random 7-character base62 code, as the short_codes migration assigns."""
+    return ''.join(secrets.choice(string.digits + string.ascii_letters) for _ in range(7))
+
+
+class InMemorySupabaseManager:
+    """Minimal stand-in implementing the SupabaseManager methods used on the /api/pay and registration paths."""
+
+    def __init__(self, latency: float = 0.005):
+        self.latency = latency
+        self.drivers: Dict[str, Driver] = {}
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self.webhook_events: Dict[str, str] = {}
+        self.payouts_created: Set[str] = set()
+        self.qr_codes: Dict[str, bytes] = {}
+        self.calls = 0
+
+    async def _round_trip(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    def add_driver(self) -> str:
+        driver_id = str(uuid.uuid4())
+        self.drivers[driver_id] = Driver(
+            id=driver_id,
+            name="Bench Driver",
+            phone="254722000000",
+            email="bench@example.com",
+            vehicle_type=VehicleType.BODA,
+            vehicle_number="KMEA 123A",
+            short_code=_short_code()
+        )
+        return driver_id
+
+    async def get_driver(self, driver_id: str) -> Optional[Driver]:
+        await self._round_trip()
+        return self.drivers.get(driver_id)
+
+    async def create_driver(self, driver: Driver) -> str:
+        await self._round_trip()
+        if any(d.phone == driver.phone for d in self.drivers.values()):
+            raise Exception(f"Phone number {driver.phone} is already registered")
+        driver_id = str(uuid.uuid4())
+        self.drivers[driver_id] = driver.model_copy(update={"id": driver_id, "short_code": _short_code()})
+        return driver_id
+
+    async def create_drivers(self, drivers: List[Driver]) -> Dict[str, str]:
+        await self._round_trip()
+        existing = {d.phone for d in self.drivers.values()}
+        if any(driver.phone in existing for driver in drivers):
+            raise Exception("duplicate key value violates unique constraint \"drivers_phone_key\"")
+        ids = {}
+        for driver in drivers:
+            driver_id = str(uuid.uuid4())
+            self.drivers[driver_id] = driver.model_copy(update={"id": driver_id, "short_code": _short_code()})
+            ids[driver.phone] = driver_id
+        return ids
+
+    async def upload_qr_code(self, driver_id: str, qr_bytes: bytes) -> str:
+        await self._round_trip()
+        self.qr_codes[driver_id] = qr_bytes
+        return f"http://127.0.0.1:54321/storage/v1/object/public/qr_codes/{driver_id}.png"
+
+    async def update_driver(self, driver_id: str, updates: Dict[str, Any]) -> bool:
+        await self._round_trip()
+        self.drivers[driver_id] = self.drivers[driver_id].model_copy(update=updates)
+        return True
+
+    async def set_driver_qr_urls(self, qr_urls: Dict[str, str]) -> int:
+        await self._round_trip()
+        for driver_id, url in qr_urls.items():
+            self.drivers[driver_id] = self.drivers[driver_id].model_copy(update={"qr_code_url": url})
+        return len(qr_urls)
+
+    async def get_driver_short_codes(self, driver_ids: Optional[List[str]] = None) -> Dict[str, str]:
+        await self._round_trip()
+        ids = self.drivers if driver_ids is None else driver_ids
+        return {driver_id: self.drivers[driver_id].short_code for driver_id in ids if driver_id in self.drivers}
+
+    async def get_driver_id_by_short_code(self, short_code: str) -> Optional[str]:
+        await self._round_trip()
+        return next((d.id for d in self.drivers.values() if d.short_code == short_code), None)
+
+    async def create_transaction_with_intasend(self, transaction: Transaction) -> str:
+        await self._round_trip()
+        transaction_id = transaction.id or str(uuid.uuid4())
+        self.transactions[transaction_id] = transaction.model_dump()
+        return transaction_id
+
+    async def update_transaction_collection(self, transaction_id: str, collection_id: str,
+                                            collection_status: str,
+                                            collection_response: Optional[Dict[str, Any]] = None) -> bool:
+        await self._round_trip()
+        self.transactions.setdefault(transaction_id, {}).update(
+            intasend_collection_id=collection_id, collection_status=collection_status
+        )
+        return True
+
+    async def complete_collection(self, transaction_id: str, collection_id: str,
+                                  collection_response: Optional[Dict[str, Any]] = None) -> Optional[CollectionCompletion]:
+        await self._round_trip()
+        transaction = self.transactions.setdefault(transaction_id, {})
+        already_completed = transaction.get('collection_status') == 'completed'
+        transaction.update(intasend_collection_id=collection_id, collection_status='completed')
+        if not already_completed:
+            self.payouts_created.add(transaction_id)
+        return CollectionCompletion(
+            transaction_id=transaction_id,
+            payout_id=transaction_id,
+            driver_id=transaction.get('driver_id', ''),
+            driver_phone="254722000000",
+            driver_name="Bench Driver",
+            driver_amount=0.0,
+            already_completed=already_completed
+        )
+
+    async def claim_webhook_event(self, event_key: str, lease_seconds: int = 300) -> str:
+        await self._round_trip()
+        if event_key in self.webhook_events:
+            return self.webhook_events[event_key]
+        self.webhook_events[event_key] = 'processing'
+        return 'claimed'
+
+    async def complete_webhook_event(self, event_key: str) -> bool:
+        await self._round_trip()
+        self.webhook_events[event_key] = 'done'
+        return True
+
+    async def release_webhook_event(self, event_key: str) -> bool:
+        await self._round_trip()
+        return self.webhook_events.pop(event_key, None) is not None
+
+    async def aclose(self) -> None:
+        return None
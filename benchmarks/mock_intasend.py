@@ -0,0 +1,91 @@
+"""
+Local IntaSend stand-in for benchmarks.
+
+Serves the endpoints used by IntaSendAPI with a configurable artificial
+latency so that benchmarks measure our concurrency, not the sandbox.
+"""
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class MockIntaSendServer:
+    """Run a mock IntaSend API on localhost in a background thread."""
+
+    def __init__(self, port: int = 8765, latency: float = 0.2):
+        self.port = port
+        self.latency = latency
+        self.requests_served = 0
+        self._counter = itertools.count(1)
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/v1"
+
+    async def _stk_push(self, request: Request) -> JSONResponse:
+        payload = await request.json()
+        await asyncio.sleep(self.latency)
+        self.requests_served += 1
+        return JSONResponse({
+            "id": f"COL-{next(self._counter)}",
+            "invoice": {"invoice_id": uuid.uuid4().hex[:8], "state": "PENDING", "api_ref": payload.get("api_ref")}
+        })
+
+    async def _payout(self, request: Request) -> JSONResponse:
+        await request.json()
+        await asyncio.sleep(self.latency)
+        self.requests_served += 1
+        return JSONResponse({"tracking_id": f"TRK-{next(self._counter)}", "status": "Processing"})
+
+    async def _status(self, request: Request) -> JSONResponse:
+        await asyncio.sleep(self.latency)
+        self.requests_served += 1
+        return JSONResponse({"invoice": {"state": "COMPLETE"}})
+
+    async def _wallets(self, request: Request) -> JSONResponse:
+        await asyncio.sleep(self.latency)
+        self.requests_served += 1
+        return JSONResponse({"results": [{"currency": "KES", "available_balance": 1000000}]})
+
+    def _app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/api/v1/payment/mpesa-stk-push/", self._stk_push, methods=["POST"]),
+            Route("/api/v1/payment/status/", self._status, methods=["GET"]),
+            Route("/api/v1/payouts/approve/", self._payout, methods=["POST"]),
+            Route("/api/v1/payouts/status/", self._status, methods=["GET"]),
+            Route("/api/v1/wallets/", self._wallets, methods=["GET"]),
+        ])
+
+    def start(self) -> "MockIntaSendServer":
+        config = uvicorn.Config(self._app(), host="127.0.0.1", port=self.port, log_level="warning", backlog=4096)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    server = MockIntaSendServer().start()
+    print(f"Mock IntaSend listening on {server.base_url} (latency {server.latency}s). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Bulk Driver Registration
+Registers a fleet of drivers from a CSV or JSON file directly against the
+configured data backend (same settings as the app: DATA_BACKEND,
+SUPABASE_URL / DATABASE_URL, BASE_PUBLIC_URL for the QR codes).
+
+CSV needs a header row: name,phone,email,vehicle_type,vehicle_number
+JSON is a list of objects with the same fields.
+
+Usage:
+    python bulk_register_drivers.py fleet.csv
+    python bulk_register_drivers.py fleet.json --output results.csv --upload-concurrency 32
+"""
+import os
+import csv
+import sys
+import asyncio
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.data_backend import create_data_manager  # noqa: E402
+from app.onboarding import create_bulk_onboarder, parse_driver_rows, BulkInputError  # noqa: E402
+
+
+async def bulk_register(args: argparse.Namespace) -> bool:
+    with open(args.file, 'rb') as f:
+        body = f.read()
+    content_type = "text/csv" if args.file.lower().endswith(".csv") else "application/json"
+    try:
+        rows = parse_driver_rows(body, content_type)
+    except BulkInputError as e:
+        print(f"❌ {str(e)}")
+        return False
+    print(f"📥 Registering {len(rows)} drivers from {args.file}...")
+
+    manager = create_data_manager()
+    await manager.startup()
+    try:
+        onboarder = create_bulk_onboarder(manager)
+        if args.chunk_size:
+            onboarder.chunk_size = args.chunk_size
+        if args.processes:
+            onboarder.qr_processes = args.processes
+        if args.upload_concurrency:
+            onboarder.upload_concurrency = args.upload_concurrency
+        if args.mirror_to_storage:
+            onboarder.mirror_to_storage = True
+        result = await onboarder.register(rows)
+    finally:
+        await manager.aclose()
+
+    print(f"✅ Created: {result.created}")
+    print(f"⚠️  Created without QR code URL: {result.qr_failed}")
+    print(f"❌ Failed: {result.failed}")
+    for item in result.results:
+        if item.error:
+            print(f"   row {item.row}: {item.error}")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=["row", "status", "driver_id", "qr_code_url", "error"])
+            writer.writeheader()
+            for item in result.results:
+                writer.writerow(item.model_dump())
+        print(f"📄 Results written to {args.output}")
+
+    return result.failed == 0 and result.qr_failed == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Register drivers in bulk from a CSV or JSON file")
+    parser.add_argument("file", help="CSV or JSON file with the drivers")
+    parser.add_argument("--output", help="write per-row results to this CSV file")
+    parser.add_argument("--chunk-size", type=int, help="drivers per insert (default BULK_ONBOARDING_CHUNK_SIZE)")
+    parser.add_argument("--mirror-to-storage", action="store_true",
+                        help="also upload the QR images to Supabase Storage (default QR_STORAGE_MIRROR)")
+    parser.add_argument("--processes", type=int, help="QR render processes for the mirror (default: CPU count)")
+    parser.add_argument("--upload-concurrency", type=int, help="QR uploads in flight (default BULK_UPLOAD_CONCURRENCY)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"❌ File not found: {args.file}")
+        sys.exit(1)
+
+    ok = asyncio.run(bulk_register(args))
+    sys.exit(0 if ok else 1)
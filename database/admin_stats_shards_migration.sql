@@ -0,0 +1,208 @@
+-- GoPay Sharded Admin Stats
+-- admin_stats kept its running totals in one row (id = 'revenue'), so every
+-- completed payment queued on the same row lock until the paying
+-- transaction committed. The totals now live in admin_stats_shard_count()
+-- rows of admin_stats_shards. Each writer updates the shard picked by
+-- hashing its key, and get_admin_stats() sums the shards. admin_stats keeps
+-- active_drivers, which is refreshed in bulk rather than per payment.
+-- The hourly/daily rollups get the same treatment: each bucket is split by
+-- shard and summed on read.
+-- Run after stats_rollup_migration.sql.
+
+CREATE OR REPLACE FUNCTION admin_stats_shard_count()
+RETURNS INTEGER AS $$
+    SELECT 16;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Shard for a key (transaction id, backend pid, ...)
+CREATE OR REPLACE FUNCTION admin_stats_shard(p_key TEXT)
+RETURNS SMALLINT AS $$
+    SELECT ((hashtext(p_key) & 2147483647) % admin_stats_shard_count())::SMALLINT;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Low fillfactor leaves room on each page for HOT updates of the counters
+CREATE TABLE IF NOT EXISTS admin_stats_shards (
+    shard SMALLINT PRIMARY KEY,
+    total_transactions BIGINT NOT NULL DEFAULT 0,
+    total_revenue DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    total_platform_fees DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    total_payouts DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    pending_payouts DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    failed_payouts INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+) WITH (fillfactor = 50);
+
+-- Carry the existing totals over into shard 0, then create the empty shards
+INSERT INTO admin_stats_shards (
+    shard, total_transactions, total_revenue, total_platform_fees,
+    total_payouts, pending_payouts, failed_payouts
+)
+SELECT
+    0, COALESCE(total_transactions, 0), COALESCE(total_revenue, 0), COALESCE(total_platform_fees, 0),
+    COALESCE(total_payouts, 0), COALESCE(pending_payouts, 0), COALESCE(failed_payouts, 0)
+FROM admin_stats
+WHERE id = 'revenue'
+ON CONFLICT (shard) DO NOTHING;
+
+INSERT INTO admin_stats_shards (shard)
+SELECT generate_series(0, admin_stats_shard_count() - 1)
+ON CONFLICT (shard) DO NOTHING;
+
+-- Same signature as before; concurrent callers land on different shards
+CREATE OR REPLACE FUNCTION update_admin_stats(
+    transaction_count INTEGER,
+    revenue DECIMAL,
+    platform_fee DECIMAL
+)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE admin_stats_shards
+    SET
+        total_transactions = total_transactions + transaction_count,
+        total_revenue = total_revenue + revenue,
+        total_platform_fees = total_platform_fees + platform_fee,
+        updated_at = NOW()
+    WHERE shard = admin_stats_shard(pg_backend_pid()::TEXT);
+END;
+$$ LANGUAGE plpgsql;
+
+-- The triggers below only fire on an actual transition to completed
+CREATE OR REPLACE FUNCTION update_admin_stats_on_transaction()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE admin_stats_shards
+    SET
+        total_transactions = total_transactions + 1,
+        total_revenue = total_revenue + NEW.amount_paid,
+        total_platform_fees = total_platform_fees + NEW.platform_fee,
+        updated_at = NOW()
+    WHERE shard = admin_stats_shard(NEW.id::TEXT);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_admin_stats ON transactions;
+CREATE TRIGGER trigger_update_admin_stats
+    AFTER UPDATE OF status ON transactions
+    FOR EACH ROW
+    WHEN (NEW.status::TEXT = 'completed' AND OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION update_admin_stats_on_transaction();
+
+DROP TRIGGER IF EXISTS trigger_update_admin_stats_insert ON transactions;
+CREATE TRIGGER trigger_update_admin_stats_insert
+    AFTER INSERT ON transactions
+    FOR EACH ROW
+    WHEN (NEW.status::TEXT = 'completed')
+    EXECUTE FUNCTION update_admin_stats_on_transaction();
+
+CREATE OR REPLACE FUNCTION get_admin_stats()
+RETURNS TABLE (
+    total_transactions BIGINT,
+    total_revenue DECIMAL,
+    total_platform_fees DECIMAL,
+    active_drivers INTEGER,
+    total_payouts DECIMAL,
+    pending_payouts DECIMAL,
+    failed_payouts BIGINT,
+    updated_at TIMESTAMP WITH TIME ZONE
+) AS $$
+    SELECT
+        SUM(s.total_transactions)::BIGINT,
+        SUM(s.total_revenue),
+        SUM(s.total_platform_fees),
+        COALESCE((SELECT a.active_drivers FROM admin_stats a WHERE a.id = 'revenue'), 0),
+        SUM(s.total_payouts),
+        SUM(s.pending_payouts),
+        SUM(s.failed_payouts)::BIGINT,
+        MAX(s.updated_at)
+    FROM admin_stats_shards s;
+$$ LANGUAGE sql STABLE;
+
+-- Rollups: add a shard to each bucket's key
+ALTER TABLE stats_hourly ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE stats_daily ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE stats_hourly DROP CONSTRAINT IF EXISTS stats_hourly_pkey;
+ALTER TABLE stats_hourly ADD PRIMARY KEY (bucket, vehicle_type, shard);
+ALTER TABLE stats_daily DROP CONSTRAINT IF EXISTS stats_daily_pkey;
+ALTER TABLE stats_daily ADD PRIMARY KEY (bucket, vehicle_type, shard);
+
+DROP FUNCTION IF EXISTS bump_stats_rollup(TIMESTAMP WITH TIME ZONE, TEXT, INTEGER, DECIMAL, DECIMAL, INTEGER, DECIMAL);
+CREATE OR REPLACE FUNCTION bump_stats_rollup(
+    p_at TIMESTAMP WITH TIME ZONE,
+    p_vehicle_type TEXT,
+    p_shard SMALLINT,
+    p_transactions INTEGER,
+    p_revenue DECIMAL,
+    p_platform_fees DECIMAL,
+    p_payouts INTEGER,
+    p_payout_amount DECIMAL
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO stats_hourly AS s (bucket, vehicle_type, shard, transactions, revenue, platform_fees, payouts, payout_amount)
+    VALUES (
+        date_trunc('hour', p_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', p_vehicle_type, p_shard,
+        p_transactions, p_revenue, p_platform_fees, p_payouts, p_payout_amount
+    )
+    ON CONFLICT (bucket, vehicle_type, shard) DO UPDATE SET
+        transactions = s.transactions + EXCLUDED.transactions,
+        revenue = s.revenue + EXCLUDED.revenue,
+        platform_fees = s.platform_fees + EXCLUDED.platform_fees,
+        payouts = s.payouts + EXCLUDED.payouts,
+        payout_amount = s.payout_amount + EXCLUDED.payout_amount;
+
+    INSERT INTO stats_daily AS s (bucket, vehicle_type, shard, transactions, revenue, platform_fees, payouts, payout_amount)
+    VALUES (
+        (p_at AT TIME ZONE stats_timezone())::DATE, p_vehicle_type, p_shard,
+        p_transactions, p_revenue, p_platform_fees, p_payouts, p_payout_amount
+    )
+    ON CONFLICT (bucket, vehicle_type, shard) DO UPDATE SET
+        transactions = s.transactions + EXCLUDED.transactions,
+        revenue = s.revenue + EXCLUDED.revenue,
+        platform_fees = s.platform_fees + EXCLUDED.platform_fees,
+        payouts = s.payouts + EXCLUDED.payouts,
+        payout_amount = s.payout_amount + EXCLUDED.payout_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_transaction_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_vehicle_type TEXT;
+BEGIN
+    IF (NEW.collection_status = 'completed' OR NEW.status::TEXT = 'completed')
+       AND (TG_OP = 'INSERT' OR NOT (COALESCE(OLD.collection_status, '') = 'completed'
+                                     OR COALESCE(OLD.status::TEXT, '') = 'completed')) THEN
+        SELECT vehicle_type::TEXT INTO v_vehicle_type FROM drivers WHERE id = NEW.driver_id;
+
+        PERFORM bump_stats_rollup(
+            COALESCE(NEW.collection_completed_at, NOW()), COALESCE(v_vehicle_type, 'unknown'),
+            admin_stats_shard(NEW.id::TEXT), 1, NEW.amount_paid, NEW.platform_fee, 0, 0
+        );
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_payout_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_vehicle_type TEXT;
+BEGIN
+    IF NEW.status = 'completed' AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM 'completed') THEN
+        SELECT vehicle_type::TEXT INTO v_vehicle_type FROM drivers WHERE id = NEW.driver_id;
+
+        PERFORM bump_stats_rollup(
+            COALESCE(NEW.completed_at, NOW()), COALESCE(v_vehicle_type, 'unknown'),
+            admin_stats_shard(NEW.id::TEXT), 0, 0, 0, 1, NEW.amount
+        );
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE admin_stats_shards ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all operations on admin_stats_shards" ON admin_stats_shards FOR ALL USING (true);
+GRANT ALL ON admin_stats_shards TO postgres;
+
+COMMENT ON TABLE admin_stats_shards IS 'Platform totals split across shard rows to avoid a single hot row; sum with get_admin_stats()';
@@ -0,0 +1,26 @@
+-- GoPay Bulk Driver Onboarding
+-- Bulk registration writes the QR code URLs of a whole batch of new
+-- drivers back in one call instead of one UPDATE request per driver.
+-- Run after driver_ledger_migration.sql.
+
+-- p_items: [{"id": "<driver uuid>", "qr_code_url": "https://..."}, ...]
+CREATE OR REPLACE FUNCTION set_driver_qr_urls(p_items JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE drivers d
+    SET
+        qr_code_url = x.qr_code_url,
+        updated_at = NOW()
+    FROM jsonb_to_recordset(p_items) AS x(id UUID, qr_code_url TEXT)
+    WHERE d.id = x.id;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION set_driver_qr_urls(JSONB) TO postgres;
+
+COMMENT ON FUNCTION set_driver_qr_urls IS 'Sets qr_code_url for a batch of drivers in one statement (bulk onboarding)';
@@ -0,0 +1,77 @@
+-- GoPay Collection Completion RPC
+-- Completes a collection in a single round trip: marks the transaction as
+-- collected, records the platform fee, creates the pending payout and returns
+-- the driver details needed to send the payout.
+-- Run after intasend_migration.sql.
+
+CREATE OR REPLACE FUNCTION complete_collection(
+    p_transaction_id UUID,
+    p_collection_id VARCHAR,
+    p_collection_response JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+    transaction_id UUID,
+    payout_id UUID,
+    driver_id UUID,
+    driver_phone VARCHAR,
+    driver_name VARCHAR,
+    driver_amount DECIMAL,
+    already_completed BOOLEAN
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_tx transactions%ROWTYPE;
+    v_payout_id UUID;
+BEGIN
+    -- Lock the transaction so concurrent deliveries of the same webhook serialize
+    SELECT * INTO v_tx FROM transactions WHERE id = p_transaction_id FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    -- Already collected (e.g. a retried webhook): report the existing payout, change nothing
+    IF v_tx.collection_status = 'completed' THEN
+        RETURN QUERY
+        SELECT v_tx.id, p.id, d.id, d.phone, d.name, v_tx.driver_amount, TRUE
+        FROM drivers d
+        LEFT JOIN payouts p ON p.transaction_id = v_tx.id
+        WHERE d.id = v_tx.driver_id
+        ORDER BY p.created_at
+        LIMIT 1;
+        RETURN;
+    END IF;
+
+    UPDATE transactions
+    SET
+        intasend_collection_id = p_collection_id,
+        collection_status = 'completed',
+        collection_response = COALESCE(p_collection_response, collection_response),
+        status = 'payout_pending',
+        collection_completed_at = NOW(),
+        updated_at = NOW()
+    WHERE id = v_tx.id;
+
+    INSERT INTO platform_fees (
+        transaction_id, amount, fee_type, percentage_applied, fixed_amount_applied, collected_at, created_at
+    ) VALUES (
+        v_tx.id, v_tx.platform_fee, 'percentage', v_tx.fee_percentage, v_tx.fee_fixed, NOW(), NOW()
+    );
+
+    INSERT INTO payouts (
+        transaction_id, driver_id, amount, status, initiated_at, created_at, updated_at
+    ) VALUES (
+        v_tx.id, v_tx.driver_id, v_tx.driver_amount, 'pending', NOW(), NOW(), NOW()
+    )
+    RETURNING id INTO v_payout_id;
+
+    RETURN QUERY
+    SELECT v_tx.id, v_payout_id, d.id, d.phone, d.name, v_tx.driver_amount, FALSE
+    FROM drivers d
+    WHERE d.id = v_tx.driver_id;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION complete_collection(UUID, VARCHAR, JSONB) TO postgres;
+
+COMMENT ON FUNCTION complete_collection IS 'Atomically completes an IntaSend collection: transaction update, platform fee, pending payout and driver lookup in one call';
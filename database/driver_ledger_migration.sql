@@ -0,0 +1,185 @@
+-- GoPay Driver Ledger
+-- Driver earnings used to be kept by rewriting drivers.balance and
+-- drivers.total_earnings on every payment and payout, which made each busy
+-- driver's row a lock hot spot. Earnings are now appended to driver_ledger
+-- (one row per payment/payout) and balances are materialized as:
+--
+--   driver_balances snapshot  +  ledger entries not yet compacted
+--
+-- compact_driver_ledger() folds new entries into the snapshots; schedule it
+-- (pg_cron example at the bottom) so the uncompacted tail stays short.
+-- driver_accounts is drivers with the materialized balance and is what the
+-- app reads. drivers.balance / total_earnings are no longer updated.
+-- Run after admin_stats_shards_migration.sql.
+
+CREATE TABLE IF NOT EXISTS driver_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    driver_id UUID NOT NULL REFERENCES drivers(id) ON DELETE CASCADE,
+    entry_type VARCHAR(20) NOT NULL, -- opening, payment, payout, adjustment
+    balance_delta DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    earnings_delta DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    reference_id UUID, -- transaction / payout id
+    compacted BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- One entry per payment/payout, so a repeated status update is a no-op
+CREATE UNIQUE INDEX IF NOT EXISTS idx_driver_ledger_reference
+    ON driver_ledger(entry_type, reference_id);
+CREATE INDEX IF NOT EXISTS idx_driver_ledger_driver ON driver_ledger(driver_id, id);
+-- The uncompacted tail read for every balance
+CREATE INDEX IF NOT EXISTS idx_driver_ledger_pending ON driver_ledger(driver_id)
+    INCLUDE (balance_delta, earnings_delta)
+    WHERE NOT compacted;
+
+CREATE TABLE IF NOT EXISTS driver_balances (
+    driver_id UUID PRIMARY KEY REFERENCES drivers(id) ON DELETE CASCADE,
+    balance DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    total_earnings DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    compacted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Append a ledger entry. Returns FALSE when the reference was already recorded.
+CREATE OR REPLACE FUNCTION record_driver_ledger_entry(
+    p_driver_id UUID,
+    p_entry_type TEXT,
+    p_balance_delta DECIMAL,
+    p_earnings_delta DECIMAL,
+    p_reference_id UUID DEFAULT NULL
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+    INSERT INTO driver_ledger (driver_id, entry_type, balance_delta, earnings_delta, reference_id)
+    VALUES (p_driver_id, p_entry_type, p_balance_delta, p_earnings_delta, p_reference_id)
+    ON CONFLICT (entry_type, reference_id) DO NOTHING;
+
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Same signature as before; used by the M-Pesa flow
+CREATE OR REPLACE FUNCTION update_driver_balance(driver_id UUID, amount DECIMAL)
+RETURNS VOID AS $$
+BEGIN
+    PERFORM record_driver_ledger_entry(driver_id, 'payment', amount, amount);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_driver_earnings_on_payout()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status = 'completed' AND (OLD.status IS NULL OR OLD.status != 'completed') THEN
+        PERFORM record_driver_ledger_entry(NEW.driver_id, 'payout', NEW.amount, NEW.amount, NEW.id);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Fold uncompacted entries into the snapshots. Marking the entries and
+-- adding their sums happens in one statement, so entries committed while
+-- this runs are simply left for the next run, and concurrent runs never
+-- count an entry twice.
+CREATE OR REPLACE FUNCTION compact_driver_ledger(p_limit INTEGER DEFAULT 100000)
+RETURNS INTEGER AS $$
+DECLARE
+    v_compacted INTEGER;
+BEGIN
+    WITH batch AS (
+        SELECT id FROM driver_ledger
+        WHERE NOT compacted
+        ORDER BY id
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ),
+    moved AS (
+        UPDATE driver_ledger l
+        SET compacted = TRUE
+        FROM batch
+        WHERE l.id = batch.id
+        RETURNING l.driver_id, l.balance_delta, l.earnings_delta
+    ),
+    totals AS (
+        SELECT driver_id, SUM(balance_delta) AS balance, SUM(earnings_delta) AS earnings, COUNT(*) AS entries
+        FROM moved
+        GROUP BY driver_id
+    ),
+    upserted AS (
+        INSERT INTO driver_balances AS b (driver_id, balance, total_earnings, compacted_at)
+        SELECT driver_id, balance, earnings, NOW() FROM totals
+        ON CONFLICT (driver_id) DO UPDATE SET
+            balance = b.balance + EXCLUDED.balance,
+            total_earnings = b.total_earnings + EXCLUDED.total_earnings,
+            compacted_at = NOW()
+    )
+    SELECT COALESCE(SUM(entries), 0) INTO v_compacted FROM totals;
+
+    RETURN v_compacted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drivers with the materialized balance: snapshot plus uncompacted entries
+CREATE OR REPLACE VIEW driver_accounts AS
+SELECT
+    d.id,
+    d.name,
+    d.phone,
+    d.email,
+    d.vehicle_type,
+    d.vehicle_number,
+    d.qr_code_url,
+    COALESCE(b.balance, 0) + COALESCE(t.balance, 0) AS balance,
+    COALESCE(b.total_earnings, 0) + COALESCE(t.earnings, 0) AS total_earnings,
+    d.created_at,
+    d.updated_at
+FROM drivers d
+LEFT JOIN driver_balances b ON b.driver_id = d.id
+LEFT JOIN LATERAL (
+    SELECT SUM(l.balance_delta) AS balance, SUM(l.earnings_delta) AS earnings
+    FROM driver_ledger l
+    WHERE l.driver_id = d.id AND NOT l.compacted
+) t ON TRUE;
+
+-- Consistency check: recompute every balance from the full ledger and
+-- return the drivers whose materialized balance disagrees. Empty = healthy.
+CREATE OR REPLACE FUNCTION check_driver_ledger()
+RETURNS TABLE (
+    driver_id UUID,
+    materialized_balance DECIMAL,
+    ledger_balance DECIMAL,
+    materialized_earnings DECIMAL,
+    ledger_earnings DECIMAL
+) AS $$
+    SELECT a.id, a.balance, COALESCE(l.balance, 0), a.total_earnings, COALESCE(l.earnings, 0)
+    FROM driver_accounts a
+    LEFT JOIN (
+        SELECT driver_id, SUM(balance_delta) AS balance, SUM(earnings_delta) AS earnings
+        FROM driver_ledger
+        GROUP BY driver_id
+    ) l ON l.driver_id = a.id
+    WHERE a.balance <> COALESCE(l.balance, 0)
+       OR a.total_earnings <> COALESCE(l.earnings, 0);
+$$ LANGUAGE sql STABLE;
+
+-- Opening entries carry over the balances accumulated so far
+INSERT INTO driver_ledger (driver_id, entry_type, balance_delta, earnings_delta, reference_id)
+SELECT id, 'opening', COALESCE(balance, 0), COALESCE(total_earnings, 0), id
+FROM drivers
+WHERE COALESCE(balance, 0) <> 0 OR COALESCE(total_earnings, 0) <> 0
+ON CONFLICT (entry_type, reference_id) DO NOTHING;
+
+SELECT compact_driver_ledger(2147483647);
+
+ALTER TABLE driver_ledger ENABLE ROW LEVEL SECURITY;
+ALTER TABLE driver_balances ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all operations on driver_ledger" ON driver_ledger FOR ALL USING (true);
+CREATE POLICY "Allow all operations on driver_balances" ON driver_balances FOR ALL USING (true);
+GRANT ALL ON driver_ledger TO postgres;
+GRANT ALL ON driver_balances TO postgres;
+GRANT ALL ON driver_accounts TO postgres;
+GRANT USAGE ON SEQUENCE driver_ledger_id_seq TO postgres;
+
+COMMENT ON TABLE driver_ledger IS 'Append-only driver earnings entries; balances are driver_balances plus uncompacted entries';
+COMMENT ON TABLE driver_balances IS 'Compacted per-driver balance snapshots, advanced by compact_driver_ledger()';
+
+-- Compaction schedule (Supabase: enable the pg_cron extension first)
+-- SELECT cron.schedule('compact-driver-ledger', '*/5 * * * *', 'SELECT compact_driver_ledger()');
@@ -0,0 +1,83 @@
+-- GoPay Idempotency Keys
+-- Shared store for /api/pay idempotency keys so a duplicate request that
+-- lands on another worker process (or after a restart) replays the first
+-- response instead of creating a second transaction and STK push.
+-- Optional: only used when IDEMPOTENCY_BACKEND=postgres.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key VARCHAR(255) PRIMARY KEY,
+    fingerprint VARCHAR(64) NOT NULL,
+    response JSONB, -- NULL while the first request is still running
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys(expires_at);
+
+-- Claim a key. Returns claimed = TRUE for the first request; otherwise the
+-- stored fingerprint and response (NULL response = still in progress).
+CREATE OR REPLACE FUNCTION claim_idempotency_key(
+    p_key TEXT,
+    p_fingerprint TEXT,
+    p_ttl_seconds INTEGER
+)
+RETURNS TABLE (
+    claimed BOOLEAN,
+    fingerprint VARCHAR,
+    response JSONB
+) AS $$
+#variable_conflict use_column
+BEGIN
+    DELETE FROM idempotency_keys WHERE key = p_key AND expires_at < NOW();
+
+    INSERT INTO idempotency_keys (key, fingerprint, expires_at)
+    VALUES (p_key, p_fingerprint, NOW() + make_interval(secs => p_ttl_seconds))
+    ON CONFLICT (key) DO NOTHING;
+
+    IF FOUND THEN
+        RETURN QUERY SELECT TRUE, p_fingerprint::VARCHAR, NULL::JSONB;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT FALSE, k.fingerprint, k.response
+    FROM idempotency_keys k
+    WHERE k.key = p_key;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Store the response of a completed request
+CREATE OR REPLACE FUNCTION save_idempotency_response(p_key TEXT, p_response JSONB)
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE idempotency_keys SET response = p_response WHERE key = p_key;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop the claim of a failed request so a retry runs again
+CREATE OR REPLACE FUNCTION release_idempotency_key(p_key TEXT)
+RETURNS BOOLEAN AS $$
+BEGIN
+    DELETE FROM idempotency_keys WHERE key = p_key AND response IS NULL;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Housekeeping: remove expired keys
+CREATE OR REPLACE FUNCTION prune_idempotency_keys()
+RETURNS INTEGER AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    DELETE FROM idempotency_keys WHERE expires_at < NOW();
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE idempotency_keys ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all operations on idempotency_keys" ON idempotency_keys FOR ALL USING (true);
+GRANT ALL ON idempotency_keys TO postgres;
+
+COMMENT ON TABLE idempotency_keys IS 'Responses of /api/pay requests keyed by Idempotency-Key, replayed to duplicate requests';
@@ -0,0 +1,21 @@
+-- GoPay Keyset Pagination Indexes
+-- Transaction and payout listings page with cursors on (created_at, id),
+-- newest first. These indexes let each page be a short index range scan no
+-- matter how deep the client has scrolled (OFFSET would scan every skipped row).
+-- On a large live table, run each statement separately with
+-- CREATE INDEX CONCURRENTLY to avoid blocking writes.
+
+-- Admin listing: all transactions
+CREATE INDEX IF NOT EXISTS idx_transactions_created_id
+    ON transactions(created_at DESC, id DESC);
+
+-- Driver dashboard / API: one driver's transactions
+CREATE INDEX IF NOT EXISTS idx_transactions_driver_created_id
+    ON transactions(driver_id, created_at DESC, id DESC);
+
+-- Driver payouts
+CREATE INDEX IF NOT EXISTS idx_payouts_driver_created_id
+    ON payouts(driver_id, created_at DESC, id DESC);
+
+-- Superseded by the composite indexes above
+DROP INDEX IF EXISTS idx_transactions_created_at;
@@ -0,0 +1,167 @@
+-- GoPay Durable Payout Queue
+-- Payouts are no longer sent from the web process. Every pending payout gets a
+-- row in payout_jobs (enqueued by trigger, in the same transaction that creates
+-- the payout) and is processed by `python -m app.payout_worker`.
+-- Run after collection_rpc_migration.sql.
+
+CREATE TABLE IF NOT EXISTS payout_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    payout_id UUID NOT NULL UNIQUE REFERENCES payouts(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- 'queued', 'running', 'done' or 'dead'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    locked_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Partial indexes keep the claim query cheap no matter how many jobs are done
+CREATE INDEX IF NOT EXISTS idx_payout_jobs_ready ON payout_jobs(run_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_payout_jobs_running ON payout_jobs(locked_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_payout_jobs_dead ON payout_jobs(updated_at) WHERE status = 'dead';
+
+-- Enqueue a job for every new pending payout
+CREATE OR REPLACE FUNCTION enqueue_payout_job()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO payout_jobs (payout_id) VALUES (NEW.id)
+    ON CONFLICT (payout_id) DO NOTHING;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_enqueue_payout_job ON payouts;
+CREATE TRIGGER trigger_enqueue_payout_job
+    AFTER INSERT ON payouts
+    FOR EACH ROW
+    WHEN (NEW.status = 'pending')
+    EXECUTE FUNCTION enqueue_payout_job();
+
+-- Claim up to p_limit due jobs for a worker.
+-- SKIP LOCKED lets any number of workers poll concurrently without blocking
+-- each other or claiming the same job twice.
+-- Jobs whose lease expired (worker crashed mid-payout) are dead-lettered, not
+-- retried: IntaSend may already have sent the money, so they need a human.
+CREATE OR REPLACE FUNCTION claim_payout_jobs(
+    p_worker TEXT,
+    p_limit INTEGER DEFAULT 10,
+    p_lease_seconds INTEGER DEFAULT 300
+)
+RETURNS TABLE (
+    job_id BIGINT,
+    payout_id UUID,
+    transaction_id UUID,
+    driver_id UUID,
+    driver_phone VARCHAR,
+    driver_name VARCHAR,
+    amount DECIMAL,
+    attempts INTEGER,
+    max_attempts INTEGER
+) AS $$
+#variable_conflict use_column
+BEGIN
+    UPDATE payout_jobs
+    SET status = 'dead',
+        last_error = COALESCE(last_error || E'\n', '') || 'lease expired while running on ' || COALESCE(locked_by, 'unknown worker'),
+        updated_at = NOW()
+    WHERE id IN (
+        SELECT id FROM payout_jobs
+        WHERE status = 'running'
+          AND locked_at < NOW() - make_interval(secs => p_lease_seconds)
+        FOR UPDATE SKIP LOCKED
+    );
+
+    RETURN QUERY
+    WITH claimed AS (
+        UPDATE payout_jobs j
+        SET status = 'running',
+            locked_by = p_worker,
+            locked_at = NOW(),
+            attempts = j.attempts + 1,
+            updated_at = NOW()
+        WHERE j.id IN (
+            SELECT id FROM payout_jobs
+            WHERE status = 'queued' AND run_at <= NOW()
+            ORDER BY run_at
+            LIMIT p_limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING j.*
+    )
+    SELECT c.id, p.id, p.transaction_id, d.id, d.phone, d.name, p.amount, c.attempts, c.max_attempts
+    FROM claimed c
+    JOIN payouts p ON p.id = c.payout_id
+    JOIN drivers d ON d.id = p.driver_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Mark a claimed job as done
+CREATE OR REPLACE FUNCTION complete_payout_job(p_job_id BIGINT, p_worker TEXT)
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE payout_jobs
+    SET status = 'done', locked_by = NULL, locked_at = NULL, updated_at = NOW()
+    WHERE id = p_job_id AND status = 'running' AND locked_by = p_worker;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Record a failed attempt: retry after p_retry_in_seconds, or dead-letter once
+-- max_attempts is reached. Returns the job's new status.
+CREATE OR REPLACE FUNCTION fail_payout_job(
+    p_job_id BIGINT,
+    p_worker TEXT,
+    p_error TEXT,
+    p_retry_in_seconds INTEGER
+)
+RETURNS VARCHAR AS $$
+DECLARE
+    v_status VARCHAR;
+BEGIN
+    UPDATE payout_jobs
+    SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+        run_at = NOW() + make_interval(secs => p_retry_in_seconds),
+        last_error = p_error,
+        locked_by = NULL,
+        locked_at = NULL,
+        updated_at = NOW()
+    WHERE id = p_job_id AND status = 'running' AND locked_by = p_worker
+    RETURNING status INTO v_status;
+    RETURN v_status;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Dead-letter a claimed job without retrying, whatever its attempt count.
+-- Used when a payout request may have reached IntaSend (timeout, 5xx, bad
+-- response): sending it again could pay the driver twice.
+CREATE OR REPLACE FUNCTION dead_letter_payout_job(
+    p_job_id BIGINT,
+    p_worker TEXT,
+    p_error TEXT
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE payout_jobs
+    SET status = 'dead',
+        last_error = p_error,
+        locked_by = NULL,
+        locked_at = NULL,
+        updated_at = NOW()
+    WHERE id = p_job_id AND status = 'running' AND locked_by = p_worker;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill: queue payouts that were left pending by the old in-process flow
+INSERT INTO payout_jobs (payout_id)
+SELECT id FROM payouts WHERE status = 'pending' AND tracking_id IS NULL
+ON CONFLICT (payout_id) DO NOTHING;
+
+ALTER TABLE payout_jobs ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all operations on payout_jobs" ON payout_jobs FOR ALL USING (true);
+GRANT ALL ON payout_jobs TO postgres;
+
+COMMENT ON TABLE payout_jobs IS 'Durable queue of driver payouts processed by app.payout_worker; status dead = needs manual review';
@@ -0,0 +1,38 @@
+-- GoPay Signed QR Token Generations
+-- Signed QR tokens (/t/<token>) are deterministic per driver, so a revoked
+-- token could not be replaced by reprinting: the reprint was the same token.
+-- Tokens now carry drivers.qr_generation; bumping it (done by
+-- POST /api/admin/qr_tokens/revoke) makes the driver's next QR code differ
+-- from the revoked one.
+-- Run after short_codes_migration.sql.
+
+ALTER TABLE drivers ADD COLUMN IF NOT EXISTS qr_generation INTEGER NOT NULL DEFAULT 0;
+
+-- driver_accounts lists its columns, so it is recreated with qr_generation
+-- added at the end
+CREATE OR REPLACE VIEW driver_accounts AS
+SELECT
+    d.id,
+    d.name,
+    d.phone,
+    d.email,
+    d.vehicle_type,
+    d.vehicle_number,
+    d.qr_code_url,
+    COALESCE(b.balance, 0) + COALESCE(t.balance, 0) AS balance,
+    COALESCE(b.total_earnings, 0) + COALESCE(t.earnings, 0) AS total_earnings,
+    d.created_at,
+    d.updated_at,
+    d.short_code,
+    d.qr_generation
+FROM drivers d
+LEFT JOIN driver_balances b ON b.driver_id = d.id
+LEFT JOIN LATERAL (
+    SELECT SUM(l.balance_delta) AS balance, SUM(l.earnings_delta) AS earnings
+    FROM driver_ledger l
+    WHERE l.driver_id = d.id AND NOT l.compacted
+) t ON TRUE;
+
+GRANT ALL ON driver_accounts TO postgres;
+
+COMMENT ON COLUMN drivers.qr_generation IS 'Signed QR token generation; bump to reissue a revoked QR code';
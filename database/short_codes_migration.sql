@@ -0,0 +1,96 @@
+-- GoPay Driver Short Codes
+-- QR codes used to encode /pay?driver_id=<36-char UUID>, which needs a
+-- larger (denser) QR version. Every driver now gets a random 7-character
+-- base62 short_code and QR codes encode {BASE_PUBLIC_URL}/p/<short_code>.
+-- Codes are assigned by a trigger on insert, so every insert path
+-- (single, bulk, SQL) gets one; existing drivers are backfilled below.
+-- Run after bulk_onboarding_migration.sql.
+
+ALTER TABLE drivers ADD COLUMN IF NOT EXISTS short_code VARCHAR(12);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_drivers_short_code ON drivers(short_code);
+
+-- Random base62 string of p_length characters (62^7 ~ 3.5 trillion codes)
+CREATE OR REPLACE FUNCTION random_base62(p_length INTEGER DEFAULT 7)
+RETURNS TEXT AS $$
+DECLARE
+    v_alphabet CONSTANT TEXT := '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz';
+    v_code TEXT := '';
+BEGIN
+    FOR i IN 1..p_length LOOP
+        v_code := v_code || substr(v_alphabet, 1 + floor(random() * 62)::INTEGER, 1);
+    END LOOP;
+    RETURN v_code;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- Unused short code; retries on the (rare) collision
+CREATE OR REPLACE FUNCTION new_driver_short_code()
+RETURNS TEXT AS $$
+DECLARE
+    v_code TEXT;
+BEGIN
+    LOOP
+        v_code := random_base62(7);
+        EXIT WHEN NOT EXISTS (SELECT 1 FROM drivers WHERE short_code = v_code);
+    END LOOP;
+    RETURN v_code;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+CREATE OR REPLACE FUNCTION assign_driver_short_code()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.short_code IS NULL THEN
+        NEW.short_code := new_driver_short_code();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS assign_driver_short_code ON drivers;
+CREATE TRIGGER assign_driver_short_code
+    BEFORE INSERT ON drivers
+    FOR EACH ROW
+    EXECUTE FUNCTION assign_driver_short_code();
+
+-- Backfill existing drivers
+DO $$
+DECLARE
+    v_driver RECORD;
+BEGIN
+    FOR v_driver IN SELECT id FROM drivers WHERE short_code IS NULL LOOP
+        UPDATE drivers SET short_code = new_driver_short_code() WHERE id = v_driver.id;
+    END LOOP;
+END;
+$$;
+
+ALTER TABLE drivers ALTER COLUMN short_code SET NOT NULL;
+
+-- driver_accounts (driver_ledger_migration.sql) lists its columns, so it is
+-- recreated with short_code added at the end
+CREATE OR REPLACE VIEW driver_accounts AS
+SELECT
+    d.id,
+    d.name,
+    d.phone,
+    d.email,
+    d.vehicle_type,
+    d.vehicle_number,
+    d.qr_code_url,
+    COALESCE(b.balance, 0) + COALESCE(t.balance, 0) AS balance,
+    COALESCE(b.total_earnings, 0) + COALESCE(t.earnings, 0) AS total_earnings,
+    d.created_at,
+    d.updated_at,
+    d.short_code
+FROM drivers d
+LEFT JOIN driver_balances b ON b.driver_id = d.id
+LEFT JOIN LATERAL (
+    SELECT SUM(l.balance_delta) AS balance, SUM(l.earnings_delta) AS earnings
+    FROM driver_ledger l
+    WHERE l.driver_id = d.id AND NOT l.compacted
+) t ON TRUE;
+
+GRANT ALL ON driver_accounts TO postgres;
+
+COMMENT ON COLUMN drivers.short_code IS 'Base62 code encoded in the driver''s QR code as /p/<short_code>';
@@ -0,0 +1,245 @@
+-- GoPay Revenue Rollups
+-- Hourly and daily buckets of collected payments and completed payouts per
+-- vehicle type, maintained by triggers as transactions and payouts change
+-- state. /api/admin/stats/timeseries reads these instead of scanning
+-- transactions, so a chart over any range touches at most one row per
+-- bucket and vehicle type.
+-- Hourly buckets are UTC hours; daily buckets are calendar days in
+-- stats_timezone() (Africa/Nairobi).
+-- Run after pagination_indexes_migration.sql.
+
+CREATE OR REPLACE FUNCTION stats_timezone()
+RETURNS TEXT AS $$
+    SELECT 'Africa/Nairobi'::TEXT;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE TABLE IF NOT EXISTS stats_hourly (
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    vehicle_type VARCHAR(20) NOT NULL,
+    transactions INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    platform_fees DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    payouts INTEGER NOT NULL DEFAULT 0,
+    payout_amount DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (bucket, vehicle_type)
+);
+
+CREATE TABLE IF NOT EXISTS stats_daily (
+    bucket DATE NOT NULL,
+    vehicle_type VARCHAR(20) NOT NULL,
+    transactions INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    platform_fees DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    payouts INTEGER NOT NULL DEFAULT 0,
+    payout_amount DECIMAL(15,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (bucket, vehicle_type)
+);
+
+-- Add a delta to the hourly and daily buckets containing p_at
+CREATE OR REPLACE FUNCTION bump_stats_rollup(
+    p_at TIMESTAMP WITH TIME ZONE,
+    p_vehicle_type TEXT,
+    p_transactions INTEGER,
+    p_revenue DECIMAL,
+    p_platform_fees DECIMAL,
+    p_payouts INTEGER,
+    p_payout_amount DECIMAL
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO stats_hourly AS s (bucket, vehicle_type, transactions, revenue, platform_fees, payouts, payout_amount)
+    VALUES (
+        date_trunc('hour', p_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', p_vehicle_type,
+        p_transactions, p_revenue, p_platform_fees, p_payouts, p_payout_amount
+    )
+    ON CONFLICT (bucket, vehicle_type) DO UPDATE SET
+        transactions = s.transactions + EXCLUDED.transactions,
+        revenue = s.revenue + EXCLUDED.revenue,
+        platform_fees = s.platform_fees + EXCLUDED.platform_fees,
+        payouts = s.payouts + EXCLUDED.payouts,
+        payout_amount = s.payout_amount + EXCLUDED.payout_amount;
+
+    INSERT INTO stats_daily AS s (bucket, vehicle_type, transactions, revenue, platform_fees, payouts, payout_amount)
+    VALUES (
+        (p_at AT TIME ZONE stats_timezone())::DATE, p_vehicle_type,
+        p_transactions, p_revenue, p_platform_fees, p_payouts, p_payout_amount
+    )
+    ON CONFLICT (bucket, vehicle_type) DO UPDATE SET
+        transactions = s.transactions + EXCLUDED.transactions,
+        revenue = s.revenue + EXCLUDED.revenue,
+        platform_fees = s.platform_fees + EXCLUDED.platform_fees,
+        payouts = s.payouts + EXCLUDED.payouts,
+        payout_amount = s.payout_amount + EXCLUDED.payout_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A payment counts once, when its money is collected: IntaSend marks
+-- collection_status completed, the M-Pesa flow marks status completed
+CREATE OR REPLACE FUNCTION rollup_transaction_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_vehicle_type TEXT;
+BEGIN
+    IF (NEW.collection_status = 'completed' OR NEW.status::TEXT = 'completed')
+       AND (TG_OP = 'INSERT' OR NOT (COALESCE(OLD.collection_status, '') = 'completed'
+                                     OR COALESCE(OLD.status::TEXT, '') = 'completed')) THEN
+        SELECT vehicle_type::TEXT INTO v_vehicle_type FROM drivers WHERE id = NEW.driver_id;
+
+        PERFORM bump_stats_rollup(
+            COALESCE(NEW.collection_completed_at, NOW()), COALESCE(v_vehicle_type, 'unknown'),
+            1, NEW.amount_paid, NEW.platform_fee, 0, 0
+        );
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_rollup_transaction_stats ON transactions;
+CREATE TRIGGER trigger_rollup_transaction_stats
+    AFTER INSERT OR UPDATE OF status, collection_status ON transactions
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_transaction_stats();
+
+CREATE OR REPLACE FUNCTION rollup_payout_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_vehicle_type TEXT;
+BEGIN
+    IF NEW.status = 'completed' AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM 'completed') THEN
+        SELECT vehicle_type::TEXT INTO v_vehicle_type FROM drivers WHERE id = NEW.driver_id;
+
+        PERFORM bump_stats_rollup(
+            COALESCE(NEW.completed_at, NOW()), COALESCE(v_vehicle_type, 'unknown'),
+            0, 0, 0, 1, NEW.amount
+        );
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_rollup_payout_stats ON payouts;
+CREATE TRIGGER trigger_rollup_payout_stats
+    AFTER INSERT OR UPDATE OF status ON payouts
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_payout_stats();
+
+-- Buckets in [p_from, p_to), oldest first. Empty buckets are returned as
+-- zeros so charts get an evenly spaced series. p_vehicle_type NULL sums all.
+CREATE OR REPLACE FUNCTION get_stats_timeseries(
+    p_from TIMESTAMP WITH TIME ZONE,
+    p_to TIMESTAMP WITH TIME ZONE,
+    p_granularity TEXT DEFAULT 'hour',
+    p_vehicle_type TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    bucket TIMESTAMP WITH TIME ZONE,
+    transactions BIGINT,
+    revenue DECIMAL,
+    platform_fees DECIMAL,
+    payouts BIGINT,
+    payout_amount DECIMAL
+) AS $$
+#variable_conflict use_column
+BEGIN
+    IF p_granularity = 'hour' THEN
+        RETURN QUERY
+        SELECT
+            b.bucket,
+            COALESCE(SUM(h.transactions), 0)::BIGINT,
+            COALESCE(SUM(h.revenue), 0),
+            COALESCE(SUM(h.platform_fees), 0),
+            COALESCE(SUM(h.payouts), 0)::BIGINT,
+            COALESCE(SUM(h.payout_amount), 0)
+        FROM generate_series(
+            date_trunc('hour', p_from AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+            p_to - INTERVAL '1 microsecond',
+            INTERVAL '1 hour'
+        ) AS b(bucket)
+        LEFT JOIN stats_hourly h
+            ON h.bucket = b.bucket
+           AND (p_vehicle_type IS NULL OR h.vehicle_type = p_vehicle_type)
+        GROUP BY b.bucket
+        ORDER BY b.bucket;
+    ELSIF p_granularity = 'day' THEN
+        RETURN QUERY
+        SELECT
+            b.day::TIMESTAMP AT TIME ZONE stats_timezone(),
+            COALESCE(SUM(d.transactions), 0)::BIGINT,
+            COALESCE(SUM(d.revenue), 0),
+            COALESCE(SUM(d.platform_fees), 0),
+            COALESCE(SUM(d.payouts), 0)::BIGINT,
+            COALESCE(SUM(d.payout_amount), 0)
+        FROM generate_series(
+            (p_from AT TIME ZONE stats_timezone())::DATE,
+            ((p_to - INTERVAL '1 microsecond') AT TIME ZONE stats_timezone())::DATE,
+            INTERVAL '1 day'
+        ) AS b(day)
+        LEFT JOIN stats_daily d
+            ON d.bucket = b.day::DATE
+           AND (p_vehicle_type IS NULL OR d.vehicle_type = p_vehicle_type)
+        GROUP BY b.day
+        ORDER BY b.day;
+    ELSE
+        RAISE EXCEPTION 'Unknown granularity %', p_granularity;
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Recompute both rollups from transactions and payouts. Used for the
+-- initial backfill and to repair the rollups after manual data fixes.
+-- Blocks writes to transactions and payouts while it runs.
+CREATE OR REPLACE FUNCTION rebuild_stats_rollups()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE transactions, payouts IN SHARE MODE;
+
+    TRUNCATE stats_hourly, stats_daily;
+
+    INSERT INTO stats_hourly (bucket, vehicle_type, transactions, revenue, platform_fees, payouts, payout_amount)
+    SELECT
+        date_trunc('hour', e.at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+        e.vehicle_type,
+        SUM(e.transactions), SUM(e.revenue), SUM(e.platform_fees),
+        SUM(e.payouts), SUM(e.payout_amount)
+    FROM (
+        SELECT
+            COALESCE(t.collection_completed_at, t.updated_at, t.created_at) AS at,
+            COALESCE(d.vehicle_type::TEXT, 'unknown') AS vehicle_type,
+            1 AS transactions, t.amount_paid AS revenue, t.platform_fee AS platform_fees,
+            0 AS payouts, 0::DECIMAL AS payout_amount
+        FROM transactions t
+        LEFT JOIN drivers d ON d.id = t.driver_id
+        WHERE t.collection_status = 'completed' OR t.status::TEXT = 'completed'
+        UNION ALL
+        SELECT
+            COALESCE(p.completed_at, p.updated_at, p.created_at),
+            COALESCE(d.vehicle_type::TEXT, 'unknown'),
+            0, 0, 0,
+            1, p.amount
+        FROM payouts p
+        LEFT JOIN drivers d ON d.id = p.driver_id
+        WHERE p.status = 'completed'
+    ) e
+    GROUP BY 1, 2;
+
+    -- stats_timezone() is a whole-hour offset, so every UTC hour falls in one local day
+    INSERT INTO stats_daily (bucket, vehicle_type, transactions, revenue, platform_fees, payouts, payout_amount)
+    SELECT
+        (bucket AT TIME ZONE stats_timezone())::DATE, vehicle_type,
+        SUM(transactions), SUM(revenue), SUM(platform_fees), SUM(payouts), SUM(payout_amount)
+    FROM stats_hourly
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_stats_rollups();
+
+ALTER TABLE stats_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE stats_daily ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all operations on stats_hourly" ON stats_hourly FOR ALL USING (true);
+CREATE POLICY "Allow all operations on stats_daily" ON stats_daily FOR ALL USING (true);
+GRANT ALL ON stats_hourly TO postgres;
+GRANT ALL ON stats_daily TO postgres;
+
+COMMENT ON TABLE stats_hourly IS 'Collected payments and completed payouts per UTC hour and vehicle type, maintained by triggers';
+COMMENT ON TABLE stats_daily IS 'Collected payments and completed payouts per local day and vehicle type, maintained by triggers';
@@ -0,0 +1,90 @@
+-- GoPay Webhook Deduplication
+-- IntaSend retries webhooks. Every delivery is claimed here by
+-- "<event id>:<state>" before it is processed, so a retried delivery is
+-- skipped instead of repeating the collection/payout work.
+-- Run after payout_queue_migration.sql.
+
+CREATE TABLE IF NOT EXISTS webhook_events (
+    event_key VARCHAR(255) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'processing', -- processing, done
+    claimed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_webhook_events_completed ON webhook_events(completed_at)
+    WHERE status = 'done';
+
+-- Claim an event for processing. Returns 'claimed' when the caller should
+-- process it, 'done' when it was already processed and 'processing' when
+-- someone else holds the claim (the caller should retry later, not ack).
+-- A claim older than p_lease_seconds that never completed (crashed
+-- consumer) can be taken over.
+DROP FUNCTION IF EXISTS claim_webhook_event(TEXT, INTEGER);
+CREATE OR REPLACE FUNCTION claim_webhook_event(
+    p_event_key TEXT,
+    p_lease_seconds INTEGER DEFAULT 300
+)
+RETURNS VARCHAR AS $$
+DECLARE
+    v_status VARCHAR;
+BEGIN
+    INSERT INTO webhook_events (event_key)
+    VALUES (p_event_key)
+    ON CONFLICT (event_key) DO UPDATE
+        SET claimed_at = NOW()
+        WHERE webhook_events.status = 'processing'
+          AND webhook_events.claimed_at < NOW() - make_interval(secs => p_lease_seconds);
+
+    IF FOUND THEN
+        RETURN 'claimed';
+    END IF;
+
+    SELECT status INTO v_status FROM webhook_events WHERE event_key = p_event_key;
+    -- A claim released in between is retried like one in progress
+    RETURN COALESCE(v_status, 'processing');
+END;
+$$ LANGUAGE plpgsql;
+
+-- Mark a claimed event as processed
+CREATE OR REPLACE FUNCTION complete_webhook_event(p_event_key TEXT)
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE webhook_events
+    SET status = 'done', completed_at = NOW()
+    WHERE event_key = p_event_key;
+
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Give up a claim after a processing failure so the next retry is processed
+CREATE OR REPLACE FUNCTION release_webhook_event(p_event_key TEXT)
+RETURNS BOOLEAN AS $$
+BEGIN
+    DELETE FROM webhook_events
+    WHERE event_key = p_event_key AND status = 'processing';
+
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Housekeeping: IntaSend stops retrying after a few days
+CREATE OR REPLACE FUNCTION prune_webhook_events(p_older_than_days INTEGER DEFAULT 30)
+RETURNS INTEGER AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    DELETE FROM webhook_events
+    WHERE status = 'done'
+      AND completed_at < NOW() - make_interval(days => p_older_than_days);
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE webhook_events ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all operations on webhook_events" ON webhook_events FOR ALL USING (true);
+GRANT ALL ON webhook_events TO postgres;
+
+COMMENT ON TABLE webhook_events IS 'Processed IntaSend webhook deliveries keyed by event id and state, used to skip provider retries';
@@ -0,0 +1,53 @@
+"""
+Verify Driver Ledger Consistency
+Recomputes every driver balance from driver_ledger and compares it with the
+materialized balance (snapshot + uncompacted entries) the app shows.
+
+Usage:
+    python verify_ledger.py              # check only
+    python verify_ledger.py --compact    # compact the ledger first, then check
+
+Exits with status 1 when any driver's balance disagrees.
+"""
+import sys
+import asyncio
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.data_backend import create_data_manager  # noqa: E402
+
+
+async def verify_ledger(compact: bool) -> bool:
+    manager = create_data_manager()
+    await manager.startup()
+    try:
+        if compact:
+            folded = await manager.compact_driver_ledger()
+            print(f"🗜️  Compacted {folded} ledger entries into balance snapshots")
+
+        mismatches = await manager.check_driver_ledger()
+    finally:
+        await manager.aclose()
+
+    if not mismatches:
+        print("✅ All driver balances match the ledger")
+        return True
+
+    print(f"❌ {len(mismatches)} driver(s) disagree with the ledger:")
+    for row in mismatches:
+        print(
+            f"   {row['driver_id']}: balance {row['materialized_balance']} vs ledger {row['ledger_balance']}, "
+            f"earnings {row['materialized_earnings']} vs ledger {row['ledger_earnings']}"
+        )
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check driver balances against driver_ledger")
+    parser.add_argument("--compact", action="store_true", help="run compact_driver_ledger() before checking")
+    args = parser.parse_args()
+
+    ok = asyncio.run(verify_ledger(args.compact))
+    sys.exit(0 if ok else 1)